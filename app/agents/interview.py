@@ -1,26 +1,87 @@
-from typing import Dict, Any, List, Optional
+from typing import AsyncIterator, Dict, Any, List, Optional
 import time
 import random
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.tools import DuckDuckGoSearchResults
 
-from app.config import GOOGLE_API_KEY, GEMINI_PRO_MODEL
-from app.utils.file_utils import save_file
+from app.config import GEMINI_FLASH_MODEL, GEMINI_PRO_MODEL, MOCK_HISTORY_TOKEN_BUDGET
+from app.services.artifacts import save_file
+from app.services.breaker import FallbackFlag
+from app.services.clients import get_chat_model
+from app.services.context import get_context_compressor
+from app.services.llm_cache import get_llm_cache
+from app.services.metrics import MeteredModel, counts_fallback, record_agent_error
+from app.services.scheduler import prioritized
+from app.services.search_cache import get_cached_search_tool
+from app.services.sessions import InterviewSession, get_session_store
+from app.services.streaming import chunk_text, emit_progress, make_event, stream_markdown
+from app.utils.text_utils import estimate_tokens
+
+QUESTIONS_PROMPT = ChatPromptTemplate.from_template(
+    "You are an expert interviewer for tech and AI positions. "
+    "I need you to generate a comprehensive list of interview questions "
+    "based on the following request:\n\n"
+    "{query}\n\n"
+    "Here's some information I found from a web search that might be helpful:\n"
+    "{search_results}\n\n"
+    "Please provide a well-structured set of interview questions with brief explanations "
+    "of what the interviewer is looking for in the answers. Format your response in markdown."
+)
+
+MOCK_START_PROMPT = ChatPromptTemplate.from_template(
+    "You are an expert interviewer for tech and AI positions. "
+    "I need you to start a mock interview based on the following request:\n\n"
+    "{query}\n\n"
+    "Please respond as the interviewer with your first question. "
+    "Keep your response concise and focused on starting the interview."
+)
+
+MOCK_CONTINUE_PROMPT = ChatPromptTemplate.from_template(
+    "You are conducting a mock interview for a tech or AI position. "
+    "Here's the conversation so far:\n\n"
+    "{formatted_history}\n\n"
+    "The candidate just said: {query}\n\n"
+    "Please respond as the interviewer. You can ask follow-up questions, "
+    "provide feedback, or move on to a new topic. Keep your response concise and realistic."
+)
+
+MOCK_SUMMARY_PROMPT = ChatPromptTemplate.from_template(
+    "You are keeping notes on a mock interview for a tech or AI position.\n\n"
+    "Notes so far:\n{summary}\n\n"
+    "Newer part of the conversation:\n{formatted_history}\n\n"
+    "Rewrite the notes as one concise summary of the role, the questions asked, how the candidate "
+    "answered and which topics are still open. Keep it under {max_words} words."
+)
 
 class InterviewAgent:
     """Agent for interview preparation assistance."""
     
-    def __init__(self):
-        """Initialize the interview agent."""
-        self.model = ChatGoogleGenerativeAI(
-            model=GEMINI_PRO_MODEL,
-            google_api_key=GOOGLE_API_KEY,
-            temperature=0.7
-        )
-        self.search_tool = DuckDuckGoSearchResults()
+    # Fallback content in testing mode, or while Gemini's circuit breaker is open
+    use_fallback = FallbackFlag("gemini")
+    
+    # Calls are recorded in the LLM metrics under the agent's name
+    model = MeteredModel("interview")
+    summary_model = MeteredModel("interview")
+    
+    def __init__(self, model=None, search_tool=None, cache=None, context=None, sessions=None, summary_model=None):
+        """Initialize the interview agent.
+        
+        Args:
+            model: Optional chat model (defaults to the shared Gemini client)
+            search_tool: Optional search tool (defaults to the shared cached search provider)
+            cache: Optional response cache (defaults to the shared LLM cache)
+            context: Optional search context compressor (defaults to the shared one)
+            sessions: Optional mock interview session store (defaults to the shared store)
+            summary_model: Optional model for folding old turns into a summary (defaults to Gemini Flash)
+        """
+        self.model = model or get_chat_model(GEMINI_PRO_MODEL, temperature=0.7)
+        self.summary_model = summary_model or get_chat_model(GEMINI_FLASH_MODEL, temperature=0.0)
+        self.search_tool = search_tool or get_cached_search_tool()
+        self.cache = cache or get_llm_cache()
+        self.context = context or get_context_compressor()
+        self.sessions = sessions or get_session_store()
         self.use_fallback = False
     
+    @counts_fallback("interview")
     def _fallback_response(self, query: str) -> str:
         """Generate a fallback response when API limits are reached.
         
@@ -43,42 +104,10 @@ class InterviewAgent:
         
         return f"Let's continue with the interview. {random.choice(fallback_responses)}"
     
-    def generate_interview_questions(self, query: str) -> Dict[str, str]:
-        """Generate interview questions based on the user's query.
-        
-        Args:
-            query: The user's query about interview topics
-            
-        Returns:
-            A dictionary containing the generated questions and file path
-        """
-        try:
-            prompt = ChatPromptTemplate.from_template(
-                "You are an expert interviewer for tech and AI positions. "
-                "I need you to generate a comprehensive list of interview questions "
-                "based on the following request:\n\n"
-                "{query}\n\n"
-                "Here's some information I found from a web search that might be helpful:\n"
-                "{search_results}\n\n"
-                "Please provide a well-structured set of interview questions with brief explanations "
-                "of what the interviewer is looking for in the answers. Format your response in markdown."
-            )
-            
-            search_results = self.search_tool.invoke(f"interview questions {query}")
-            
-            chain = prompt | self.model
-            response = chain.invoke({
-                "query": query,
-                "search_results": search_results
-            })
-            
-            content = response.content
-        except Exception as e:
-            print(f"API error: {str(e)}")
-            self.use_fallback = True
-            
-            # Fallback content for interview questions
-            content = f"""# Interview Questions for {query}
+    @counts_fallback("interview")
+    def _fallback_questions(self, query: str) -> str:
+        """Generate fallback interview questions when API limits are reached."""
+        return f"""# Interview Questions for {query}
 
 ## Technical Questions
 1. **What is your experience with generative AI models?**
@@ -104,11 +133,85 @@ class InterviewAgent:
 2. **How do you stay updated with the latest developments in AI?**
    - *Looking for: Continuous learning mindset and professional development*
 """
+    
+    def generate_interview_questions(self, query: str) -> Dict[str, str]:
+        """Generate interview questions based on the user's query.
+        
+        Args:
+            query: The user's query about interview topics
+            
+        Returns:
+            A dictionary containing the generated questions and file path
+        """
+        cache_key = self.cache.make_key("interview_questions", self.model, QUESTIONS_PROMPT, query)
+        content = self.cache.get("interview_questions", cache_key, query=query)
+        if content is None and self.use_fallback:
+            # Gemini's circuit is open: skip the web search for a call that would fail fast
+            content = self._fallback_questions(query)
+        if content is None:
+            try:
+                raw_results = self.search_tool.invoke(f"interview questions {query}")
+                search_results = self.context.compress("interview_questions", query, raw_results)
+                
+                chain = QUESTIONS_PROMPT | self.model
+                response = chain.invoke({
+                    "query": query,
+                    "search_results": search_results
+                })
+                
+                content = response.content
+                self.cache.set("interview_questions", cache_key, content, query=query)
+            except Exception as e:
+                record_agent_error("interview_questions", e)
+                content = self._fallback_questions(query)
+        
+        file_path = save_file(
+            content=content,
+            kind="interview_questions",
+            query=query
+        )
+        
+        return {
+            "content": content,
+            "file_path": file_path
+        }
+    
+    async def generate_interview_questions_async(self, query: str) -> Dict[str, str]:
+        """Generate interview questions without blocking the event loop.
+        
+        Args:
+            query: The user's query about interview topics
+            
+        Returns:
+            A dictionary containing the generated questions and file path
+        """
+        cache_key = self.cache.make_key("interview_questions", self.model, QUESTIONS_PROMPT, query)
+        content = await self.cache.get_async("interview_questions", cache_key, query=query)
+        if content is None and self.use_fallback:
+            # Gemini's circuit is open: skip the web search for a call that would fail fast
+            content = self._fallback_questions(query)
+        if content is None:
+            try:
+                raw_results = await self.search_tool.ainvoke(f"interview questions {query}")
+                search_results = self.context.compress("interview_questions", query, raw_results)
+                
+                emit_progress("generation_started", namespace="interview_questions")
+                chain = QUESTIONS_PROMPT | self.model
+                response = await chain.ainvoke({
+                    "query": query,
+                    "search_results": search_results
+                })
+                
+                content = response.content
+                self.cache.set("interview_questions", cache_key, content, query=query)
+            except Exception as e:
+                record_agent_error("interview_questions", e)
+                content = self._fallback_questions(query)
         
         file_path = save_file(
             content=content,
-            filename=f"interview_questions_{query.replace(' ', '_')[:30]}",
-            extension="md"
+            kind="interview_questions",
+            query=query
         )
         
         return {
@@ -116,6 +219,59 @@ class InterviewAgent:
             "file_path": file_path
         }
     
+    async def generate_interview_questions_stream(self, query: str) -> AsyncIterator[Dict[str, Any]]:
+        """Stream interview questions token by token, writing the markdown file as they arrive."""
+        async def prepare():
+            raw_results = await self.search_tool.ainvoke(f"interview questions {query}")
+            search_results = self.context.compress("interview_questions", query, raw_results)
+            return {"query": query, "search_results": search_results}
+        
+        async for event in stream_markdown(
+            QUESTIONS_PROMPT | self.model,
+            prepare,
+            cache=self.cache,
+            namespace="interview_questions",
+            cache_key=self.cache.make_key("interview_questions", self.model, QUESTIONS_PROMPT, query),
+            fallback=lambda: self._fallback_questions(query),
+            query=query
+        ):
+            yield event
+    
+    @staticmethod
+    def _format_transcript(chat_history: List[Dict[str, str]]) -> str:
+        """Render chat messages as an interviewer/candidate transcript."""
+        lines = []
+        for msg in chat_history:
+            role = "Interviewer" if msg["role"] == "assistant" else "Candidate"
+            lines.append(f"{role}: {msg['content']}\n\n")
+        return "".join(lines)
+    
+    def _mock_interview_prompt(self, query: str, chat_history: Optional[List[Dict[str, str]]] = None,
+                               summary: str = ""):
+        """Pick the prompt and inputs for the next mock interview turn.
+        
+        Args:
+            query: The user's query about the mock interview
+            chat_history: Optional list of previous chat messages
+            summary: Optional summary of turns older than chat_history
+            
+        Returns:
+            A tuple of the prompt template and the inputs to invoke it with
+        """
+        # If this is the first message (no chat history), create a mock interview script
+        if not chat_history and not summary:
+            return MOCK_START_PROMPT, {"query": query}
+        
+        # If we have chat history, continue the interview
+        formatted_history = self._format_transcript(chat_history or [])
+        if summary:
+            formatted_history = f"Summary of the earlier interview:\n{summary}\n\nMost recent exchanges:\n\n{formatted_history}"
+        
+        return MOCK_CONTINUE_PROMPT, {
+            "formatted_history": formatted_history,
+            "query": query
+        }
+    
     def conduct_mock_interview(self, query: str, chat_history: Optional[List[Dict[str, str]]] = None) -> Dict[str, str]:
         """Conduct a mock interview session based on the user's query.
         
@@ -126,7 +282,7 @@ class InterviewAgent:
         Returns:
             A dictionary containing the response content and role
         """
-        # If API limits have been reached, use fallback responses
+        # In testing mode, use fallback responses
         if self.use_fallback:
             return {
                 "content": self._fallback_response(query),
@@ -134,57 +290,190 @@ class InterviewAgent:
             }
             
         try:
-            # If this is the first message (no chat history), create a mock interview script
-            if not chat_history:
-                prompt = ChatPromptTemplate.from_template(
-                    "You are an expert interviewer for tech and AI positions. "
-                    "I need you to start a mock interview based on the following request:\n\n"
-                    "{query}\n\n"
-                    "Please respond as the interviewer with your first question. "
-                    "Keep your response concise and focused on starting the interview."
-                )
-                
-                chain = prompt | self.model
-                response = chain.invoke({"query": query})
-                
-                return {
-                    "content": response.content,
-                    "role": "assistant"
-                }
+            prompt, inputs = self._mock_interview_prompt(query, chat_history)
+            cache_key = self.cache.make_key("mock_interview", self.model, prompt, "\n".join(inputs.values()))
+            content = self.cache.get("mock_interview", cache_key)
+            if content is None:
+                chain = prompt | prioritized(self.model, "interactive")
+                content = chain.invoke(inputs).content
+                self.cache.set("mock_interview", cache_key, content)
             
-            # If we have chat history, continue the interview
-            else:
-                # Format the chat history for the model
-                formatted_history = ""
-                for msg in chat_history:
-                    role = "Interviewer" if msg["role"] == "assistant" else "Candidate"
-                    formatted_history += f"{role}: {msg['content']}\n\n"
-                
-                prompt = ChatPromptTemplate.from_template(
-                    "You are conducting a mock interview for a tech or AI position. "
-                    "Here's the conversation so far:\n\n"
-                    "{formatted_history}\n\n"
-                    "The candidate just said: {query}\n\n"
-                    "Please respond as the interviewer. You can ask follow-up questions, "
-                    "provide feedback, or move on to a new topic. Keep your response concise and realistic."
-                )
-                
-                chain = prompt | self.model
-                response = chain.invoke({
-                    "formatted_history": formatted_history,
-                    "query": query
-                })
-                
-                return {
-                    "content": response.content,
-                    "role": "assistant"
-                }
+            return {
+                "content": content,
+                "role": "assistant"
+            }
         except Exception as e:
-            print(f"API error: {str(e)}")
-            self.use_fallback = True
+            record_agent_error("mock_interview", e)
+            return {
+                "content": self._fallback_response(query),
+                "role": "assistant"
+            }
+    
+    async def conduct_mock_interview_async(self, query: str, chat_history: Optional[List[Dict[str, str]]] = None,
+                                           summary: str = "") -> Dict[str, str]:
+        """Conduct a mock interview turn without blocking the event loop.
+        
+        Args:
+            query: The user's query about the mock interview
+            chat_history: Optional list of previous chat messages
+            summary: Optional summary of turns older than chat_history
             
+        Returns:
+            A dictionary containing the response content and role
+        """
+        if self.use_fallback:
             return {
                 "content": self._fallback_response(query),
                 "role": "assistant"
             }
-
+            
+        try:
+            prompt, inputs = self._mock_interview_prompt(query, chat_history, summary)
+            cache_key = self.cache.make_key("mock_interview", self.model, prompt, "\n".join(inputs.values()))
+            content = await self.cache.get_async("mock_interview", cache_key)
+            if content is None:
+                emit_progress("generation_started", namespace="mock_interview")
+                chain = prompt | prioritized(self.model, "interactive")
+                content = (await chain.ainvoke(inputs)).content
+                self.cache.set("mock_interview", cache_key, content)
+            
+            return {
+                "content": content,
+                "role": "assistant"
+            }
+        except Exception as e:
+            record_agent_error("mock_interview", e)
+            return {
+                "content": self._fallback_response(query),
+                "role": "assistant"
+            }
+    
+    async def start_session_async(self, query: str) -> Dict[str, Any]:
+        """Start a server-side mock interview session and return the interviewer's opening.
+        
+        Args:
+            query: The user's request describing the interview
+            
+        Returns:
+            A dictionary containing the response content, role and session id
+        """
+        session = await self.sessions.create_async(topic=query)
+        return await self.conduct_session_turn_async(session.session_id, query)
+    
+    async def conduct_session_turn_async(self, session_id: str, query: str) -> Optional[Dict[str, Any]]:
+        """Conduct the next turn of a server-side mock interview session.
+        
+        The stored history is extended with this turn instead of being re-sent by
+        the client, and older turns are folded into a rolling summary once the
+        history outgrows MOCK_HISTORY_TOKEN_BUDGET.
+        
+        Args:
+            session_id: The session's id
+            query: What the candidate said
+            
+        Returns:
+            A dictionary containing the response content, role, session id and turn
+            number, or None if the session does not exist
+        """
+        # Read the session under its lock: a copy read before another turn finished would be stale
+        async with self.sessions.lock(session_id):
+            session = await self.sessions.get_async(session_id)
+            if session is None:
+                return None
+            result = await self.conduct_mock_interview_async(query, session.messages, summary=session.summary)
+            session.messages.append({"role": "user", "content": query})
+            session.messages.append({"role": "assistant", "content": result["content"]})
+            session.turns += 1
+            await self._fold_history_async(session)
+            await self.sessions.save_async(session)
+        
+        return {
+            **result,
+            "session_id": session.session_id,
+            "turn": session.turns
+        }
+    
+    async def stream_session_turn_async(self, session_id: str, query: str) -> AsyncIterator[Dict[str, Any]]:
+        """Stream the interviewer's reply for the next turn of a session token by token.
+        
+        Args:
+            session_id: The session's id
+            query: What the candidate said
+            
+        Yields:
+            `token` events as the model streams, then a `done` event with the full
+            reply, session id and turn number (or one `error` event for an unknown session)
+        """
+        async with self.sessions.lock(session_id):
+            session = await self.sessions.get_async(session_id)
+            if session is None:
+                yield make_event("error", detail="Interview session not found")
+                return
+            
+            parts = []
+            if not self.use_fallback:
+                prompt, inputs = self._mock_interview_prompt(query, session.messages, session.summary)
+                try:
+                    async for chunk in (prompt | prioritized(self.model, "interactive")).astream(inputs):
+                        text = chunk_text(chunk)
+                        if text:
+                            parts.append(text)
+                            yield make_event("token", text=text)
+                except Exception as e:
+                    record_agent_error("mock_interview", e)
+            if not parts:
+                parts.append(self._fallback_response(query))
+                yield make_event("token", text=parts[0], fallback=True)
+            
+            content = "".join(parts)
+            session.messages.append({"role": "user", "content": query})
+            session.messages.append({"role": "assistant", "content": content})
+            session.turns += 1
+            await self._fold_history_async(session)
+            await self.sessions.save_async(session)
+        
+        yield make_event("done", content=content, role="assistant", session_id=session.session_id, turn=session.turns)
+    
+    async def _fold_history_async(self, session: InterviewSession,
+                                  budget: int = MOCK_HISTORY_TOKEN_BUDGET) -> None:
+        """Fold a session's oldest messages into its summary once its history exceeds the budget.
+        
+        The newest messages are kept verbatim up to half the budget; the summary
+        is asked to fit in the other half, so the prompt stays bounded.
+        
+        Args:
+            session: The session to compact
+            budget: Token budget for the summary plus the verbatim messages
+        """
+        if session.history_tokens() <= budget:
+            return
+        
+        keep, kept_tokens = len(session.messages), 0
+        while keep > 0:
+            tokens = estimate_tokens(session.messages[keep - 1]["content"])
+            if kept_tokens + tokens > budget // 2:
+                break
+            kept_tokens += tokens
+            keep -= 1
+        folded, session.messages = session.messages[:keep], session.messages[keep:]
+        if not folded:
+            return
+        
+        summary_tokens = budget - kept_tokens
+        try:
+            chain = MOCK_SUMMARY_PROMPT | prioritized(self.summary_model, "interactive")
+            response = await chain.ainvoke({
+                "summary": session.summary or "(none yet)",
+                "formatted_history": self._format_transcript(folded),
+                "max_words": max(summary_tokens * 3 // 4, 50)
+            })
+            summary = response.content
+        except Exception as e:
+            record_agent_error("mock_summary", e)
+            # Without a model, keep the start of each folded message
+            summary = session.summary + "\n" + "".join(
+                f"{line[:200]}\n" for line in self._format_transcript(folded).split("\n\n") if line
+            )
+        
+        # Never let the summary itself outgrow its share of the budget
+        session.summary = summary.strip()[-summary_tokens * 4:]
@@ -1,31 +1,66 @@
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any
 import random
-import asyncio
-from contextlib import asynccontextmanager
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.tools import DuckDuckGoSearchResults
 
-from app.config import GOOGLE_API_KEY, GEMINI_PRO_MODEL, USE_MOCK_RESPONSES
-from app.utils.file_utils import save_file
+from app.config import GEMINI_PRO_MODEL, USE_MOCK_RESPONSES
+from app.services.artifacts import save_file
+from app.services.breaker import FallbackFlag
+from app.services.clients import get_chat_model
+from app.services.context import get_context_compressor
+from app.services.llm_cache import get_llm_cache
+from app.services.metrics import MeteredModel, counts_fallback, record_agent_error
+from app.services.search_cache import get_cached_search_tool
+from app.services.streaming import emit_progress, make_event, stream_markdown
+from app.utils.async_utils import run_sync
+
+JOB_SEARCH_PROMPT = ChatPromptTemplate.from_template(
+    "You are a helpful job search assistant. I'll provide you with a job search query, "
+    "and you'll help me find relevant job listings.\n\n"
+    "Here's some information I found from a web search that might be helpful:\n"
+    "{search_results}\n\n"
+    "Based on this information, please provide a detailed list of job opportunities "
+    "that match my search criteria. Include:\n"
+    "1. Job titles\n"
+    "2. Companies\n"
+    "3. Locations\n"
+    "4. Brief descriptions\n"
+    "5. Application links (very important - if a direct application link is found in the search results)\n"
+    "6. Source website (e.g. LinkedIn, Indeed, Internshala, Naukri etc.)\n\n"
+    "Format your response in markdown and make sure to include clickable links when available. "
+    "For jobs without direct application links, include a link to the job search page on the source website.\n\n"
+    "My job search query is: {query}"
+)
 
 class JobSearch:
     """Agent for job search assistance."""
     
-    def __init__(self):
-        """Initialize the job search agent."""
+    # Fallback content in testing mode, or while Gemini's circuit breaker is open
+    use_fallback = FallbackFlag("gemini")
+    
+    # Calls are recorded in the LLM metrics under the agent's name
+    model = MeteredModel("job")
+    
+    def __init__(self, model=None, search_tool=None, cache=None, context=None):
+        """Initialize the job search agent.
+        
+        Args:
+            model: Optional chat model (defaults to the shared Gemini client)
+            search_tool: Optional search tool (defaults to the shared cached search provider)
+            cache: Optional response cache (defaults to the shared LLM cache)
+            context: Optional search context compressor (defaults to the shared one)
+        """
         # Initialize the chat model and search tools
         try:
-            self.model = ChatGoogleGenerativeAI(
-                model=GEMINI_PRO_MODEL,
-                google_api_key=GOOGLE_API_KEY
-            )
-            self.search_tool = DuckDuckGoSearchResults()
+            self.model = model or get_chat_model(GEMINI_PRO_MODEL)
+            self.search_tool = search_tool or get_cached_search_tool()
+            self.cache = cache or get_llm_cache()
+            self.context = context or get_context_compressor()
             self.use_fallback = USE_MOCK_RESPONSES
         except Exception as e:
-            print(f"Initialization error: {str(e)}")
+            record_agent_error("job_search_init", e)
             self.use_fallback = True
         
+    @counts_fallback("job")
     def _fallback_response(self, query: str) -> str:
         """Generate a fallback response when API limits are reached."""
         job_locations = ["San Francisco", "New York", "Seattle", "Austin", "Remote"]
@@ -76,69 +111,58 @@ class JobSearch:
 *Note: These job listings are examples based on your search query. For the most current opportunities, visit job boards like LinkedIn, Indeed, or company career pages.*
 """
 
+    def _fallback_result(self, query: str) -> Dict[str, str]:
+        """Build and save the fallback job listings for a query."""
+        content = self._fallback_response(query)
+        file_path = save_file(
+            content=content,
+            kind="job_search",
+            query=query
+        )
+        return {
+            "content": content,
+            "file_path": file_path
+        }
+
     async def find_jobs_async(self, query: str) -> Dict[str, str]:
         """Search for jobs based on the user's query asynchronously."""
-        content = None
-        search_results = None
-        
-        try:
-            if self.use_fallback:
-                content = self._fallback_response(query)
-            else:
-                # Perform the search using async DuckDuckGo search
-                try:
-                    async with DuckDuckGoSearchResults() as searcher:
-                        search_results = await searcher.ainvoke(f"job listings {query}")
-                except Exception as search_error:
-                    print(f"Search tool error: {str(search_error)}")
-                    self.use_fallback = True
-                    content = self._fallback_response(query)
-                    return {
-                        "content": content,
-                        "file_path": save_file(
-                            content=content,
-                            filename=f"job_search_{query.replace(' ', '_')[:30]}",
-                            extension="md"
-                        )
-                    }
-
-                # Create a prompt for job search
-                prompt = ChatPromptTemplate.from_template(
-                    "You are a helpful job search assistant. I'll provide you with a job search query, "
-                    "and you'll help me find relevant job listings.\n\n"
-                    "Here's some information I found from a web search that might be helpful:\n"
-                    "{search_results}\n\n"
-                    "Based on this information, please provide a detailed list of job opportunities "
-                    "that match my search criteria. Include:\n"
-                    "1. Job titles\n"
-                    "2. Companies\n"
-                    "3. Locations\n"
-                    "4. Brief descriptions\n"
-                    "5. Application links (very important - if a direct application link is found in the search results)\n"
-                    "6. Source website (e.g. LinkedIn, Indeed, Internshala, Naukri etc.)\n\n"
-                    "Format your response in markdown and make sure to include clickable links when available. "
-                    "For jobs without direct application links, include a link to the job search page on the source website.\n\n"
-                    "My job search query is: {query}"
-                )
-
+        if self.use_fallback:
+            return self._fallback_result(query)
+
+        cache_key = self.cache.make_key("job_search", self.model, JOB_SEARCH_PROMPT, query)
+        content = await self.cache.get_async("job_search", cache_key)
+        if content is None:
+            # Perform the search with the agent's long-lived search tool
+            cacheable = True
+            try:
+                raw_results = await self.search_tool.ainvoke(f"job listings {query}")
+                search_results = self.context.compress("job_search", query, raw_results)
+            except Exception as search_error:
+                # Generate without listings from the web, but don't cache the weaker answer
+                record_agent_error("job_search", search_error)
+                search_results, cacheable = "", False
+
+            try:
                 # Generate the response using the async chain
-                chain = prompt | self.model
+                emit_progress("generation_started", namespace="job_search")
+                chain = JOB_SEARCH_PROMPT | self.model
                 response = await chain.ainvoke({
                     "query": query,
                     "search_results": search_results
                 })
                 
                 content = response.content
-
-        except Exception as e:
-            print(f"Search error: {str(e)}")
-            content = self._fallback_response(query)
+                if cacheable:
+                    self.cache.set("job_search", cache_key, content)
+            except Exception as e:
+                record_agent_error("job_search", e)
+                content = self._fallback_response(query)
 
         # Save the response to a file
         file_path = save_file(
             content=content,
-            filename=f"job_search_{query.replace(' ', '_')[:30]}",
-            extension="md"
+            kind="job_search",
+            query=query
         )
 
         return {
@@ -146,21 +170,38 @@ class JobSearch:
             "file_path": file_path
         }
 
+    async def find_jobs_stream(self, query: str) -> AsyncIterator[Dict[str, Any]]:
+        """Stream job listings token by token, writing the markdown file as they arrive."""
+        if self.use_fallback:
+            result = self._fallback_result(query)
+            yield make_event("start")
+            yield make_event("token", text=result["content"], fallback=True)
+            yield make_event("done", file_path=result["file_path"], characters=len(result["content"]))
+            return
+
+        async def prepare():
+            raw_results = await self.search_tool.ainvoke(f"job listings {query}")
+            search_results = self.context.compress("job_search", query, raw_results)
+            return {"query": query, "search_results": search_results}
+
+        async for event in stream_markdown(
+            JOB_SEARCH_PROMPT | self.model,
+            prepare,
+            cache=self.cache,
+            namespace="job_search",
+            cache_key=self.cache.make_key("job_search", self.model, JOB_SEARCH_PROMPT, query),
+            fallback=lambda: self._fallback_response(query),
+            query=query
+        ):
+            yield event
+
     def find_jobs(self, query: str) -> Dict[str, str]:
-        """Synchronous wrapper for job search. Prefer using find_jobs_async for async contexts."""
+        """Synchronous wrapper for job search. Prefer using find_jobs_async for async contexts.
+        
+        Safe to call whether or not an event loop is already running in this thread.
+        """
         try:
-            return asyncio.run(self.find_jobs_async(query))
+            return run_sync(self.find_jobs_async(query))
         except Exception as e:
-            print(f"API error: {str(e)}")
-            content = self._fallback_response(query)
-            file_path = save_file(
-                content=content,
-                filename=f"job_search_{query.replace(' ', '_')[:30]}",
-                extension="md"
-            )
-            return {
-                "content": content,
-                "file_path": file_path
-            }
-
-
+            record_agent_error("job_search", e)
+            return self._fallback_result(query)
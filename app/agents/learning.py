@@ -1,24 +1,74 @@
-from typing import Dict, Any
+from typing import AsyncIterator, Dict, Any, List, Optional
 import random
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.tools import DuckDuckGoSearchResults
 
-from app.config import GOOGLE_API_KEY, GEMINI_PRO_MODEL
-from app.utils.file_utils import save_file
+from app.config import GEMINI_PRO_MODEL
+from app.services.artifacts import save_file
+from app.services.breaker import FallbackFlag
+from app.services.clients import get_chat_model
+from app.services.context import get_context_compressor
+from app.services.llm_cache import get_llm_cache
+from app.services.metrics import MeteredModel, counts_fallback, record_agent_error
+from app.services.search_cache import get_cached_search_tool
+from app.services.streaming import emit_progress, stream_markdown
+
+TUTORIAL_PROMPT = ChatPromptTemplate.from_template(
+    "You are an expert in generative AI and technical writing. "
+    "I need you to create a comprehensive tutorial based on the following request:\n\n"
+    "{query}\n\n"
+    "Here's some information I found from a web search that might be helpful:\n"
+    "{search_results}\n\n"
+    "Please provide a well-structured tutorial with explanations, examples, and code snippets where appropriate. "
+    "Format your response in markdown with clear headings, subheadings, and sections."
+)
+
+ANSWER_PROMPT = ChatPromptTemplate.from_template(
+    "You are an expert in generative AI and related technologies. "
+    "I have a question about generative AI that I need you to answer:\n\n"
+    "{query}\n\n"
+    "{chat_history}"
+    "Here's some information I found from a web search that might be helpful:\n"
+    "{search_results}\n\n"
+    "Please provide a comprehensive and educational answer. "
+    "Include examples and explanations where appropriate. Format your response in markdown."
+)
+
+def format_chat_history(chat_history: Optional[List[Dict[str, str]]]) -> str:
+    """Render previous chat messages as a prompt section (empty when there are none)."""
+    if not chat_history:
+        return ""
+    
+    formatted_history = "Here's our conversation so far:\n"
+    for msg in chat_history:
+        role = "Assistant" if msg["role"] == "assistant" else "User"
+        formatted_history += f"{role}: {msg['content']}\n"
+    return formatted_history + "\n"
 
 class LearningResourceAgent:
     """Agent for creating learning resources and answering queries about generative AI."""
     
-    def __init__(self):
-        """Initialize the learning resource agent."""
-        self.model = ChatGoogleGenerativeAI(
-            model=GEMINI_PRO_MODEL,
-            google_api_key=GOOGLE_API_KEY
-        )
-        self.search_tool = DuckDuckGoSearchResults()
+    # Fallback content in testing mode, or while Gemini's circuit breaker is open
+    use_fallback = FallbackFlag("gemini")
+    
+    # Calls are recorded in the LLM metrics under the agent's name
+    model = MeteredModel("learning")
+    
+    def __init__(self, model=None, search_tool=None, cache=None, context=None):
+        """Initialize the learning resource agent.
+        
+        Args:
+            model: Optional chat model (defaults to the shared Gemini client)
+            search_tool: Optional search tool (defaults to the shared cached search provider)
+            cache: Optional response cache (defaults to the shared LLM cache)
+            context: Optional search context compressor (defaults to the shared one)
+        """
+        self.model = model or get_chat_model(GEMINI_PRO_MODEL)
+        self.search_tool = search_tool or get_cached_search_tool()
+        self.cache = cache or get_llm_cache()
+        self.context = context or get_context_compressor()
         self.use_fallback = False
     
+    @counts_fallback("learning")
     def _fallback_response(self, query: str) -> str:
         """Generate a fallback response when API limits are reached."""
         return f"""# Response to: {query}
@@ -49,35 +99,32 @@ For more information, consider exploring resources from organizations like OpenA
     
     def create_tutorial(self, query: str) -> Dict[str, str]:
         """Create a tutorial based on the user's query."""
-        try:
-            prompt = ChatPromptTemplate.from_template(
-                "You are an expert in generative AI and technical writing. "
-                "I need you to create a comprehensive tutorial based on the following request:\n\n"
-                "{query}\n\n"
-                "Here's some information I found from a web search that might be helpful:\n"
-                "{search_results}\n\n"
-                "Please provide a well-structured tutorial with explanations, examples, and code snippets where appropriate. "
-                "Format your response in markdown with clear headings, subheadings, and sections."
-            )
-            
-            search_results = self.search_tool.invoke(f"tutorial {query}")
-            
-            chain = prompt | self.model
-            response = chain.invoke({
-                "query": query,
-                "search_results": search_results
-            })
-            
-            content = response.content
-        except Exception as e:
-            print(f"API error: {str(e)}")
-            self.use_fallback = True
+        cache_key = self.cache.make_key("tutorial", self.model, TUTORIAL_PROMPT, query)
+        content = self.cache.get("tutorial", cache_key, query=query)
+        if content is None and self.use_fallback:
+            # Gemini's circuit is open: skip the web search for a call that would fail fast
             content = self._fallback_response(query)
+        if content is None:
+            try:
+                raw_results = self.search_tool.invoke(f"tutorial {query}")
+                search_results = self.context.compress("tutorial", query, raw_results)
+                
+                chain = TUTORIAL_PROMPT | self.model
+                response = chain.invoke({
+                    "query": query,
+                    "search_results": search_results
+                })
+                
+                content = response.content
+                self.cache.set("tutorial", cache_key, content, query=query)
+            except Exception as e:
+                record_agent_error("tutorial", e)
+                content = self._fallback_response(query)
         
         file_path = save_file(
             content=content,
-            filename=f"tutorial_{query.replace(' ', '_')[:30]}",
-            extension="md"
+            kind="tutorial",
+            query=query
         )
         
         return {
@@ -85,43 +132,135 @@ For more information, consider exploring resources from organizations like OpenA
             "file_path": file_path
         }
     
-    def answer_query(self, query: str) -> Dict[str, str]:
-        """Answer a query about generative AI."""
-        try:
-            prompt = ChatPromptTemplate.from_template(
-                "You are an expert in generative AI and related technologies. "
-                "I have a question about generative AI that I need you to answer:\n\n"
-                "{query}\n\n"
-                "Here's some information I found from a web search that might be helpful:\n"
-                "{search_results}\n\n"
-                "Please provide a comprehensive and educational answer. "
-                "Include examples and explanations where appropriate. Format your response in markdown."
-            )
-            
-            search_results = self.search_tool.invoke(query)
-            
-            chain = prompt | self.model
-            response = chain.invoke({
-                "query": query,
-                "search_results": search_results
-            })
-            
-            content = response.content
-        except Exception as e:
-            print(f"API error: {str(e)}")
-            self.use_fallback = True
+    async def create_tutorial_async(self, query: str) -> Dict[str, str]:
+        """Create a tutorial based on the user's query without blocking the event loop."""
+        cache_key = self.cache.make_key("tutorial", self.model, TUTORIAL_PROMPT, query)
+        content = await self.cache.get_async("tutorial", cache_key, query=query)
+        if content is None and self.use_fallback:
+            # Gemini's circuit is open: skip the web search for a call that would fail fast
             content = self._fallback_response(query)
+        if content is None:
+            try:
+                raw_results = await self.search_tool.ainvoke(f"tutorial {query}")
+                search_results = self.context.compress("tutorial", query, raw_results)
+                
+                emit_progress("generation_started", namespace="tutorial")
+                chain = TUTORIAL_PROMPT | self.model
+                response = await chain.ainvoke({
+                    "query": query,
+                    "search_results": search_results
+                })
+                
+                content = response.content
+                self.cache.set("tutorial", cache_key, content, query=query)
+            except Exception as e:
+                record_agent_error("tutorial", e)
+                content = self._fallback_response(query)
         
         file_path = save_file(
             content=content,
-            filename=f"answer_{query.replace(' ', '_')[:30]}",
-            extension="md"
+            kind="tutorial",
+            query=query
         )
         
         return {
             "content": content,
             "file_path": file_path
         }
-
-
-
+    
+    async def create_tutorial_stream(self, query: str) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a tutorial token by token, writing the markdown file as it arrives."""
+        async def prepare():
+            raw_results = await self.search_tool.ainvoke(f"tutorial {query}")
+            search_results = self.context.compress("tutorial", query, raw_results)
+            return {"query": query, "search_results": search_results}
+        
+        async for event in stream_markdown(
+            TUTORIAL_PROMPT | self.model,
+            prepare,
+            cache=self.cache,
+            namespace="tutorial",
+            cache_key=self.cache.make_key("tutorial", self.model, TUTORIAL_PROMPT, query),
+            fallback=lambda: self._fallback_response(query),
+            query=query
+        ):
+            yield event
+    
+    def answer_query(self, query: str, chat_history: Optional[List[Dict[str, str]]] = None) -> Dict[str, str]:
+        """Answer a query about generative AI."""
+        cache_key = self.cache.make_key("answer", self.model, ANSWER_PROMPT, query + format_chat_history(chat_history))
+        # Answers that follow up on a conversation depend on it, so only standalone questions match paraphrases
+        semantic_query = None if chat_history else query
+        content = self.cache.get("answer", cache_key, query=semantic_query)
+        if content is None and self.use_fallback:
+            # Gemini's circuit is open: skip the web search for a call that would fail fast
+            content = self._fallback_response(query)
+        if content is None:
+            try:
+                raw_results = self.search_tool.invoke(query)
+                search_results = self.context.compress("answer", query, raw_results)
+                
+                chain = ANSWER_PROMPT | self.model
+                response = chain.invoke({
+                    "query": query,
+                    "chat_history": format_chat_history(chat_history),
+                    "search_results": search_results
+                })
+                
+                content = response.content
+                self.cache.set("answer", cache_key, content, query=semantic_query)
+            except Exception as e:
+                record_agent_error("answer", e)
+                content = self._fallback_response(query)
+        
+        file_path = save_file(
+            content=content,
+            kind="answer",
+            query=query
+        )
+        
+        return {
+            "content": content,
+            "file_path": file_path,
+            "role": "assistant"
+        }
+    
+    async def answer_query_async(self, query: str, chat_history: Optional[List[Dict[str, str]]] = None) -> Dict[str, str]:
+        """Answer a query about generative AI without blocking the event loop."""
+        cache_key = self.cache.make_key("answer", self.model, ANSWER_PROMPT, query + format_chat_history(chat_history))
+        # Answers that follow up on a conversation depend on it, so only standalone questions match paraphrases
+        semantic_query = None if chat_history else query
+        content = await self.cache.get_async("answer", cache_key, query=semantic_query)
+        if content is None and self.use_fallback:
+            # Gemini's circuit is open: skip the web search for a call that would fail fast
+            content = self._fallback_response(query)
+        if content is None:
+            try:
+                raw_results = await self.search_tool.ainvoke(query)
+                search_results = self.context.compress("answer", query, raw_results)
+                
+                emit_progress("generation_started", namespace="answer")
+                chain = ANSWER_PROMPT | self.model
+                response = await chain.ainvoke({
+                    "query": query,
+                    "chat_history": format_chat_history(chat_history),
+                    "search_results": search_results
+                })
+                
+                content = response.content
+                self.cache.set("answer", cache_key, content, query=semantic_query)
+            except Exception as e:
+                record_agent_error("answer", e)
+                content = self._fallback_response(query)
+        
+        file_path = save_file(
+            content=content,
+            kind="answer",
+            query=query
+        )
+        
+        return {
+            "content": content,
+            "file_path": file_path,
+            "role": "assistant"
+        }
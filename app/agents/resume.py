@@ -1,25 +1,54 @@
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any
 import random
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.tools import DuckDuckGoSearchResults
 
-from app.config import GOOGLE_API_KEY, GEMINI_PRO_MODEL, USE_MOCK_RESPONSES
-from app.utils.file_utils import save_file
+from app.config import GEMINI_PRO_MODEL, USE_MOCK_RESPONSES
+from app.services.artifacts import save_file
+from app.services.breaker import FallbackFlag
+from app.services.clients import get_chat_model
+from app.services.context import get_context_compressor
+from app.services.llm_cache import get_llm_cache
+from app.services.metrics import MeteredModel, counts_fallback, record_agent_error
+from app.services.search_cache import get_cached_search_tool
+from app.services.streaming import emit_progress, make_event, stream_markdown
+
+RESUME_PROMPT = ChatPromptTemplate.from_template(
+    "You are an expert resume writer specializing in tech and AI careers. "
+    "I need you to create or improve a resume based on the following information:\n\n"
+    "{user_input}\n\n"
+    "Here's some information I found from a web search that might be helpful:\n"
+    "{search_results}\n\n"
+    "Please create a professional resume that highlights the relevant skills, "
+    "experience, and qualifications. Format your response in markdown with clear "
+    "sections for summary, skills, experience, education, etc."
+)
 
 class ResumeMaker:
     """Agent for creating and improving resumes."""
     
-    def __init__(self):
-        """Initialize the resume maker agent."""
+    # Fallback content in testing mode, or while Gemini's circuit breaker is open
+    use_fallback = FallbackFlag("gemini")
+    
+    # Calls are recorded in the LLM metrics under the agent's name
+    model = MeteredModel("resume")
+    
+    def __init__(self, model=None, search_tool=None, cache=None, context=None):
+        """Initialize the resume maker agent.
+        
+        Args:
+            model: Optional chat model (defaults to the shared Gemini client)
+            search_tool: Optional search tool (defaults to the shared cached search provider)
+            cache: Optional response cache (defaults to the shared LLM cache)
+            context: Optional search context compressor (defaults to the shared one)
+        """
         # Initialize the chat model and search tools
-        self.model = ChatGoogleGenerativeAI(
-            model=GEMINI_PRO_MODEL,
-            google_api_key=GOOGLE_API_KEY
-        )
-        self.search_tool = DuckDuckGoSearchResults()
+        self.model = model or get_chat_model(GEMINI_PRO_MODEL)
+        self.search_tool = search_tool or get_cached_search_tool()
+        self.cache = cache or get_llm_cache()
+        self.context = context or get_context_compressor()
         self.use_fallback = USE_MOCK_RESPONSES
     
+    @counts_fallback("resume")
     def _fallback_response(self, query: str) -> str:
         """Generate a fallback response when API limits are reached."""
         return f"""# Resume for AI/ML Engineer
@@ -82,6 +111,20 @@ Experienced Machine Learning Engineer with 5+ years of expertise in developing a
 - "Efficient Fine-tuning Strategies for Large Language Models" - ML Journal 2022
 """
     
+    def _fallback_result(self, user_input: str) -> Dict[str, Any]:
+        """Build and save the fallback resume for a request."""
+        content = self._fallback_response(user_input)
+        file_path = save_file(
+            content=content,
+            kind="resume",
+            query=user_input
+        )
+        
+        return {
+            "content": content,
+            "file_path": file_path
+        }
+    
     def create_resume(self, user_input: str) -> Dict[str, Any]:
         """Create or improve a resume based on user input.
         
@@ -91,59 +134,119 @@ Experienced Machine Learning Engineer with 5+ years of expertise in developing a
         Returns:
             A dictionary containing the resume content and file path
         """
-        # If we're in testing mode or have hit API limits before, use fallback
+        # If we're in testing mode, use fallback
         if self.use_fallback:
-            content = self._fallback_response(user_input)
-            file_path = save_file(
-                content=content,
-                filename=f"resume_{user_input.replace(' ', '_')[:30]}",
-                extension="md"
-            )
-            
-            return {
-                "content": content,
-                "file_path": file_path
-            }
-            
-        try:
-            # Create a prompt for resume creation
-            prompt = ChatPromptTemplate.from_template(
-                "You are an expert resume writer specializing in tech and AI careers. "
-                "I need you to create or improve a resume based on the following information:\n\n"
-                "{user_input}\n\n"
-                "Here's some information I found from a web search that might be helpful:\n"
-                "{search_results}\n\n"
-                "Please create a professional resume that highlights the relevant skills, "
-                "experience, and qualifications. Format your response in markdown with clear "
-                "sections for summary, skills, experience, education, etc."
-            )
+            return self._fallback_result(user_input)
             
-            # Perform the search for relevant resume examples
-            search_results = self.search_tool.invoke(f"resume examples for {user_input}")
+        cache_key = self.cache.make_key("resume", self.model, RESUME_PROMPT, user_input)
+        content = self.cache.get("resume", cache_key)
+        if content is None:
+            try:
+                # Perform the search for relevant resume examples
+                raw_results = self.search_tool.invoke(f"resume examples for {user_input}")
+                search_results = self.context.compress("resume", user_input, raw_results)
+                
+                # Generate the response
+                chain = RESUME_PROMPT | self.model
+                response = chain.invoke({
+                    "user_input": user_input,
+                    "search_results": search_results
+                })
+                
+                content = response.content
+                self.cache.set("resume", cache_key, content)
+            except Exception as e:
+                record_agent_error("resume", e)
+                content = self._fallback_response(user_input)
+        
+        # Save the response to a file
+        file_path = save_file(
+            content=content,
+            kind="resume",
+            query=user_input
+        )
+        
+        return {
+            "content": content,
+            "file_path": file_path
+        }
+    
+    async def create_resume_async(self, user_input: str) -> Dict[str, Any]:
+        """Create or improve a resume without blocking the event loop.
+        
+        Args:
+            user_input: User's query with resume details
             
-            # Generate the response
-            chain = prompt | self.model
-            response = chain.invoke({
-                "user_input": user_input,
-                "search_results": search_results
-            })
+        Returns:
+            A dictionary containing the resume content and file path
+        """
+        # If we're in testing mode, use fallback
+        if self.use_fallback:
+            return self._fallback_result(user_input)
             
-            content = response.content
-        except Exception as e:
-            print(f"API error: {str(e)}")
-            self.use_fallback = True
-            content = self._fallback_response(user_input)
+        cache_key = self.cache.make_key("resume", self.model, RESUME_PROMPT, user_input)
+        content = await self.cache.get_async("resume", cache_key)
+        if content is None:
+            try:
+                # Perform the search for relevant resume examples
+                raw_results = await self.search_tool.ainvoke(f"resume examples for {user_input}")
+                search_results = self.context.compress("resume", user_input, raw_results)
+                
+                # Generate the response
+                emit_progress("generation_started", namespace="resume")
+                chain = RESUME_PROMPT | self.model
+                response = await chain.ainvoke({
+                    "user_input": user_input,
+                    "search_results": search_results
+                })
+                
+                content = response.content
+                self.cache.set("resume", cache_key, content)
+            except Exception as e:
+                record_agent_error("resume", e)
+                content = self._fallback_response(user_input)
         
         # Save the response to a file
         file_path = save_file(
             content=content,
-            filename=f"resume_{user_input.replace(' ', '_')[:30]}",
-            extension="md"
+            kind="resume",
+            query=user_input
         )
         
         return {
             "content": content,
             "file_path": file_path
         }
-
-
+    
+    async def create_resume_stream(self, user_input: str) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a resume token by token, writing the markdown file as it arrives.
+        
+        Args:
+            user_input: User's query with resume details
+            
+        Yields:
+            Stream events ending with one that carries the file path
+        """
+        # If we're in testing mode, send the fallback in one go
+        if self.use_fallback:
+            result = self._fallback_result(user_input)
+            yield make_event("start")
+            yield make_event("token", text=result["content"], fallback=True)
+            yield make_event("done", file_path=result["file_path"], characters=len(result["content"]))
+            return
+        
+        async def prepare():
+            raw_results = await self.search_tool.ainvoke(f"resume examples for {user_input}")
+            search_results = self.context.compress("resume", user_input, raw_results)
+            return {"user_input": user_input, "search_results": search_results}
+        
+        async for event in stream_markdown(
+            RESUME_PROMPT | self.model,
+            prepare,
+            cache=self.cache,
+            namespace="resume",
+            cache_key=self.cache.make_key("resume", self.model, RESUME_PROMPT, user_input),
+            fallback=lambda: self._fallback_response(user_input),
+            query=user_input
+        ):
+            yield event
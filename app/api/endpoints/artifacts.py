@@ -0,0 +1,191 @@
+import gzip
+import re
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.artifacts import Artifact, artifact_id_from_path
+from app.services.pool import AgentPool, get_pool
+
+router = APIRouter(prefix="/artifacts", tags=["artifacts"])
+
+# Smaller documents aren't worth the gzip overhead
+GZIP_MIN_BYTES = 512
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+class ArtifactInfo(BaseModel):
+    id: str
+    kind: str
+    query: str
+    size: int
+    created: float
+    sha256: str
+    compressed: bool
+    url: str
+
+def artifact_url(artifact_id: str) -> str:
+    """Return the API path an artifact is served from."""
+    return f"/api/artifacts/{artifact_id}"
+
+def with_artifact(result: Dict[str, Any], include_content: bool = True) -> Dict[str, Any]:
+    """Add the artifact id and URL to a generation result, leaving out the content if asked.
+
+    Args:
+        result: The agent's result with `content` and `file_path`
+        include_content: Whether to keep the document inline
+
+    Returns:
+        The result to send to the client
+    """
+    result = dict(result)
+    artifact_id = artifact_id_from_path(result.get("file_path", ""))
+    result["artifact_id"] = artifact_id
+    result["artifact_url"] = artifact_url(artifact_id)
+    if not include_content:
+        result.pop("content", None)
+    return result
+
+def _info(artifact: Artifact) -> ArtifactInfo:
+    """Describe an artifact for the API."""
+    return ArtifactInfo(
+        id=artifact.id,
+        kind=artifact.kind,
+        query=artifact.query,
+        size=artifact.size,
+        created=artifact.created,
+        sha256=artifact.sha256,
+        compressed=artifact.compressed,
+        url=artifact_url(artifact.id)
+    )
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, as RFC 9110 requires)."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+def _accepts_gzip(header: Optional[str]) -> bool:
+    """Whether an Accept-Encoding header allows gzip."""
+    for coding in (header or "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        params = params.strip().lower()
+        if params.startswith("q="):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single byte range into inclusive (start, end) offsets.
+
+    Args:
+        header: The Range header
+        size: Length of the document in bytes
+
+    Returns:
+        The range, or None if the header isn't a single valid byte range (the full document is sent)
+
+    Raises:
+        HTTPException: 416 if the range lies outside the document
+    """
+    match = _RANGE_PATTERN.match(header.strip())
+    if match is None or match.group(1) == match.group(2) == "":
+        return None
+
+    first, last = match.group(1), match.group(2)
+    if first == "":
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+        if int(last) == 0:
+            start = size
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+
+    if start >= size:
+        raise HTTPException(status_code=416, detail="Range not satisfiable",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+@router.get("", response_model=List[ArtifactInfo])
+async def list_artifacts(
+    kind: Optional[str] = None,
+    q: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    pool: AgentPool = Depends(get_pool)
+):
+    """List saved artifacts, newest first, optionally filtered by kind and query text."""
+    return [_info(artifact) for artifact in pool.artifacts.list(kind=kind, query=q, limit=limit, offset=offset)]
+
+@router.get("/{artifact_id}/info", response_model=ArtifactInfo)
+async def get_artifact_info(artifact_id: str, pool: AgentPool = Depends(get_pool)):
+    """Return an artifact's metadata."""
+    artifact = pool.artifacts.get(artifact_id)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    return _info(artifact)
+
+@router.get("/{artifact_id}")
+async def get_artifact(artifact_id: str, request: Request, pool: AgentPool = Depends(get_pool)):
+    """Serve an artifact's markdown with ETag revalidation, byte ranges and gzip.
+
+    Artifacts are content-addressed and never change, so responses are
+    cacheable indefinitely. Ranges are served from the uncompressed document.
+    """
+    artifact = pool.artifacts.get(artifact_id)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and if_range and if_range.strip() != f'"{artifact.sha256}"':
+        range_header = None
+    use_gzip = (
+        not range_header
+        and artifact.size >= GZIP_MIN_BYTES
+        and _accepts_gzip(request.headers.get("accept-encoding"))
+    )
+
+    # Each content coding is a different representation and needs its own strong ETag
+    etag = f'"{artifact.sha256}-gzip"' if use_gzip else f'"{artifact.sha256}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes",
+        "Vary": "Accept-Encoding",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    content = pool.artifacts.read(artifact_id)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    data = content.encode("utf-8")
+    media_type = "text/markdown; charset=utf-8"
+
+    byte_range = _parse_range(range_header, len(data)) if range_header else None
+    if byte_range is not None:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+        return Response(content=data[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        data = gzip.compress(data, compresslevel=6)
+    return Response(content=data, media_type=media_type, headers=headers)
@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
+
+from app.config import BATCH_CONCURRENCY, BATCH_MAX_ITEMS
+from app.services.pool import AgentPool, get_pool
+from app.services.streaming import sse_response
+from app.workflows.batch import run_batch, stream_batch
+from app.workflows.graph import get_workflow
+from app.workflows.intent import INTENT_ROUTES
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+
+class BatchItemRequest(BaseModel):
+    query: str
+    route: Optional[str] = None
+
+    @field_validator("route")
+    @classmethod
+    def check_route(cls, route: Optional[str]) -> Optional[str]:
+        """Only leaf routes of the workflow can be forced."""
+        if route and route not in INTENT_ROUTES:
+            raise ValueError(f"route must be one of {', '.join(INTENT_ROUTES)}")
+        return route or None
+
+class BatchRequest(BaseModel):
+    items: List[BatchItemRequest] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    concurrency: int = Field(BATCH_CONCURRENCY, ge=1, le=BATCH_CONCURRENCY)
+
+class BatchItemResult(BaseModel):
+    index: int
+    query: str
+    route: Optional[str] = None
+    status: str
+    category: Optional[str] = None
+    response: Optional[str] = None
+    degraded: Optional[List[str]] = None
+    partial: Optional[bool] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
+    total: int
+    unique: int
+    succeeded: int
+    failed: int
+
+@router.post("", response_model=BatchResponse, response_model_exclude_none=True)
+async def run_batch_queries(request: BatchRequest, pool: AgentPool = Depends(get_pool)):
+    """Run many queries at once with bounded concurrency, returning results in request order."""
+    return await run_batch(
+        get_workflow(),
+        [(item.query, item.route) for item in request.items],
+        config={"configurable": {"pool": pool}},
+        concurrency=request.concurrency
+    )
+
+@router.post("/stream")
+async def stream_batch_queries(request: BatchRequest, pool: AgentPool = Depends(get_pool)):
+    """Run many queries at once, streaming each result as server-sent events as it completes."""
+    return sse_response(stream_batch(
+        get_workflow(),
+        [(item.query, item.route) for item in request.items],
+        config={"configurable": {"pool": pool}},
+        concurrency=request.concurrency
+    ))
@@ -1,8 +1,14 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 
-from app.agents.interview import InterviewAgent
+from app.config import MOCK_WS_IDLE_TIMEOUT, MOCK_WS_MAX_BUFFERED_EVENTS, MOCK_WS_SEND_TIMEOUT
+from app.api.endpoints.artifacts import with_artifact
+from app.services.deadlines import request_timeout, run_request, tracked_stream
+from app.services.pool import AgentPool, get_pool
+from app.services.streaming import make_event, pump_events, sse_response
 
 router = APIRouter(prefix="/interview", tags=["interview"])
 
@@ -18,29 +24,53 @@ class ChatRequest(BaseModel):
     chat_history: Optional[List[ChatMessage]] = None
     
 class InterviewResponse(BaseModel):
-    content: str
+    content: Optional[str] = None
     file_path: str
+    artifact_id: Optional[str] = None
+    artifact_url: Optional[str] = None
+    degraded: Optional[List[str]] = None
+    partial: Optional[bool] = None
     
 class ChatResponse(BaseModel):
     content: str
     role: str
+    degraded: Optional[List[str]] = None
+    partial: Optional[bool] = None
+    
+class SessionResponse(BaseModel):
+    content: str
+    role: str
+    session_id: str
+    turn: int
 
-@router.post("/questions", response_model=InterviewResponse)
-async def generate_interview_questions(request: QueryRequest):
+@router.post("/questions", response_model=InterviewResponse, response_model_exclude_none=True)
+async def generate_interview_questions(request: QueryRequest, http_request: Request, include_content: bool = True,
+                                       pool: AgentPool = Depends(get_pool)):
     """Generate interview questions based on the user's query."""
     try:
-        agent = InterviewAgent()
-        result = agent.generate_interview_questions(request.query)
-        return result
+        result = await run_request(
+            http_request,
+            "interview.questions",
+            request.query,
+            lambda: pool.interview.generate_interview_questions_async(request.query),
+            pool.coalescer
+        )
+        return with_artifact(result, include_content)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating interview questions: {str(e)}")
 
+@router.post("/questions/stream")
+async def stream_interview_questions(request: QueryRequest, http_request: Request, pool: AgentPool = Depends(get_pool)):
+    """Stream interview questions as server-sent events, ending with the saved file path."""
+    return sse_response(tracked_stream(
+        pool.interview.generate_interview_questions_stream(request.query),
+        request_timeout(http_request, "interview.questions")
+    ))
+
 @router.post("/mock", response_model=ChatResponse)
-async def conduct_mock_interview(request: ChatRequest):
+async def conduct_mock_interview(request: ChatRequest, http_request: Request, pool: AgentPool = Depends(get_pool)):
     """Conduct a mock interview session."""
     try:
-        agent = InterviewAgent()
-        
         # Convert chat history to the format expected by the agent
         chat_history = None
         if request.chat_history:
@@ -49,7 +79,99 @@ async def conduct_mock_interview(request: ChatRequest):
                 for msg in request.chat_history
             ]
             
-        result = agent.conduct_mock_interview(request.query, chat_history)
+        result = await run_request(
+            http_request,
+            "interview.mock",
+            request.query,
+            lambda: pool.interview.conduct_mock_interview_async(request.query, chat_history)
+        )
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error conducting mock interview: {str(e)}")
+
+@router.post("/sessions", response_model=SessionResponse)
+async def start_interview_session(request: QueryRequest, pool: AgentPool = Depends(get_pool)):
+    """Start a server-side mock interview session; later turns only send the candidate's message."""
+    try:
+        return await pool.interview.start_session_async(request.query)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error starting mock interview: {str(e)}")
+
+@router.post("/sessions/{session_id}", response_model=SessionResponse)
+async def continue_interview_session(session_id: str, request: QueryRequest, pool: AgentPool = Depends(get_pool)):
+    """Send the candidate's next message in a mock interview session."""
+    try:
+        result = await pool.interview.conduct_session_turn_async(session_id, request.query)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error conducting mock interview: {str(e)}")
+    if result is None:
+        raise HTTPException(status_code=404, detail="Interview session not found")
+    return result
+
+@router.get("/sessions/{session_id}")
+async def get_interview_session(session_id: str, pool: AgentPool = Depends(get_pool)):
+    """Return a mock interview session's summary and recent messages."""
+    session = await pool.sessions.get_async(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Interview session not found")
+    return session.to_dict()
+
+@router.delete("/sessions/{session_id}")
+async def end_interview_session(session_id: str, pool: AgentPool = Depends(get_pool)):
+    """End a mock interview session and discard its history."""
+    if not await pool.sessions.delete_async(session_id):
+        raise HTTPException(status_code=404, detail="Interview session not found")
+    return {"session_id": session_id, "deleted": True}
+
+def _message_content(text: str) -> str:
+    """Read the candidate's message from a WebSocket frame ({"content": ...} or plain text)."""
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return text.strip()
+    if isinstance(message, dict):
+        return str(message.get("content", "")).strip()
+    return str(message).strip()
+
+@router.websocket("/ws")
+async def mock_interview_socket(websocket: WebSocket, pool: AgentPool = Depends(get_pool)):
+    """Run a mock interview over a WebSocket, streaming each interviewer reply token by token.
+    
+    Connect with `?session_id=...` to resume a session; otherwise the first message
+    starts a new one and a `session` event returns its id. Each candidate message
+    is answered with `token` events followed by a `done` event.
+    """
+    await websocket.accept()
+    session_id = websocket.query_params.get("session_id")
+    if session_id and await pool.sessions.get_async(session_id) is None:
+        await websocket.close(code=4404, reason="Interview session not found")
+        return
+    
+    try:
+        while True:
+            try:
+                text = await asyncio.wait_for(websocket.receive_text(), timeout=MOCK_WS_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                await websocket.close(code=1000, reason="Idle timeout")
+                return
+            
+            content = _message_content(text)
+            if not content:
+                await websocket.send_json(make_event("error", detail="Empty message"))
+                continue
+            
+            if session_id is None:
+                session_id = (await pool.sessions.create_async(topic=content)).session_id
+                await websocket.send_json(make_event("session", session_id=session_id))
+            
+            await pump_events(
+                pool.interview.stream_session_turn_async(session_id, content),
+                websocket.send_json,
+                max_buffered=MOCK_WS_MAX_BUFFERED_EVENTS,
+                send_timeout=MOCK_WS_SEND_TIMEOUT
+            )
+    except WebSocketDisconnect:
+        return
+    except asyncio.TimeoutError:
+        # The client stopped reading; drop it rather than buffer without bound
+        await websocket.close(code=1013, reason="Client too slow")
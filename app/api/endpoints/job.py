@@ -1,7 +1,12 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
+from typing import List, Optional
 
-from app.agents.job import JobSearch
+from app.api.endpoints.artifacts import with_artifact
+from app.services.deadlines import ClientDisconnected, DeadlineExceeded, request_timeout, run_request, tracked_stream
+from app.services.metrics import record_agent_error
+from app.services.pool import AgentPool, get_pool
+from app.services.streaming import sse_response
 
 router = APIRouter(prefix="/job", tags=["job"])
 
@@ -9,25 +14,40 @@ class QueryRequest(BaseModel):
     query: str
     
 class JobResponse(BaseModel):
-    content: str
+    content: Optional[str] = None
     file_path: str
+    artifact_id: Optional[str] = None
+    artifact_url: Optional[str] = None
+    degraded: Optional[List[str]] = None
+    partial: Optional[bool] = None
 
-@router.post("/search", response_model=JobResponse)
-async def search_jobs(request: QueryRequest):
+@router.post("/search", response_model=JobResponse, response_model_exclude_none=True)
+async def search_jobs(request: QueryRequest, http_request: Request, include_content: bool = True,
+                      pool: AgentPool = Depends(get_pool)):
     """Search for jobs based on the user's query."""
     try:
-        agent = JobSearch()
-        result = agent.find_jobs(request.query)
-        return result
+        result = await run_request(
+            http_request,
+            "job.search",
+            request.query,
+            lambda: pool.job.find_jobs_async(request.query),
+            pool.coalescer
+        )
+        return with_artifact(result, include_content)
+    except (ClientDisconnected, DeadlineExceeded):
+        # Nobody is waiting for a fallback, or it would arrive too late to be of use
+        raise
     except Exception as e:
-        # Log the error
-        print(f"Error in job search: {str(e)}")
+        record_agent_error("job.search", e)
         
         # Create a fallback response
-        agent = JobSearch()
-        agent.use_fallback = True
-        result = agent.find_jobs(request.query)
-        return result
-
-
+        fallback = {**pool.job._fallback_result(request.query), "degraded": ["fallback"], "partial": False}
+        return with_artifact(fallback, include_content)
 
+@router.post("/search/stream")
+async def stream_jobs(request: QueryRequest, http_request: Request, pool: AgentPool = Depends(get_pool)):
+    """Stream job listings as server-sent events, ending with the saved file path."""
+    return sse_response(tracked_stream(
+        pool.job.find_jobs_stream(request.query),
+        request_timeout(http_request, "job.search")
+    ))
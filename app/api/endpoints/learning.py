@@ -1,8 +1,12 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 
-from app.agents.learning import LearningResourceAgent
+from app.agents.learning import format_chat_history
+from app.api.endpoints.artifacts import with_artifact
+from app.services.deadlines import request_timeout, run_request, tracked_stream
+from app.services.pool import AgentPool, get_pool
+from app.services.streaming import sse_response
 
 router = APIRouter(prefix="/learning", tags=["learning"])
 
@@ -18,29 +22,47 @@ class ChatRequest(BaseModel):
     chat_history: Optional[List[ChatMessage]] = None
     
 class TutorialResponse(BaseModel):
-    content: str
+    content: Optional[str] = None
     file_path: str
+    artifact_id: Optional[str] = None
+    artifact_url: Optional[str] = None
+    degraded: Optional[List[str]] = None
+    partial: Optional[bool] = None
     
 class ChatResponse(BaseModel):
     content: str
     role: str
+    degraded: Optional[List[str]] = None
+    partial: Optional[bool] = None
 
-@router.post("/tutorial", response_model=TutorialResponse)
-async def create_tutorial(request: QueryRequest):
+@router.post("/tutorial", response_model=TutorialResponse, response_model_exclude_none=True)
+async def create_tutorial(request: QueryRequest, http_request: Request, include_content: bool = True,
+                          pool: AgentPool = Depends(get_pool)):
     """Create a tutorial based on the user's query."""
     try:
-        agent = LearningResourceAgent()
-        result = agent.create_tutorial(request.query)
-        return result
+        result = await run_request(
+            http_request,
+            "learning.tutorial",
+            request.query,
+            lambda: pool.learning.create_tutorial_async(request.query),
+            pool.coalescer
+        )
+        return with_artifact(result, include_content)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating tutorial: {str(e)}")
 
+@router.post("/tutorial/stream")
+async def stream_tutorial(request: QueryRequest, http_request: Request, pool: AgentPool = Depends(get_pool)):
+    """Stream a tutorial as server-sent events, ending with the saved file path."""
+    return sse_response(tracked_stream(
+        pool.learning.create_tutorial_stream(request.query),
+        request_timeout(http_request, "learning.tutorial")
+    ))
+
 @router.post("/query", response_model=ChatResponse)
-async def answer_query(request: ChatRequest):
+async def answer_query(request: ChatRequest, http_request: Request, pool: AgentPool = Depends(get_pool)):
     """Answer a query about Generative AI."""
     try:
-        agent = LearningResourceAgent()
-        
         # Convert chat history to the format expected by the agent
         chat_history = None
         if request.chat_history:
@@ -49,7 +71,13 @@ async def answer_query(request: ChatRequest):
                 for msg in request.chat_history
             ]
             
-        result = agent.answer_query(request.query, chat_history)
+        result = await run_request(
+            http_request,
+            "learning.query",
+            request.query + format_chat_history(chat_history),
+            lambda: pool.learning.answer_query_async(request.query, chat_history),
+            pool.coalescer
+        )
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error answering query: {str(e)}")
\ No newline at end of file
@@ -1,7 +1,12 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
+from typing import List, Optional
 
-from app.agents.resume import ResumeMaker
+from app.api.endpoints.artifacts import with_artifact
+from app.services.deadlines import ClientDisconnected, DeadlineExceeded, request_timeout, run_request, tracked_stream
+from app.services.metrics import record_agent_error
+from app.services.pool import AgentPool, get_pool
+from app.services.streaming import sse_response
 
 router = APIRouter(prefix="/resume", tags=["resume"])
 
@@ -9,22 +14,40 @@ class QueryRequest(BaseModel):
     query: str
     
 class ResumeResponse(BaseModel):
-    content: str
+    content: Optional[str] = None
     file_path: str
+    artifact_id: Optional[str] = None
+    artifact_url: Optional[str] = None
+    degraded: Optional[List[str]] = None
+    partial: Optional[bool] = None
 
-@router.post("/create", response_model=ResumeResponse)
-async def create_resume(request: QueryRequest):
+@router.post("/create", response_model=ResumeResponse, response_model_exclude_none=True)
+async def create_resume(request: QueryRequest, http_request: Request, include_content: bool = True,
+                        pool: AgentPool = Depends(get_pool)):
     """Create a resume based on the user's query."""
     try:
-        agent = ResumeMaker()
-        result = agent.create_resume(request.query)
-        return result
+        result = await run_request(
+            http_request,
+            "resume.create",
+            request.query,
+            lambda: pool.resume.create_resume_async(request.query),
+            pool.coalescer
+        )
+        return with_artifact(result, include_content)
+    except (ClientDisconnected, DeadlineExceeded):
+        # Nobody is waiting for a fallback, or it would arrive too late to be of use
+        raise
     except Exception as e:
-        # Log the error
-        print(f"Error creating resume: {str(e)}")
+        record_agent_error("resume.create", e)
         
         # Create a fallback response
-        agent = ResumeMaker()
-        agent.use_fallback = True
-        result = agent.create_resume(request.query)
-        return result
+        fallback = {**pool.resume._fallback_result(request.query), "degraded": ["fallback"], "partial": False}
+        return with_artifact(fallback, include_content)
+
+@router.post("/create/stream")
+async def stream_resume(request: QueryRequest, http_request: Request, pool: AgentPool = Depends(get_pool)):
+    """Stream a resume as server-sent events, ending with the saved file path."""
+    return sse_response(tracked_stream(
+        pool.resume.create_resume_stream(request.query),
+        request_timeout(http_request, "resume.create")
+    ))
@@ -1,9 +1,11 @@
 from fastapi import APIRouter
-from app.api.endpoints import learning, interview, resume, job
+from app.api.endpoints import learning, interview, resume, job, artifacts, batch
 
 router = APIRouter()
 
 router.include_router(learning.router)
 router.include_router(interview.router)
 router.include_router(resume.router)
-router.include_router(job.router)
\ No newline at end of file
+router.include_router(job.router)
+router.include_router(artifacts.router)
+router.include_router(batch.router)
\ No newline at end of file
@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -15,6 +16,171 @@ GEMINI_FLASH_MODEL = "gemini-2.5-flash-preview-05-20"
 # Output folder for generated files
 OUTPUT_FOLDER = os.path.join(os.getcwd(), "output")
 
+# Data folder for local state such as logs and indexes
+DATA_FOLDER = os.path.join(os.getcwd(), "data")
+
+# Local intent classifier - queries below this confidence fall through to the LLM categorizers
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.6"))
+INTENT_LOG_FILE = os.getenv("INTENT_LOG_FILE", os.path.join(DATA_FOLDER, "intent_log.jsonl"))
+# Size at which the intent log is rotated to "<file>.1" (replacing the previous one); 0 never rotates
+INTENT_LOG_MAX_BYTES = int(os.getenv("INTENT_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+# Newest distinct logged queries the classifier is trained on at startup (training time grows with it)
+INTENT_LOG_MAX_EXAMPLES = int(os.getenv("INTENT_LOG_MAX_EXAMPLES", "1000"))
+
+# Output budget for the single LLM routing call (it only ever returns a route name)
+ROUTER_MAX_OUTPUT_TOKENS = int(os.getenv("ROUTER_MAX_OUTPUT_TOKENS", "16"))
+
+# LLM response cache - TTLs in seconds per agent operation (0 disables caching for it)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "True").lower() == "true"
+LLM_CACHE_FILE = os.getenv("LLM_CACHE_FILE", os.path.join(DATA_FOLDER, "llm_cache.sqlite3"))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+# Disk writes that may wait for the cache's writer thread (further ones are dropped)
+LLM_CACHE_WRITE_QUEUE = int(os.getenv("LLM_CACHE_WRITE_QUEUE", "1024"))
+LLM_CACHE_TTLS = {
+    "tutorial": 7 * 24 * 3600,
+    "answer": 24 * 3600,
+    "interview_questions": 24 * 3600,
+    "resume": 24 * 3600,
+    "job_search": 3600,
+    "mock_interview": 0,
+    **json.loads(os.getenv("LLM_CACHE_TTLS", "{}")),
+}
+
+# Semantic answer cache - paraphrases reuse a stored answer above a per-operation cosine similarity
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "True").lower() == "true"
+SEMANTIC_CACHE_THRESHOLDS = {
+    "tutorial": 0.88,
+    "answer": 0.9,
+    "interview_questions": 0.85,
+    **json.loads(os.getenv("SEMANTIC_CACHE_THRESHOLDS", "{}")),
+}
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1024"))
+SEMANTIC_CACHE_DIMENSIONS = int(os.getenv("SEMANTIC_CACHE_DIMENSIONS", "1024"))
+# Eviction drops the entry with the fewest hits discounted by age (halved every half-life, in seconds)
+SEMANTIC_CACHE_HALF_LIFE = float(os.getenv("SEMANTIC_CACHE_HALF_LIFE", str(24 * 3600)))
+# A match may only differ from the query in words found in at least this share of an operation's stored
+# queries (e.g. "write" vs "create"), never in rarer ones like company or framework names; until an
+# operation holds SEMANTIC_CACHE_MIN_QUERIES queries only words written like names ("TCS", "LangChain") may not differ
+SEMANTIC_CACHE_COMMON_SHARE = float(os.getenv("SEMANTIC_CACHE_COMMON_SHARE", "0.25"))
+SEMANTIC_CACHE_MIN_QUERIES = int(os.getenv("SEMANTIC_CACHE_MIN_QUERIES", "20"))
+
+# Search provider - "duckduckgo" for web search, or "local" for the offline BM25 index over a document corpus
+SEARCH_PROVIDER = os.getenv("SEARCH_PROVIDER", "duckduckgo")
+SEARCH_CORPUS_DIR = os.getenv("SEARCH_CORPUS_DIR", os.path.join(DATA_FOLDER, "corpus"))
+SEARCH_INDEX_DIR = os.getenv("SEARCH_INDEX_DIR", os.path.join(DATA_FOLDER, "corpus_index"))
+SEARCH_LOCAL_RESULTS = int(os.getenv("SEARCH_LOCAL_RESULTS", "5"))
+SEARCH_LOCAL_SNIPPET_CHARS = int(os.getenv("SEARCH_LOCAL_SNIPPET_CHARS", "1200"))
+# Seconds between checks of the corpus for changed files (0 only indexes at startup)
+SEARCH_REINDEX_INTERVAL = float(os.getenv("SEARCH_REINDEX_INTERVAL", "60"))
+
+# Search result cache - TTLs in seconds per query prefix (listings go stale fast, tutorials don't)
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "512"))
+SEARCH_CACHE_DEFAULT_TTL = float(os.getenv("SEARCH_CACHE_DEFAULT_TTL", "3600"))
+SEARCH_CACHE_TTLS = json.loads(os.getenv("SEARCH_CACHE_TTLS", "null")) or [
+    ["job listings", 15 * 60],
+    ["tutorial", 7 * 24 * 3600],
+    ["interview questions", 24 * 3600],
+    ["resume examples for", 24 * 3600],
+]
+
+# Search context - token budget per agent operation for the ranked, deduplicated snippets
+SEARCH_CONTEXT_BUDGETS = {
+    "tutorial": 1500,
+    "answer": 1000,
+    "interview_questions": 1000,
+    "resume": 800,
+    "job_search": 1200,
+    "default": 1000,
+    **json.loads(os.getenv("SEARCH_CONTEXT_BUDGETS", "{}")),
+}
+
+# Mock interview sessions - kept in memory, spilled to disk, history folded into a summary past the budget
+MOCK_SESSION_DIR = os.getenv("MOCK_SESSION_DIR", os.path.join(DATA_FOLDER, "sessions"))
+MOCK_SESSION_MEMORY_LIMIT = int(os.getenv("MOCK_SESSION_MEMORY_LIMIT", "1000"))
+MOCK_SESSION_TTL = float(os.getenv("MOCK_SESSION_TTL", str(24 * 3600)))
+# Seconds between sweeps that delete expired spilled sessions (they are also swept on startup and flush)
+MOCK_SESSION_SWEEP_INTERVAL = float(os.getenv("MOCK_SESSION_SWEEP_INTERVAL", "3600"))
+MOCK_HISTORY_TOKEN_BUDGET = int(os.getenv("MOCK_HISTORY_TOKEN_BUDGET", "2000"))
+
+# Mock interview WebSocket - idle and slow-client timeouts in seconds, events buffered per reply
+MOCK_WS_IDLE_TIMEOUT = float(os.getenv("MOCK_WS_IDLE_TIMEOUT", "300"))
+MOCK_WS_SEND_TIMEOUT = float(os.getenv("MOCK_WS_SEND_TIMEOUT", "10"))
+MOCK_WS_MAX_BUFFERED_EVENTS = int(os.getenv("MOCK_WS_MAX_BUFFERED_EVENTS", "64"))
+
+# Start the likely route's web search while the LLM router is still deciding
+SEARCH_PREFETCH_ENABLED = os.getenv("SEARCH_PREFETCH_ENABLED", "True").lower() == "true"
+
+# Identical concurrent requests share one in-flight run instead of each calling the model
+REQUEST_COALESCING_ENABLED = os.getenv("REQUEST_COALESCING_ENABLED", "True").lower() == "true"
+
+# Artifact store - writes queued for the background writer, artifacts per fsync batch
+ARTIFACT_QUEUE_SIZE = int(os.getenv("ARTIFACT_QUEUE_SIZE", "256"))
+ARTIFACT_WRITE_BATCH = int(os.getenv("ARTIFACT_WRITE_BATCH", "32"))
+ARTIFACT_FSYNC = os.getenv("ARTIFACT_FSYNC", "True").lower() == "true"
+
+# Artifact retention - limits enforced by periodic compaction (0 disables a limit), ages in seconds
+ARTIFACT_MAX_AGE = float(os.getenv("ARTIFACT_MAX_AGE", str(30 * 24 * 3600)))
+ARTIFACT_MAX_COUNT = int(os.getenv("ARTIFACT_MAX_COUNT", "10000"))
+ARTIFACT_MAX_BYTES = int(os.getenv("ARTIFACT_MAX_BYTES", str(500 * 1024 * 1024)))
+ARTIFACT_COMPRESS_AFTER = float(os.getenv("ARTIFACT_COMPRESS_AFTER", str(7 * 24 * 3600)))
+ARTIFACT_COMPACT_INTERVAL = float(os.getenv("ARTIFACT_COMPACT_INTERVAL", "600"))
+
+# Batch endpoint - items per request and concurrent runs per batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# LLM scheduler - per-model quota as requests and tokens per minute, shared by every model call
+LLM_SCHEDULER_ENABLED = os.getenv("LLM_SCHEDULER_ENABLED", "True").lower() == "true"
+LLM_RATE_LIMITS = {
+    GEMINI_PRO_MODEL: {"rpm": 150, "tpm": 1_000_000},
+    GEMINI_FLASH_MODEL: {"rpm": 150, "tpm": 1_000_000},
+    **json.loads(os.getenv("LLM_RATE_LIMITS", "{}")),
+}
+# Output tokens assumed for a call without max_output_tokens, until its usage is known
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "1024"))
+# Calls waiting per model, and the longest each priority class may wait before failing fast
+LLM_QUEUE_LIMIT = int(os.getenv("LLM_QUEUE_LIMIT", "256"))
+LLM_MAX_QUEUE_WAIT = {
+    "interactive": 10,
+    "normal": 60,
+    "batch": 300,
+    **json.loads(os.getenv("LLM_MAX_QUEUE_WAIT", "{}")),
+}
+# Retries of rate-limited (429) calls, with full-jitter exponential backoff in seconds
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "30"))
+
+# Circuit breakers per upstream (Gemini, DuckDuckGo) - failure rate over a sliding window in seconds
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW", "60"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1"))
+
+# Request deadlines - latency budget in seconds per endpoint, overridable per request by a header (capped)
+REQUEST_TIMEOUT_HEADER = os.getenv("REQUEST_TIMEOUT_HEADER", "X-Request-Timeout")
+REQUEST_MAX_TIMEOUT = float(os.getenv("REQUEST_MAX_TIMEOUT", "300"))
+# Shortest budget a client may ask for; tinier ones would only ever produce fallbacks
+REQUEST_MIN_TIMEOUT = float(os.getenv("REQUEST_MIN_TIMEOUT", "1"))
+REQUEST_TIMEOUTS = {
+    "workflow": 60,
+    "learning.tutorial": 90,
+    "learning.query": 30,
+    "interview.questions": 60,
+    "interview.mock": 20,
+    "resume.create": 60,
+    "job.search": 45,
+    "batch.item": 90,
+    "default": 60,
+    **json.loads(os.getenv("REQUEST_TIMEOUTS", "{}")),
+}
+# Share of the remaining budget a web search may use before generation goes ahead without it
+SEARCH_BUDGET_SHARE = float(os.getenv("SEARCH_BUDGET_SHARE", "0.3"))
+# Seconds between checks for a disconnected client while its request runs
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+
 # Testing mode - set to True to use mock responses instead of API calls
 USE_MOCK_RESPONSES = os.getenv("USE_MOCK_RESPONSES", "False").lower() == "true"
 
@@ -1,19 +1,39 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
 from typing import Dict, Any
 
 from app.api.router import router
-from app.workflows.graph import create_workflow
+from app.services.breaker import breaker_snapshots
+from app.services.deadlines import deadline_after, deadline_timestamp, request_timeout, run_request
+from app.services.metrics import CONTENT_TYPE, MetricsMiddleware, render_metrics
+from app.services.pool import AgentPool, close_pool, get_pool, init_pool
+from app.services.streaming import sse_response
+from app.workflows.graph import get_workflow
+from app.workflows.progress import stream_workflow
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the shared agent pool on startup and release it on shutdown."""
+    # Building the pool trains the intent classifier, so keep it off the event loop
+    app.state.pool = await asyncio.to_thread(init_pool)
+    yield
+    close_pool()
 
 app = FastAPI(
     title="GenAI Career Assistant API",
     description="API for a career assistant specializing in Generative AI careers",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Include API routers
 app.include_router(router, prefix="/api")
 
+# Count in-flight requests and time each one for /metrics
+app.add_middleware(MetricsMiddleware)
+
 class QueryRequest(BaseModel):
     query: str
 
@@ -22,18 +42,50 @@ class WorkflowResponse(BaseModel):
     response: str
 
 # Create the workflow graph
-workflow = create_workflow()
+workflow = get_workflow()
 
 @app.post("/workflow", response_model=Dict[str, Any])
-async def run_workflow(request: QueryRequest):
+async def run_workflow(request: QueryRequest, http_request: Request, pool: AgentPool = Depends(get_pool)):
     """Run the complete workflow based on the user's query."""
     try:
-        result = workflow.invoke({"query": request.query})
+        result = await run_request(
+            http_request,
+            "workflow",
+            request.query,
+            lambda: workflow.ainvoke(
+                {"query": request.query, "deadline": deadline_timestamp()},
+                config={"configurable": {"pool": pool}}
+            ),
+            pool.coalescer
+        )
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error running workflow: {str(e)}")
 
+@app.post("/workflow/stream")
+async def run_workflow_stream(request: QueryRequest, http_request: Request, pool: AgentPool = Depends(get_pool)):
+    """Run the workflow, streaming routing, search, generation and file events as they happen."""
+    with deadline_after(request_timeout(http_request, "workflow")):
+        state = {"query": request.query, "deadline": deadline_timestamp()}
+    return sse_response(stream_workflow(
+        workflow,
+        state,
+        config={"configurable": {"pool": pool}}
+    ))
+
 @app.get("/")
 async def root():
     """Root endpoint to check if the API is running."""
-    return {"message": "GenAI Career Assistant API is running"}
\ No newline at end of file
+    return {"message": "GenAI Career Assistant API is running"}
+
+@app.get("/health")
+async def health():
+    """Report the circuit breaker state of each upstream (Gemini, DuckDuckGo)."""
+    upstreams = breaker_snapshots()
+    degraded = any(snapshot["state"] != "closed" for snapshot in upstreams.values())
+    return {"status": "degraded" if degraded else "ok", "upstreams": upstreams}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Expose request, graph node, model, search and artifact metrics in the Prometheus text format."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
@@ -6,6 +6,10 @@ class State(TypedDict):
     query: str
     category: str
     response: str
+    route: str
+    confidence: float
+    predicted_route: str
+    deadline: float  # wall-clock time the request must be answered by
 
 class ChatHistory(TypedDict):
     """Chat history for interactive sessions."""
@@ -0,0 +1,640 @@
+import gzip
+import hashlib
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, NamedTuple, Optional, TextIO, Tuple
+
+from app.config import (
+    ARTIFACT_COMPACT_INTERVAL,
+    ARTIFACT_COMPRESS_AFTER,
+    ARTIFACT_FSYNC,
+    ARTIFACT_MAX_AGE,
+    ARTIFACT_MAX_BYTES,
+    ARTIFACT_MAX_COUNT,
+    ARTIFACT_QUEUE_SIZE,
+    ARTIFACT_WRITE_BATCH,
+    OUTPUT_FOLDER,
+)
+from app.services.metrics import ARTIFACT_SAVE_DURATION, ARTIFACT_WRITE_DURATION
+
+logger = logging.getLogger(__name__)
+
+class Artifact(NamedTuple):
+    """A generated markdown document and where it lives on disk."""
+    id: str
+    path: str
+    kind: str
+    query: str
+    size: int
+    sha256: str
+    created: float = 0.0
+    compressed: bool = False
+
+_STOP = object()
+
+_COLUMNS = "id, path, kind, query, size, sha256, created, compressed"
+
+# Documents saved before the store existed are named "<kind>_<query>_<YYYYmmdd_HHMMSS>.md"
+_LEGACY_NAME = re.compile(r"^(?P<stem>.+)_\d{8}_\d{6}\.md$")
+_LEGACY_KINDS = ("interview_questions", "job_search", "tutorial", "answer", "resume")
+
+class ArtifactStore:
+    """Content-addressed store for generated documents with a background writer.
+
+    An artifact's id is derived from its content, so its path is known before
+    anything touches the disk and identical documents are stored once. Writes
+    go through a bounded queue to a writer thread that writes each batch to
+    temporary files, fsyncs them together and renames them into place.
+
+    Metadata lives in an SQLite index next to the files, so lookups and
+    listings never scan the directory. The index is mirrored in memory, so
+    saving (including the dedup check) and lookups by id never wait on
+    SQLite; only the writer thread writes to it. Between batches the writer
+    thread compacts the store: it gzips artifacts past `compress_after` and
+    deletes the oldest ones beyond the age, count and total-size limits.
+    Handing out a stored artifact again on a dedup hit refreshes its
+    `created` time, so retention measures age from its last use. Documents
+    imported from before the store existed are the user's own files:
+    compaction never deletes or compresses them, and they don't count
+    toward the limits.
+    """
+
+    def __init__(self, directory: str = OUTPUT_FOLDER, max_pending: int = ARTIFACT_QUEUE_SIZE,
+                 batch_size: int = ARTIFACT_WRITE_BATCH, fsync: bool = ARTIFACT_FSYNC,
+                 max_age: float = ARTIFACT_MAX_AGE, max_count: int = ARTIFACT_MAX_COUNT,
+                 max_bytes: int = ARTIFACT_MAX_BYTES, compress_after: float = ARTIFACT_COMPRESS_AFTER,
+                 compact_interval: float = ARTIFACT_COMPACT_INTERVAL):
+        """Initialize the store.
+
+        Args:
+            directory: Folder the artifacts and their index are written to
+            max_pending: Number of writes that may wait for the writer thread
+            batch_size: Maximum number of artifacts written per fsync batch
+            fsync: Whether to fsync files and the directory before acknowledging them
+            max_age: Seconds an artifact is kept (0 keeps artifacts regardless of age)
+            max_count: Number of artifacts kept (0 for no limit)
+            max_bytes: Total bytes kept on disk (0 for no limit)
+            compress_after: Seconds after which an artifact is gzipped (0 never compresses)
+            compact_interval: Seconds between compaction passes (0 disables background compaction)
+        """
+        self.directory = directory
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.max_age = max_age
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.compress_after = compress_after
+        self.compact_interval = compact_interval
+        self.stats = {
+            "saved": 0, "deduplicated": 0, "inline_writes": 0, "batches": 0, "write_errors": 0,
+            "compressed": 0, "removed": 0, "compactions": 0, "imported": 0, "legacy_duplicates": 0,
+        }
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._pending: Dict[str, Tuple[Artifact, str]] = {}
+        # In-memory copy of the index by id; _lock guards it and _pending, _db_lock the SQLite connection
+        self._artifacts: Dict[str, Artifact] = {}
+        # Dedup hits not yet written to the index, by id (the writer applies them before compacting)
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+
+        os.makedirs(os.path.join(self.directory, ".partial"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            "id TEXT PRIMARY KEY, path TEXT NOT NULL, kind TEXT NOT NULL, query TEXT NOT NULL, "
+            "size INTEGER NOT NULL, sha256 TEXT NOT NULL, created REAL NOT NULL, "
+            "compressed INTEGER NOT NULL DEFAULT 0, stored_size INTEGER NOT NULL, legacy INTEGER NOT NULL DEFAULT 0)"
+        )
+        if "legacy" not in {row[1] for row in self._db.execute("PRAGMA table_info(artifacts)")}:
+            # Indexes written before imported documents were exempt from retention
+            self._db.execute("ALTER TABLE artifacts ADD COLUMN legacy INTEGER NOT NULL DEFAULT 0")
+        self._db.execute("CREATE INDEX IF NOT EXISTS artifacts_created ON artifacts (created)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS artifacts_kind ON artifacts (kind, created)")
+        self._db.commit()
+        for row in self._db.execute(f"SELECT {_COLUMNS} FROM artifacts"):
+            artifact = self._from_row(row)
+            self._artifacts[artifact.id] = artifact
+
+    def _make_artifact(self, content: str, kind: str, query: str, extension: str) -> Artifact:
+        """Describe the artifact for a piece of content without writing it."""
+        data = content.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        artifact_id = digest[:32]
+        return Artifact(
+            id=artifact_id,
+            path=os.path.join(self.directory, f"{artifact_id}.{extension}"),
+            kind=kind,
+            query=query,
+            size=len(data),
+            sha256=digest,
+            created=time.time()
+        )
+
+    def _from_row(self, row: Tuple[Any, ...]) -> Artifact:
+        """Build an artifact from an index row (paths are stored relative to the directory)."""
+        artifact_id, path, kind, query, size, sha256, created, compressed = row
+        return Artifact(artifact_id, os.path.join(self.directory, path), kind, query,
+                        size, sha256, created, bool(compressed))
+
+    def _claim(self, artifact: Artifact, content: str) -> Optional[Artifact]:
+        """Mark an artifact as pending, or return the stored artifact with identical content."""
+        with self._lock:
+            pending = self._pending.get(artifact.id)
+            existing = pending[0] if pending is not None else self._artifacts.get(artifact.id)
+            if existing is not None:
+                self.stats["deduplicated"] += 1
+                if pending is None:
+                    existing = existing._replace(created=time.time())
+                    self._artifacts[artifact.id] = existing
+                    self._touched[artifact.id] = existing.created
+                return existing
+            self._pending[artifact.id] = (artifact, content)
+            return None
+
+    def _index(self, artifacts: List[Artifact], legacy: bool = False) -> None:
+        """Record written artifacts in the index and move them from the pending map to the in-memory index."""
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO artifacts "
+                "(id, path, kind, query, size, sha256, created, compressed, stored_size, legacy) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?, ?)",
+                [
+                    (a.id, os.path.basename(a.path), a.kind, a.query, a.size, a.sha256, a.created, a.size, int(legacy))
+                    for a in artifacts
+                ]
+            )
+            self._db.commit()
+        with self._lock:
+            for artifact in artifacts:
+                self._artifacts[artifact.id] = artifact
+                self._pending.pop(artifact.id, None)
+
+    def put(self, content: str, kind: str, query: str = "", extension: str = "md") -> Artifact:
+        """Store a document and return its artifact without waiting for the write.
+
+        Args:
+            content: The document
+            kind: The agent operation that produced it, e.g. "tutorial"
+            query: The user's query
+            extension: The file extension (default: md)
+
+        Returns:
+            The artifact; its path is final but may take a moment to appear on disk
+        """
+        artifact = self._make_artifact(content, kind, query, extension)
+        existing = self._claim(artifact, content)
+        if existing is not None:
+            return existing
+        self._enqueue(artifact, content)
+        return artifact
+
+    def _enqueue(self, artifact: Artifact, content: str) -> None:
+        """Hand a claimed artifact to the writer thread."""
+        self.start()
+        try:
+            self._queue.put_nowait((artifact, content))
+        except queue.Full:
+            # The writer is behind; write on the caller's thread rather than queue without bound
+            self.stats["inline_writes"] += 1
+            with ARTIFACT_WRITE_DURATION.time():
+                self._write_batch([(artifact, content)])
+
+    def open_partial(self, extension: str = "md") -> Tuple[str, TextIO]:
+        """Open a temporary file for a document that is written as it streams in.
+
+        Returns:
+            A tuple of the temporary path and the open text file (the caller closes it)
+        """
+        path = os.path.join(self.directory, ".partial", f"{uuid.uuid4().hex}.{extension}")
+        return path, open(path, "w", encoding="utf-8")
+
+    def adopt(self, partial_path: str, content: str, kind: str, query: str = "", extension: str = "md") -> Artifact:
+        """Move a finished partial file into the store under its content address.
+
+        Args:
+            partial_path: Path returned by open_partial (already closed)
+            content: The document that was written to it
+            kind: The agent operation that produced it
+            query: The user's query
+            extension: The file extension (default: md)
+
+        Returns:
+            The artifact (the partial file is discarded if the content is already stored)
+        """
+        artifact = self._make_artifact(content, kind, query, extension)
+        existing = self._claim(artifact, content)
+        if existing is not None:
+            os.remove(partial_path)
+            return existing
+
+        try:
+            os.replace(partial_path, artifact.path)
+        except OSError:
+            self._forget(artifact)
+            raise
+        # The file is in place; the writer only has to index it
+        self._enqueue(artifact, content)
+        self.stats["saved"] += 1
+        return artifact
+
+    def discard_partial(self, partial_path: str) -> None:
+        """Delete a partial file whose stream never completed."""
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+    def get(self, artifact_id: str) -> Optional[Artifact]:
+        """Return an artifact by id, including ones still waiting to be written."""
+        with self._lock:
+            pending = self._pending.get(artifact_id)
+            if pending is not None:
+                return pending[0]
+            return self._artifacts.get(artifact_id)
+
+    def list(self, kind: Optional[str] = None, query: Optional[str] = None,
+             limit: int = 50, offset: int = 0) -> List[Artifact]:
+        """List stored artifacts from the index, newest first.
+
+        Args:
+            kind: Only artifacts of this kind
+            query: Only artifacts whose query contains this text (case-insensitive)
+            limit: Maximum number of artifacts returned
+            offset: Number of artifacts skipped
+
+        Returns:
+            The matching artifacts
+        """
+        clauses, params = [], []
+        if kind:
+            clauses.append("kind = ?")
+            params.append(kind)
+        if query:
+            clauses.append("query LIKE ? ESCAPE '\\'")
+            escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._db_lock:
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM artifacts {where} ORDER BY created DESC, rowid DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset)
+            ).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def usage(self) -> Dict[str, int]:
+        """Return the number of stored artifacts, their size and the bytes they take on disk."""
+        with self._db_lock:
+            count, size, stored = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM artifacts"
+            ).fetchone()
+        return {"artifacts": count, "bytes": size, "disk_bytes": stored}
+
+    def read(self, artifact_id: str) -> Optional[str]:
+        """Return an artifact's content, including writes that are still queued."""
+        # Retry once in case compaction compressed the file between the lookup and the open
+        for _ in range(2):
+            with self._lock:
+                pending = self._pending.get(artifact_id)
+            if pending is not None:
+                return pending[1]
+
+            artifact = self.get(artifact_id)
+            if artifact is None:
+                return None
+            try:
+                if artifact.compressed:
+                    with gzip.open(artifact.path, "rt", encoding="utf-8") as f:
+                        return f.read()
+                with open(artifact.path, "r", encoding="utf-8") as f:
+                    return f.read()
+            except FileNotFoundError:
+                continue
+        return None
+
+    def compact(self, now: Optional[float] = None) -> Dict[str, int]:
+        """Apply the retention limits and compress old artifacts.
+
+        Artifacts past `max_age` are deleted first, then the oldest beyond
+        `max_count`; artifacts past `compress_after` are gzipped; finally the
+        oldest are deleted until the store fits in `max_bytes`. Imported
+        legacy documents are left alone and not counted.
+
+        Args:
+            now: Current time (epoch seconds, defaults to time.time())
+
+        Returns:
+            The number of artifacts removed and compressed in this pass
+        """
+        now = time.time() if now is None else now
+        self._apply_touches()
+        removed = 0
+
+        if self.max_age > 0:
+            removed += self._remove("WHERE legacy = 0 AND created < ?", (now - self.max_age,))
+        if self.max_count > 0:
+            removed += self._remove(
+                "WHERE id IN (SELECT id FROM artifacts WHERE legacy = 0 "
+                "ORDER BY created DESC, rowid DESC LIMIT -1 OFFSET ?)",
+                (self.max_count,)
+            )
+
+        compressed = 0
+        if self.compress_after > 0:
+            with self._db_lock:
+                rows = self._db.execute(
+                    f"SELECT {_COLUMNS} FROM artifacts WHERE legacy = 0 AND compressed = 0 AND created < ?",
+                    (now - self.compress_after,)
+                ).fetchall()
+            for row in rows:
+                compressed += self._compress(self._from_row(row))
+
+        if self.max_bytes > 0:
+            with self._db_lock:
+                rows = self._db.execute(
+                    "SELECT id, stored_size FROM artifacts WHERE legacy = 0 ORDER BY created, rowid"
+                ).fetchall()
+            excess = sum(size for _, size in rows) - self.max_bytes
+            evicted = []
+            for artifact_id, size in rows:
+                if excess <= 0:
+                    break
+                evicted.append(artifact_id)
+                excess -= size
+            if evicted:
+                removed += self._remove(f"WHERE id IN ({', '.join('?' * len(evicted))})", tuple(evicted))
+
+        self.stats["compactions"] += 1
+        return {"removed": removed, "compressed": compressed}
+
+    def _apply_touches(self) -> None:
+        """Write the `created` times refreshed by dedup hits to the index."""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            with self._db_lock:
+                self._db.executemany("UPDATE artifacts SET created = ? WHERE id = ?",
+                                     [(created, artifact_id) for artifact_id, created in touched.items()])
+                self._db.commit()
+
+    def _remove(self, where: str, params: Tuple[Any, ...]) -> int:
+        """Delete the artifacts matching an index filter, from the index first and then from disk."""
+        with self._db_lock:
+            rows = self._db.execute(f"SELECT id, path FROM artifacts {where}", params).fetchall()
+        if not rows:
+            return 0
+        with self._lock:
+            # Keep artifacts handed out since the touches were applied; the rest stop deduplicating
+            # now, so a save of the same content is queued behind this pass and rewritten
+            rows = [(artifact_id, path) for artifact_id, path in rows if artifact_id not in self._touched]
+            for artifact_id, _ in rows:
+                self._artifacts.pop(artifact_id, None)
+        if not rows:
+            return 0
+        with self._db_lock:
+            self._db.executemany("DELETE FROM artifacts WHERE id = ?", [(artifact_id,) for artifact_id, _ in rows])
+            self._db.commit()
+
+        for _, path in rows:
+            try:
+                os.remove(os.path.join(self.directory, path))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("Artifact removal error: %s", e)
+        self.stats["removed"] += len(rows)
+        return len(rows)
+
+    def _compress(self, artifact: Artifact) -> int:
+        """Replace an artifact's file with a gzipped copy; returns 1 if it was compressed."""
+        gz_path = f"{artifact.path}.gz"
+        tmp_path = f"{gz_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(artifact.path, "rb") as src, gzip.open(tmp_path, "wb") as dst:
+                dst.write(src.read())
+            os.replace(tmp_path, gz_path)
+        except FileNotFoundError:
+            # The file was deleted behind the index's back; forget it
+            self._remove("WHERE id = ?", (artifact.id,))
+            return 0
+        except OSError as e:
+            logger.warning("Artifact compression error: %s", e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return 0
+
+        with self._db_lock:
+            self._db.execute(
+                "UPDATE artifacts SET path = ?, compressed = 1, stored_size = ? WHERE id = ?",
+                (os.path.basename(gz_path), os.path.getsize(gz_path), artifact.id)
+            )
+            self._db.commit()
+        with self._lock:
+            if artifact.id in self._artifacts:
+                self._artifacts[artifact.id] = self._artifacts[artifact.id]._replace(path=gz_path, compressed=True)
+        os.remove(artifact.path)
+        self.stats["compressed"] += 1
+        return 1
+
+    def import_legacy(self) -> int:
+        """Index documents saved to the directory before the store existed.
+
+        They keep their file names and take their kind and query from the old
+        naming scheme and their creation time from the file, so listings,
+        reads and dedup cover them like any other artifact. Retention never
+        deletes them. A legacy file whose content is already stored is left
+        in place but not indexed.
+
+        Returns:
+            The number of files indexed
+        """
+        with self._lock:
+            known = {os.path.basename(a.path) for a in self._artifacts.values()}
+        imported: Dict[str, Artifact] = {}
+        for entry in os.scandir(self.directory):
+            match = _LEGACY_NAME.match(entry.name)
+            if match is None or entry.name in known or not entry.is_file():
+                continue
+            try:
+                with open(entry.path, "rb") as f:
+                    data = f.read()
+                created = entry.stat().st_mtime
+            except OSError as e:
+                logger.warning("Artifact import error: %s", e)
+                continue
+
+            digest = hashlib.sha256(data).hexdigest()
+            with self._lock:
+                duplicate = digest[:32] in self._artifacts or digest[:32] in self._pending
+            if duplicate or digest[:32] in imported:
+                self.stats["legacy_duplicates"] += 1
+                continue
+
+            stem = match.group("stem")
+            kind = next((k for k in _LEGACY_KINDS if stem.startswith(f"{k}_")), "document")
+            query = stem[len(kind) + 1:] if stem.startswith(f"{kind}_") else stem
+            imported[digest[:32]] = Artifact(
+                id=digest[:32],
+                path=entry.path,
+                kind=kind,
+                query=query.replace("_", " ").strip(),
+                size=len(data),
+                sha256=digest,
+                created=created
+            )
+
+        if imported:
+            self._index(list(imported.values()), legacy=True)
+            self.stats["imported"] += len(imported)
+        return len(imported)
+
+    def flush(self) -> None:
+        """Block until every queued artifact is on disk."""
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Flush pending writes and stop the writer thread."""
+        if self._writer is not None:
+            self._queue.put(_STOP)
+            self._writer.join()
+            self._writer = None
+
+    def start(self) -> None:
+        """Start the writer thread (and with it background compaction) if it isn't running."""
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name="artifact-writer", daemon=True)
+                self._writer.start()
+
+    def _run(self) -> None:
+        """Writer loop: write whatever is queued (up to a batch) together, compacting when due."""
+        try:
+            self.import_legacy()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("Artifact import error: %s", e)
+        next_compaction = time.monotonic() + self.compact_interval
+        while True:
+            timeout = max(next_compaction - time.monotonic(), 0) if self.compact_interval > 0 else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is not None:
+                batch = [item]
+                while item is not _STOP and len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    batch.append(item)
+
+                stop = any(entry is _STOP for entry in batch)
+                with ARTIFACT_WRITE_DURATION.time():
+                    self._write_batch([entry for entry in batch if entry is not _STOP])
+                for _ in batch:
+                    self._queue.task_done()
+                if stop:
+                    return
+
+            if self.compact_interval > 0 and time.monotonic() >= next_compaction:
+                try:
+                    self.compact()
+                except (OSError, sqlite3.Error) as e:
+                    logger.warning("Artifact compaction error: %s", e)
+                next_compaction = time.monotonic() + self.compact_interval
+
+    def _write_batch(self, batch: List[Tuple[Artifact, str]]) -> None:
+        """Write artifacts to temporary files, fsync them together, then rename them into place."""
+        if not batch:
+            return
+
+        staged, written = [], []
+        for artifact, content in batch:
+            if os.path.exists(artifact.path):
+                # Written by an earlier run whose index entry was lost
+                written.append(artifact)
+                continue
+            tmp_path = f"{artifact.path}.{uuid.uuid4().hex}.tmp"
+            try:
+                f = open(tmp_path, "w", encoding="utf-8")
+                f.write(content)
+                f.flush()
+                staged.append((artifact, tmp_path, f))
+            except OSError as e:
+                logger.warning("Artifact write error: %s", e)
+                self._forget(artifact)
+
+        for artifact, tmp_path, f in staged:
+            try:
+                if self.fsync:
+                    os.fsync(f.fileno())
+                f.close()
+                os.replace(tmp_path, artifact.path)
+                written.append(artifact)
+                self.stats["saved"] += 1
+            except OSError as e:
+                logger.warning("Artifact write error: %s", e)
+                self._forget(artifact)
+
+        if self.fsync and staged and hasattr(os, "O_DIRECTORY"):
+            # One directory fsync makes every rename in the batch durable
+            fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        if written:
+            self._index(written)
+        self.stats["batches"] += 1
+
+    def _forget(self, artifact: Artifact) -> None:
+        """Drop a failed write so a later save can retry it."""
+        self.stats["write_errors"] += 1
+        with self._lock:
+            self._pending.pop(artifact.id, None)
+
+_store: Optional[ArtifactStore] = None
+_store_lock = threading.Lock()
+
+def get_artifact_store() -> ArtifactStore:
+    """Return the process-wide artifact store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
+
+def set_artifact_store(store: Optional[ArtifactStore]) -> None:
+    """Replace the process-wide artifact store (None resets it to the configured default)."""
+    global _store
+    with _store_lock:
+        if _store is not None and _store is not store:
+            _store.close()
+        _store = store
+
+def artifact_id_from_path(path: str) -> str:
+    """Return the id of the artifact stored at a path (its file name up to the extension)."""
+    return os.path.basename(path).split(".", 1)[0]
+
+def save_file(content: str, kind: str, query: str = "", extension: str = "md") -> str:
+    """Store a generated document and return its path without waiting on disk I/O.
+
+    Args:
+        content: The content to save
+        kind: The agent operation that produced it, e.g. "tutorial"
+        query: The user's query
+        extension: The file extension (default: md)
+
+    Returns:
+        The path the document is (or will shortly be) stored at
+    """
+    with ARTIFACT_SAVE_DURATION.time(kind=kind):
+        return get_artifact_store().put(content, kind=kind, query=query, extension=extension).path
@@ -0,0 +1,212 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple, Type, TypeVar
+
+from app.config import (
+    BREAKER_FAILURE_RATE,
+    BREAKER_HALF_OPEN_PROBES,
+    BREAKER_MIN_CALLS,
+    BREAKER_OPEN_SECONDS,
+    BREAKER_WINDOW,
+)
+
+T = TypeVar("T")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+class CircuitBreaker:
+    """Tracks an upstream's recent failure rate and stops calling it while it is down.
+
+    Closed: calls go through and their outcomes are recorded over a sliding
+    window; once at least `min_calls` were made and `failure_rate` of them
+    failed, the circuit opens. Open: calls fail at once with CircuitOpenError.
+    After `open_seconds` the circuit is half-open: up to `probes` calls go
+    through; a success closes it again, a failure re-opens it.
+    """
+
+    def __init__(self, name: str, window: float = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 failure_rate: float = BREAKER_FAILURE_RATE, open_seconds: float = BREAKER_OPEN_SECONDS,
+                 probes: int = BREAKER_HALF_OPEN_PROBES):
+        """Initialize a closed breaker.
+
+        Args:
+            name: The upstream's name, e.g. "gemini"
+            window: Seconds of outcomes the failure rate is computed over
+            min_calls: Calls in the window before the breaker may open
+            failure_rate: Fraction of failed calls that opens the breaker
+            open_seconds: Seconds the breaker stays open before probing
+            probes: Calls let through at once while half-open
+        """
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.state = CLOSED
+        self.stats = {"successes": 0, "failures": 0, "fast_fails": 0, "opened": 0, "half_opened": 0, "closed": 0}
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        """Forget outcomes older than the window."""
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+
+    def _transition(self, state: str, now: float) -> None:
+        """Move to a new state and count the transition."""
+        self.state = state
+        self.stats[{OPEN: "opened", HALF_OPEN: "half_opened", CLOSED: "closed"}[state]] += 1
+        if state == OPEN:
+            self._opened_at = now
+        if state == CLOSED:
+            self._outcomes.clear()
+
+    def is_open(self) -> bool:
+        """Whether calls would currently fail fast (open and not yet due for a probe)."""
+        with self._lock:
+            return self.state == OPEN and time.monotonic() < self._opened_at + self.open_seconds
+
+    def allow(self) -> bool:
+        """Admit a call, reserving a probe slot while half-open; pair with record() or release()."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and now >= self._opened_at + self.open_seconds:
+                self._transition(HALF_OPEN, now)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._probes_in_flight < self.probes:
+                self._probes_in_flight += 1
+                return True
+            self.stats["fast_fails"] += 1
+            return False
+
+    def release(self) -> None:
+        """Give back a probe slot for a call whose outcome says nothing about the upstream."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+
+    def record(self, ok: bool) -> None:
+        """Record the outcome of an admitted call."""
+        with self._lock:
+            now = time.monotonic()
+            self.stats["successes" if ok else "failures"] += 1
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+                self._transition(CLOSED if ok else OPEN, now)
+                return
+            if self.state == OPEN:
+                return
+
+            self._outcomes.append((now, ok))
+            self._prune(now)
+            failures = sum(1 for _, outcome in self._outcomes if not outcome)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._transition(OPEN, now)
+
+    async def call(self, fn: Callable[[], Awaitable[T]], ignore: Tuple[Type[BaseException], ...] = ()) -> T:
+        """Run an async upstream call through the breaker.
+
+        Args:
+            fn: Makes the call
+            ignore: Exceptions that are not the upstream's fault and aren't recorded
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = await fn()
+        except ignore:
+            self.release()
+            raise
+        except Exception:
+            self.record(False)
+            raise
+        except BaseException:
+            # Cancelled: the call never finished
+            self.release()
+            raise
+        self.record(True)
+        return result
+
+    def call_blocking(self, fn: Callable[[], T], ignore: Tuple[Type[BaseException], ...] = ()) -> T:
+        """Synchronous counterpart of `call`."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = fn()
+        except ignore:
+            self.release()
+            raise
+        except Exception:
+            self.record(False)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.record(True)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the state, the failure rate over the window and the counters."""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            calls = len(self._outcomes)
+            failures = sum(1 for _, outcome in self._outcomes if not outcome)
+            return {
+                "state": self.state,
+                "window_calls": calls,
+                "window_failure_rate": failures / calls if calls else 0.0,
+                "retry_in": max(self._opened_at + self.open_seconds - now, 0.0) if self.state == OPEN else 0.0,
+                **self.stats,
+            }
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Return the process-wide breaker for an upstream, e.g. "gemini" or "duckduckgo"."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+def breaker_snapshots() -> Dict[str, Dict[str, Any]]:
+    """Return the state of every upstream's breaker."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+def reset_breakers() -> None:
+    """Close every breaker by dropping them (the next lookup creates fresh ones)."""
+    with _breakers_lock:
+        _breakers.clear()
+
+class FallbackFlag:
+    """An agent's `use_fallback`: set explicitly (testing mode) or implied by an open upstream circuit."""
+
+    def __init__(self, upstream: str):
+        """Initialize the flag for the upstream whose circuit forces the fallback."""
+        self.upstream = upstream
+        self.attr = "_use_fallback"
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.attr = f"_{name}"
+
+    def __get__(self, obj: Any, objtype: Optional[type] = None) -> Any:
+        if obj is None:
+            return self
+        return getattr(obj, self.attr, False) or get_breaker(self.upstream).is_open()
+
+    def __set__(self, obj: Any, value: bool) -> None:
+        setattr(obj, self.attr, bool(value))
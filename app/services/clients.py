@@ -0,0 +1,53 @@
+import threading
+from typing import Any, Dict, Optional, Tuple
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_community.tools import DuckDuckGoSearchResults
+
+from app.config import GOOGLE_API_KEY
+from app.services.scheduler import schedule_model
+
+# Process-wide model and search clients, keyed by their construction parameters
+_models: Dict[Tuple[Any, ...], Any] = {}
+_search_tool: Optional[DuckDuckGoSearchResults] = None
+_lock = threading.Lock()
+
+def get_chat_model(model: str, temperature: Optional[float] = None, **kwargs: Any) -> Any:
+    """Return the shared chat model client for a model name and settings.
+    
+    Calls to the client go through the LLM scheduler, which keeps them within
+    the model's rate limits.
+    
+    Args:
+        model: The Gemini model name
+        temperature: Optional sampling temperature (None keeps the model default)
+        **kwargs: Extra ChatGoogleGenerativeAI settings, e.g. max_output_tokens
+        
+    Returns:
+        A long-lived ChatGoogleGenerativeAI instance, wrapped by the scheduler
+    """
+    key = (model, temperature, tuple(sorted(kwargs.items())))
+    with _lock:
+        if key not in _models:
+            if temperature is not None:
+                kwargs["temperature"] = temperature
+            _models[key] = schedule_model(ChatGoogleGenerativeAI(
+                model=model,
+                google_api_key=GOOGLE_API_KEY,
+                **kwargs
+            ), model)
+        return _models[key]
+
+def get_search_tool() -> DuckDuckGoSearchResults:
+    """Return the shared DuckDuckGo search tool."""
+    global _search_tool
+    with _lock:
+        if _search_tool is None:
+            _search_tool = DuckDuckGoSearchResults()
+        return _search_tool
+
+def clear_clients() -> None:
+    """Drop all cached clients so the next lookup builds fresh ones."""
+    global _search_tool
+    with _lock:
+        _models.clear()
+        _search_tool = None
@@ -0,0 +1,75 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from app.config import REQUEST_COALESCING_ENABLED
+from app.services.llm_cache import normalize_input
+
+class RequestCoalescer:
+    """In-flight request table that lets identical concurrent requests share one run.
+
+    The first request for an (endpoint, normalized query) pair becomes the
+    leader and its work runs as a task; requests that arrive while it is still
+    running await that same task and receive the same content and file path.
+    The entry is dropped as soon as the task finishes, so nothing is cached
+    beyond the lifetime of the burst. Once every caller waiting on a run has
+    been cancelled (their clients disconnected), the run is cancelled too.
+    """
+
+    def __init__(self, enabled: bool = REQUEST_COALESCING_ENABLED):
+        """Initialize an empty in-flight table.
+
+        Args:
+            enabled: Whether to coalesce at all (False runs every request on its own)
+        """
+        self.enabled = enabled
+        self.stats = {"leaders": 0, "followers": 0}
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+
+    def make_key(self, endpoint: str, query: str) -> Tuple[str, str]:
+        """Build the in-flight key for a request."""
+        return endpoint, normalize_input(query)
+
+    async def run(self, endpoint: str, query: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a request's work, or join an identical request that is already running.
+
+        Args:
+            endpoint: Name of the endpoint or operation serving the request
+            query: The request's input (normalized before matching)
+            work: Zero-argument coroutine function producing the result
+
+        Returns:
+            The result of the leader's work (dicts are copied per caller)
+        """
+        if not self.enabled:
+            return await work()
+
+        key = self.make_key(endpoint, query)
+        task = self._inflight.get(key)
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            self.stats["followers"] += 1
+        else:
+            self.stats["leaders"] += 1
+            task = asyncio.ensure_future(work())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        # shield so one caller disconnecting doesn't cancel the run the others are waiting on
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            result = await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                # the last caller is gone: nobody wants the result any more
+                task.cancel()
+        return dict(result) if isinstance(result, dict) else result
+
+    def _forget(self, key: Tuple[str, str], task: asyncio.Task) -> None:
+        """Drop a finished task from the in-flight table."""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # mark the exception retrieved; every waiting caller re-raises it
+            task.exception()
@@ -0,0 +1,189 @@
+import math
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from app.config import SEARCH_CONTEXT_BUDGETS
+from app.services.streaming import emit_progress
+from app.utils.text_utils import estimate_tokens, tokenize
+
+# DuckDuckGoSearchResults' default string output: "snippet: ..., title: ..., link: ..., snippet: ..."
+_RESULT_PATTERN = re.compile(
+    r"snippet:\s*(?P<snippet>.*?),\s*title:\s*(?P<title>.*?),\s*link:\s*(?P<link>\S+?)(?=,\s*snippet:|\s*$)",
+    re.DOTALL
+)
+
+def parse_results(results: Any) -> List[Dict[str, str]]:
+    """Parse raw search results into snippets with `snippet`, `title` and `link` keys.
+
+    Args:
+        results: DuckDuckGo's string output or a list of result dicts
+
+    Returns:
+        The structured snippets (the whole text as one snippet if it can't be parsed)
+    """
+    if isinstance(results, list):
+        return [
+            {
+                "snippet": str(item.get("snippet", "")),
+                "title": str(item.get("title", "")),
+                "link": str(item.get("link", "")),
+            }
+            for item in results if isinstance(item, dict)
+        ]
+
+    text = str(results or "").strip()
+    snippets = [match.groupdict() for match in _RESULT_PATTERN.finditer(text)]
+    if not snippets and text:
+        snippets = [{"snippet": text, "title": "", "link": ""}]
+    return snippets
+
+def _shingles(text: str, size: int = 3) -> set:
+    """Return the set of word n-grams in a text."""
+    tokens = tokenize(text)
+    if len(tokens) < size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+def dedupe(snippets: List[Dict[str, str]], threshold: float = 0.8) -> List[Dict[str, str]]:
+    """Drop snippets whose link repeats or whose text nearly duplicates an earlier one.
+
+    Args:
+        snippets: Parsed snippets, in result order
+        threshold: Jaccard similarity of word 3-grams above which two snippets are duplicates
+
+    Returns:
+        The distinct snippets
+    """
+    kept, links, shingle_sets = [], set(), []
+    for snippet in snippets:
+        if snippet["link"] and snippet["link"] in links:
+            continue
+        shingles = _shingles(snippet["snippet"])
+        if any(len(shingles & seen) / (len(shingles | seen) or 1) >= threshold for seen in shingle_sets):
+            continue
+        kept.append(snippet)
+        links.add(snippet["link"])
+        shingle_sets.append(shingles)
+    return kept
+
+def bm25_scores(query: str, documents: List[str], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    """Score documents against a query with Okapi BM25 over the documents themselves.
+
+    Args:
+        query: The user's query
+        documents: Texts to score
+        k1: Term-frequency saturation
+        b: Length normalisation
+
+    Returns:
+        One score per document
+    """
+    tokenized = [tokenize(document) for document in documents]
+    if not tokenized:
+        return []
+
+    average_length = sum(len(tokens) for tokens in tokenized) / len(tokenized) or 1.0
+    document_frequency = Counter(term for tokens in tokenized for term in set(tokens))
+    terms = set(tokenize(query))
+
+    scores = []
+    for tokens in tokenized:
+        frequencies = Counter(tokens)
+        score = 0.0
+        for term in terms:
+            frequency = frequencies.get(term, 0)
+            if not frequency:
+                continue
+            df = document_frequency[term]
+            idf = math.log(1 + (len(tokenized) - df + 0.5) / (df + 0.5))
+            score += idf * frequency * (k1 + 1) / (frequency + k1 * (1 - b + b * len(tokens) / average_length))
+        scores.append(score)
+    return scores
+
+def format_snippet(snippet: Dict[str, str]) -> str:
+    """Render a snippet as one prompt line."""
+    title = f"{snippet['title']}: " if snippet["title"] else ""
+    link = f" ({snippet['link']})" if snippet["link"] else ""
+    return f"- {title}{snippet['snippet']}{link}"
+
+class ContextCompressor:
+    """Turns raw web search results into a compact, ranked context for a prompt.
+
+    Results are parsed into snippets, near-duplicates are dropped, the rest are
+    ranked against the user's query with BM25 and packed best-first into the
+    calling agent's token budget.
+    """
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None):
+        """Initialize the compressor.
+
+        Args:
+            budgets: Token budget per agent operation (defaults to SEARCH_CONTEXT_BUDGETS)
+        """
+        self.budgets = dict(SEARCH_CONTEXT_BUDGETS if budgets is None else budgets)
+        self.stats = {"requests": 0, "tokens_in": 0, "tokens_out": 0, "tokens_saved": 0, "snippets_dropped": 0}
+        self._lock = threading.Lock()
+
+    def budget_for(self, namespace: str) -> int:
+        """Return the token budget for an agent operation."""
+        return self.budgets.get(namespace, self.budgets.get("default", 1000))
+
+    def compress(self, namespace: str, query: str, results: Any) -> str:
+        """Prepare search results for a prompt.
+
+        Args:
+            namespace: The agent operation, e.g. "tutorial"
+            query: The user's query the snippets are ranked against
+            results: The raw search results
+
+        Returns:
+            The packed context, one snippet per line, most relevant first
+        """
+        raw = results if isinstance(results, str) else str(results)
+        parsed = parse_results(results)
+        snippets = dedupe(parsed)
+        scores = bm25_scores(query, [f"{snippet['title']} {snippet['snippet']}" for snippet in snippets])
+        # Ties keep the search engine's own order
+        ranked = [snippets[i] for i in sorted(range(len(snippets)), key=lambda i: -scores[i])]
+
+        budget = self.budget_for(namespace)
+        lines, used = [], 0
+        for snippet in ranked:
+            line = format_snippet(snippet)
+            tokens = estimate_tokens(line) + 1
+            if used + tokens > budget:
+                continue
+            lines.append(line)
+            used += tokens
+        if not lines and ranked:
+            # Always pass on something: the best snippet, cut to the budget
+            lines.append(format_snippet(ranked[0])[:budget * 4])
+        context = "\n".join(lines)
+
+        tokens_in, tokens_out = estimate_tokens(raw), estimate_tokens(context)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["tokens_in"] += tokens_in
+            self.stats["tokens_out"] += tokens_out
+            self.stats["tokens_saved"] += max(tokens_in - tokens_out, 0)
+            self.stats["snippets_dropped"] += len(parsed) - len(lines)
+        emit_progress(
+            "context_packed",
+            namespace=namespace,
+            snippets=len(lines),
+            tokens_in=tokens_in,
+            tokens_out=tokens_out,
+            tokens_saved=max(tokens_in - tokens_out, 0)
+        )
+        return context
+
+_compressor: Optional[ContextCompressor] = None
+
+def get_context_compressor() -> ContextCompressor:
+    """Return the process-wide search context compressor."""
+    global _compressor
+    if _compressor is None:
+        _compressor = ContextCompressor()
+    return _compressor
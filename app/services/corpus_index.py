@@ -0,0 +1,324 @@
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.config import SEARCH_CORPUS_DIR, SEARCH_INDEX_DIR, SEARCH_REINDEX_INTERVAL
+from app.utils.text_utils import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Files the corpus may contain: markdown/text documents, and JSONL with one document per line
+MARKDOWN_EXTENSIONS = (".md", ".markdown", ".txt")
+JSONL_EXTENSIONS = (".jsonl",)
+
+_HEADING = re.compile(r"^#{1,6}\s+(.+?)\s*#*\s*$", re.MULTILINE)
+
+# Postings are (document number, term frequency) pairs of unsigned 32-bit ints
+_POSTING_TYPE = "I"
+
+def _slug(text: str) -> str:
+    """Turn a heading into a markdown anchor."""
+    return "-".join(tokenize(text))
+
+def split_markdown(text: str, name: str) -> List[Dict[str, str]]:
+    """Split a markdown document into one passage per heading.
+
+    Args:
+        text: The document
+        name: The document's path relative to the corpus, used as the link
+
+    Returns:
+        Passages with `title`, `link` and `text` keys (text before the first heading is its own passage)
+    """
+    stem = os.path.splitext(os.path.basename(name))[0]
+    headings = list(_HEADING.finditer(text))
+    sections = []
+    if not headings or text[:headings[0].start()].strip():
+        sections.append((stem, name, text[:headings[0].start()] if headings else text))
+    for i, heading in enumerate(headings):
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+        title = heading.group(1)
+        sections.append((title, f"{name}#{_slug(title)}", text[heading.end():end]))
+    return [
+        {"title": title, "link": link, "text": body.strip()}
+        for title, link, body in sections if body.strip()
+    ]
+
+def parse_jsonl(text: str, name: str) -> List[Dict[str, str]]:
+    """Read JSONL documents with `text` (or `content`/`snippet`), `title` and `url` (or `link`) fields."""
+    documents = []
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            logger.warning("Corpus parse error: %s:%s: %s", name, number, e)
+            continue
+        if not isinstance(record, dict):
+            continue
+        body = record.get("text") or record.get("content") or record.get("snippet") or ""
+        if not str(body).strip():
+            continue
+        documents.append({
+            "title": str(record.get("title") or ""),
+            "link": str(record.get("url") or record.get("link") or f"{name}:{number}"),
+            "text": str(body).strip(),
+        })
+    return documents
+
+class CorpusIndex:
+    """On-disk BM25 inverted index over a directory of markdown and JSONL documents.
+
+    Markdown files are split into a passage per heading; JSONL files hold one
+    document per line. Passages and their term frequencies are kept in an
+    SQLite database, so re-indexing only re-reads files whose size or mtime
+    changed. The postings are rebuilt from that table into a flat file of
+    (document, frequency) pairs grouped by term, which is memory-mapped for
+    searching: a query only touches the postings of its own terms. Results are
+    deterministic, with ties broken by document order.
+    """
+
+    def __init__(self, corpus_dir: str = SEARCH_CORPUS_DIR, index_dir: str = SEARCH_INDEX_DIR,
+                 k1: float = 1.2, b: float = 0.75):
+        """Open (or create) the index; call refresh() to bring it up to date with the corpus.
+
+        Args:
+            corpus_dir: Folder holding the documents (searched recursively)
+            index_dir: Folder the index files are written to
+            k1: BM25 term-frequency saturation
+            b: BM25 length normalisation
+        """
+        self.corpus_dir = corpus_dir
+        self.index_dir = index_dir
+        self.k1 = k1
+        self.b = b
+        self.stats = {"searches": 0, "refreshes": 0, "files_indexed": 0, "files_removed": 0}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        self._postings_path = os.path.join(self.index_dir, "postings.bin")
+        self._db = sqlite3.connect(os.path.join(self.index_dir, "corpus.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT NOT NULL, title TEXT NOT NULL, "
+            "link TEXT NOT NULL, text TEXT NOT NULL, length INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS docs_path ON docs (path)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS terms (doc_id INTEGER NOT NULL, term TEXT NOT NULL, tf INTEGER NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS terms_by_term ON terms (term, doc_id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS terms_by_doc ON terms (doc_id)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS lexicon (term TEXT PRIMARY KEY, offset INTEGER NOT NULL, df INTEGER NOT NULL)")
+        self._db.commit()
+        # Searches read through their own connection, which sees only committed refreshes
+        self._reader = sqlite3.connect(os.path.join(self.index_dir, "corpus.sqlite3"), check_same_thread=False)
+
+        # Searchable snapshot: lexicon, mapped postings, and per-document ids and lengths
+        self._lexicon: Dict[str, Tuple[int, int]] = {}
+        self._postings: Optional[memoryview] = None
+        self._doc_ids = array("q")
+        self._lengths = array(_POSTING_TYPE)
+        self._average_length = 0.0
+        self._checked = 0.0
+        self._load()
+
+    def _scan(self) -> Dict[str, Tuple[float, int]]:
+        """Return the (mtime, size) of every supported file in the corpus, keyed by relative path."""
+        found = {}
+        if not os.path.isdir(self.corpus_dir):
+            return found
+        for root, dirs, files in os.walk(self.corpus_dir):
+            dirs.sort()
+            for name in sorted(files):
+                if not name.lower().endswith(MARKDOWN_EXTENSIONS + JSONL_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                found[os.path.relpath(path, self.corpus_dir).replace(os.sep, "/")] = (info.st_mtime, info.st_size)
+        return found
+
+    def _read(self, name: str) -> List[Dict[str, str]]:
+        """Parse one corpus file into documents."""
+        try:
+            with open(os.path.join(self.corpus_dir, name), "r", encoding="utf-8") as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning("Corpus read error: %s: %s", name, e)
+            return []
+        if name.lower().endswith(JSONL_EXTENSIONS):
+            return parse_jsonl(text, name)
+        return split_markdown(text, name)
+
+    def refresh(self, force: bool = False) -> Dict[str, int]:
+        """Re-index the files added, changed or removed since the last refresh.
+
+        Args:
+            force: Rebuild the postings even if no file changed
+
+        Returns:
+            Counts of files indexed and removed, and the documents and terms now in the index
+        """
+        with self._refresh_lock:
+            self._checked = time.monotonic()
+            found = self._scan()
+            known = {path: (mtime, size) for path, mtime, size in self._db.execute("SELECT path, mtime, size FROM files")}
+            changed = [path for path, signature in found.items() if known.get(path) != signature]
+            removed = [path for path in known if path not in found]
+
+            if changed or removed or force or not os.path.exists(self._postings_path):
+                with self._db:
+                    for path in removed + changed:
+                        self._db.execute("DELETE FROM terms WHERE doc_id IN (SELECT id FROM docs WHERE path = ?)", (path,))
+                        self._db.execute("DELETE FROM docs WHERE path = ?", (path,))
+                        self._db.execute("DELETE FROM files WHERE path = ?", (path,))
+                    for path in changed:
+                        for document in self._read(path):
+                            tokens = tokenize(f"{document['title']} {document['text']}")
+                            cursor = self._db.execute(
+                                "INSERT INTO docs (path, title, link, text, length) VALUES (?, ?, ?, ?, ?)",
+                                (path, document["title"], document["link"], document["text"], len(tokens))
+                            )
+                            self._db.executemany(
+                                "INSERT INTO terms (doc_id, term, tf) VALUES (?, ?, ?)",
+                                [(cursor.lastrowid, term, tf) for term, tf in Counter(tokens).items()]
+                            )
+                        self._db.execute("INSERT INTO files (path, mtime, size) VALUES (?, ?, ?)",
+                                         (path, *found[path]))
+                    self._write_postings()
+                self._load()
+                self.stats["refreshes"] += 1
+                self.stats["files_indexed"] += len(changed)
+                self.stats["files_removed"] += len(removed)
+
+            with self._lock:
+                documents, terms = len(self._doc_ids), len(self._lexicon)
+            return {"indexed": len(changed), "removed": len(removed), "documents": documents, "terms": terms}
+
+    def refresh_due(self, interval: float = SEARCH_REINDEX_INTERVAL) -> bool:
+        """Whether the corpus wasn't checked for changes within `interval` seconds (0: never due)."""
+        return bool(interval) and time.monotonic() - self._checked >= interval
+
+    def _write_postings(self) -> None:
+        """Rebuild the postings file and the lexicon from the terms table (inside the caller's transaction)."""
+        numbers = {doc_id: number for number, (doc_id,) in enumerate(self._db.execute("SELECT id FROM docs ORDER BY id"))}
+        lexicon = []
+        offset = 0
+        temp_path = f"{self._postings_path}.tmp"
+        with open(temp_path, "wb") as f:
+            term, chunk, df = None, array(_POSTING_TYPE), 0
+            for row_term, doc_id, tf in self._db.execute("SELECT term, doc_id, tf FROM terms ORDER BY term, doc_id"):
+                if row_term != term:
+                    if term is not None:
+                        lexicon.append((term, offset, df))
+                        offset += df
+                    term, df = row_term, 0
+                chunk.extend((numbers[doc_id], tf))
+                df += 1
+                if len(chunk) >= 65536:
+                    chunk.tofile(f)
+                    chunk = array(_POSTING_TYPE)
+            if term is not None:
+                lexicon.append((term, offset, df))
+            chunk.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        # Searches holding the old mapping keep reading the replaced file until they finish
+        os.replace(temp_path, self._postings_path)
+        self._db.execute("DELETE FROM lexicon")
+        self._db.executemany("INSERT INTO lexicon (term, offset, df) VALUES (?, ?, ?)", lexicon)
+
+    def _load(self) -> None:
+        """Map the postings file and load the lexicon and document lengths."""
+        lexicon = {term: (offset, df) for term, offset, df in self._db.execute("SELECT term, offset, df FROM lexicon")}
+        doc_ids, lengths = array("q"), array(_POSTING_TYPE)
+        for doc_id, length in self._db.execute("SELECT id, length FROM docs ORDER BY id"):
+            doc_ids.append(doc_id)
+            lengths.append(length)
+
+        postings = None
+        if os.path.exists(self._postings_path) and os.path.getsize(self._postings_path):
+            with open(self._postings_path, "rb") as f:
+                postings = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast(_POSTING_TYPE)
+
+        with self._lock:
+            self._lexicon = lexicon
+            self._postings = postings
+            self._doc_ids = doc_ids
+            self._lengths = lengths
+            self._average_length = sum(lengths) / len(lengths) if lengths else 0.0
+
+    def _postings_for(self, postings: memoryview, offset: int, df: int) -> Iterator[Tuple[int, int]]:
+        """Yield the (document number, frequency) pairs of one term."""
+        pairs = postings[offset * 2:(offset + df) * 2]
+        return zip(pairs[0::2], pairs[1::2])
+
+    def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Return the passages that best match a query by BM25.
+
+        Args:
+            query: The search query
+            limit: Maximum number of results
+
+        Returns:
+            Results with `snippet`, `title`, `link` and `score` keys, best first
+        """
+        with self._lock:
+            lexicon, postings = self._lexicon, self._postings
+            doc_ids, lengths, average_length = self._doc_ids, self._lengths, self._average_length
+            self.stats["searches"] += 1
+        if postings is None or not lengths:
+            return []
+
+        count = len(lengths)
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            entry = lexicon.get(term)
+            if entry is None:
+                continue
+            offset, df = entry
+            idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+            for number, tf in self._postings_for(postings, offset, df):
+                norm = self.k1 * (1 - self.b + self.b * lengths[number] / average_length)
+                scores[number] = scores.get(number, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        if not best:
+            return []
+        ids = [doc_ids[number] for number, _ in best]
+        rows = {
+            doc_id: (title, link, text)
+            for doc_id, title, link, text in self._reader.execute(
+                f"SELECT id, title, link, text FROM docs WHERE id IN ({', '.join('?' * len(ids))})", ids
+            )
+        }
+        results = []
+        for doc_id, (_, score) in zip(ids, best):
+            if doc_id not in rows:
+                # Removed by a refresh that finished after this search took its snapshot
+                continue
+            title, link, text = rows[doc_id]
+            results.append({"snippet": text, "title": title, "link": link, "score": round(score, 6)})
+        return results
+
+    def close(self) -> None:
+        """Close the index database."""
+        with self._lock:
+            self._postings = None
+        self._reader.close()
+        self._db.close()
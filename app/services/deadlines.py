@@ -0,0 +1,182 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional, Set
+
+from fastapi import Request
+
+from app.config import (
+    DISCONNECT_POLL_INTERVAL,
+    REQUEST_MAX_TIMEOUT,
+    REQUEST_MIN_TIMEOUT,
+    REQUEST_TIMEOUT_HEADER,
+    REQUEST_TIMEOUTS,
+)
+from app.services.breaker import get_breaker
+
+# The current request's deadline as a monotonic time (None: no limit)
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+# Reasons the current request's result is partial or degraded (None outside a tracked run)
+_degraded: ContextVar[Optional[Set[str]]] = ContextVar("degraded", default=None)
+
+# Degradation reasons that mean part of the result's input is missing
+PARTIAL_REASONS = {"search_timeout", "search_error"}
+
+class ClientDisconnected(RuntimeError):
+    """Raised when a request's work was cancelled because its client went away."""
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when a call is cut off by its request's deadline: the budget ran out, the upstream didn't fail."""
+
+def current_deadline() -> Optional[float]:
+    """Return the current deadline as a monotonic time, or None if there is none."""
+    return _deadline.get()
+
+def remaining() -> Optional[float]:
+    """Seconds left until the current deadline (never negative), or None if there is none."""
+    deadline = _deadline.get()
+    return None if deadline is None else max(deadline - time.monotonic(), 0.0)
+
+@contextmanager
+def deadline_after(seconds: Optional[float]) -> Iterator[None]:
+    """Run a block with a deadline `seconds` from now; an earlier enclosing deadline still wins."""
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def deadline_at(timestamp: Optional[float]) -> Any:
+    """Run a block with a deadline given as a wall-clock timestamp, as carried in the graph state."""
+    return deadline_after(None if timestamp is None else timestamp - time.time())
+
+def deadline_timestamp() -> Optional[float]:
+    """Return the current deadline as a wall-clock timestamp, for putting into the graph state."""
+    left = remaining()
+    return None if left is None else time.time() + left
+
+def mark_degraded(reason: str) -> None:
+    """Record that the current request's result is partial or degraded, e.g. "search_timeout"."""
+    reasons = _degraded.get()
+    if reasons is not None:
+        reasons.add(reason)
+
+def is_degraded() -> bool:
+    """Return whether the current request has been marked partial or degraded so far."""
+    return bool(_degraded.get())
+
+async def tracked(work: Awaitable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Await a request's work and mark its result with how it was degraded.
+
+    Adds `degraded` (the sorted reasons, empty when the result is complete)
+    and `partial` (whether part of the input, like the web search, is
+    missing). An open Gemini circuit counts too, since the agents then serve
+    fallback content. Run it inside the coalesced work so every caller
+    sharing the result gets the same marker.
+    """
+    reasons: Set[str] = set()
+    token = _degraded.set(reasons)
+    try:
+        result = dict(await work)
+    finally:
+        _degraded.reset(token)
+    return _with_markers(result, reasons)
+
+async def tracked_stream(events: AsyncIterator[Dict[str, Any]], seconds: float) -> AsyncIterator[Dict[str, Any]]:
+    """Run an event stream under a deadline `seconds` from now, marking its `done` event like tracked.
+
+    The deadline and the degradation reasons are only in effect while the
+    stream is producing its next event, so they don't leak into the code
+    consuming it between events.
+    """
+    deadline = time.monotonic() + seconds
+    reasons: Set[str] = set()
+    iterator = events.__aiter__()
+    try:
+        while True:
+            current = _deadline.get()
+            deadline_token = _deadline.set(deadline if current is None else min(current, deadline))
+            degraded_token = _degraded.set(reasons)
+            try:
+                event = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                _degraded.reset(degraded_token)
+                _deadline.reset(deadline_token)
+            if event.get("event") == "done":
+                event = _with_markers(event, reasons)
+            yield event
+    finally:
+        # Close the inner stream now if ours was abandoned, so it cleans up its partial file
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+def _with_markers(result: Dict[str, Any], reasons: Set[str]) -> Dict[str, Any]:
+    """Add the `degraded` and `partial` markers for a finished request's reasons to its result."""
+    if get_breaker("gemini").is_open():
+        reasons.add("gemini_circuit_open")
+    result["degraded"] = sorted(reasons)
+    result["partial"] = bool(reasons & PARTIAL_REASONS)
+    return result
+
+def request_timeout(request: Request, endpoint: str) -> float:
+    """Return a request's latency budget: its timeout header if valid, else the endpoint's default.
+
+    The budget is kept between REQUEST_MIN_TIMEOUT and REQUEST_MAX_TIMEOUT.
+    """
+    default = REQUEST_TIMEOUTS.get(endpoint, REQUEST_TIMEOUTS["default"])
+    header = request.headers.get(REQUEST_TIMEOUT_HEADER)
+    try:
+        seconds = float(header) if header else float(default)
+    except ValueError:
+        seconds = float(default)
+    if not seconds > 0:
+        seconds = float(default)
+    return min(max(seconds, REQUEST_MIN_TIMEOUT), REQUEST_MAX_TIMEOUT)
+
+async def cancel_on_disconnect(request: Request, work: Awaitable[Any],
+                               poll_interval: float = DISCONNECT_POLL_INTERVAL) -> Any:
+    """Await work, cancelling it as soon as the client disconnects.
+
+    Raises:
+        ClientDisconnected: If the client went away before the work finished
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected("Client disconnected")
+    finally:
+        task.cancel()
+
+async def run_request(request: Request, endpoint: str, query: str,
+                      work: Callable[[], Awaitable[Dict[str, Any]]], coalescer: Any = None) -> Dict[str, Any]:
+    """Run an endpoint's work under its deadline, marking the result and stopping for gone clients.
+
+    Args:
+        request: The HTTP request (for the timeout header and disconnects)
+        endpoint: Name of the endpoint, selecting the default budget and the coalescing key
+        query: The request's input, for coalescing
+        work: Zero-argument coroutine function producing the result
+        coalescer: Request coalescer to share identical in-flight runs through (None to run alone)
+
+    Returns:
+        The work's result with `degraded` and `partial` markers
+    """
+    with deadline_after(request_timeout(request, endpoint)):
+        if coalescer is None:
+            job = tracked(work())
+        else:
+            job = coalescer.run(endpoint, query, lambda: tracked(work()))
+        return await cancel_on_disconnect(request, job)
@@ -0,0 +1,348 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from app.config import (
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_FILE,
+    LLM_CACHE_MAX_BYTES,
+    LLM_CACHE_MEMORY_ENTRIES,
+    LLM_CACHE_TTLS,
+    LLM_CACHE_WRITE_QUEUE,
+    SEMANTIC_CACHE_ENABLED,
+)
+from app.services.deadlines import is_degraded
+from app.services.semantic_cache import SemanticCache
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+def normalize_input(text: str) -> str:
+    """Normalize user input so trivially different phrasings share a cache entry."""
+    return re.sub(r"\s+", " ", text.strip().lower()).strip(" ?!.")
+
+def _prompt_text(prompt: ChatPromptTemplate) -> str:
+    """Render a prompt template with its variables left as placeholders."""
+    return prompt.format(**{name: f"{{{name}}}" for name in prompt.input_variables})
+
+class LLMCache:
+    """Two-tier cache for model responses: an in-memory LRU in front of SQLite.
+
+    Entries are stored per namespace (one per agent operation) with that
+    namespace's TTL. A TTL of zero or less disables caching for the namespace.
+    Callers that pass the query also get a semantic tier behind the exact
+    one, which serves responses stored for paraphrases of the query.
+    Responses produced while the current request is degraded (e.g. its web
+    search timed out) are not stored, so they aren't served as full answers.
+
+    Only a writer thread writes to SQLite: `set` fills the memory tier and
+    queues the disk write, and async callers use `get_async`, which looks up
+    the disk tier on a worker thread. The writer keeps a running total of
+    the bytes on disk, so enforcing the size cap never scans the table.
+    """
+
+    def __init__(self, path: Optional[str] = LLM_CACHE_FILE,
+                 max_memory_entries: int = LLM_CACHE_MEMORY_ENTRIES,
+                 max_disk_bytes: int = LLM_CACHE_MAX_BYTES,
+                 ttls: Optional[Dict[str, float]] = None,
+                 semantic: Optional[SemanticCache] = None, max_pending: int = LLM_CACHE_WRITE_QUEUE):
+        """Initialize the cache.
+
+        Args:
+            path: SQLite file for the disk tier (None keeps the cache in memory only)
+            max_memory_entries: Capacity of the in-memory LRU tier
+            max_disk_bytes: Total size of cached values kept on disk
+            ttls: Seconds to keep entries per namespace (defaults to LLM_CACHE_TTLS)
+            semantic: Near-duplicate tier consulted after an exact miss (None for exact matches only)
+            max_pending: Number of disk writes that may wait for the writer thread
+        """
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttls = dict(LLM_CACHE_TTLS if ttls is None else ttls)
+        self.semantic = semantic
+        self.stats = {
+            "memory_hits": 0, "disk_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "degraded_skips": 0,
+            "dropped_writes": 0,
+        }
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        # _lock guards the memory tier and stats, _db_lock the SQLite connection
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._writer: Optional[threading.Thread] = None
+        # Total size of the values on disk, kept up to date by the writer thread
+        self._disk_bytes = 0
+
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)")
+            self._db.commit()
+            self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            self._writer = threading.Thread(target=self._run, name="llm-cache-writer", daemon=True)
+            self._writer.start()
+
+    def ttl_for(self, namespace: str) -> float:
+        """Return the TTL in seconds for a namespace."""
+        return self.ttls.get(namespace, self.ttls.get("default", 0))
+
+    def enabled_for(self, namespace: str) -> bool:
+        """Whether responses in this namespace are cached at all."""
+        return self.ttl_for(namespace) > 0
+
+    def make_key(self, namespace: str, model: Any, prompt: ChatPromptTemplate, query: str) -> str:
+        """Build the cache key for a model call.
+
+        Args:
+            namespace: The agent operation, e.g. "tutorial"
+            model: The chat model (its name and temperature are part of the key)
+            prompt: The prompt template used for the call
+            query: The user's input, normalized before hashing
+
+        Returns:
+            A hex digest identifying the call
+        """
+        payload = json.dumps([
+            namespace,
+            str(getattr(model, "model", type(model).__name__)),
+            str(getattr(model, "temperature", None)),
+            _prompt_text(prompt),
+            normalize_input(query),
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, namespace: str, key: str, query: Optional[str] = None) -> Optional[str]:
+        """Return a cached response, or None on a miss or when the namespace is not cached.
+
+        Looks up the disk tier on the calling thread; use get_async on the event loop.
+
+        Args:
+            namespace: The agent operation, e.g. "tutorial"
+            key: The exact cache key from make_key
+            query: The user's query, to also look for responses to paraphrases of it
+        """
+        if not self.enabled_for(namespace):
+            return None
+
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is None:
+            value = self._get_disk(key, now)
+        if value is None:
+            value = self._get_semantic(namespace, key, query, now)
+        return value
+
+    async def get_async(self, namespace: str, key: str, query: Optional[str] = None) -> Optional[str]:
+        """Like get, but looks up the disk tier on a worker thread so the event loop never waits on SQLite."""
+        if not self.enabled_for(namespace):
+            return None
+
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is None and self._db is not None:
+            value = await asyncio.to_thread(self._get_disk, key, now)
+        if value is None:
+            value = self._get_semantic(namespace, key, query, now)
+        return value
+
+    def _get_memory(self, key: str, now: float) -> Optional[str]:
+        """Return an unexpired entry from the memory tier."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] > now:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[0]
+        return None
+
+    def _get_disk(self, key: str, now: float) -> Optional[str]:
+        """Return an unexpired entry from the disk tier, promoting it to memory."""
+        with self._db_lock:
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+        if row is None:
+            return None
+        self._enqueue(("touch", key, now))
+        with self._lock:
+            self._remember(key, row[0], row[1])
+            self.stats["disk_hits"] += 1
+        return row[0]
+
+    def _get_semantic(self, namespace: str, key: str, query: Optional[str], now: float) -> Optional[str]:
+        """Return a response stored for a paraphrase of the query, counting a miss if there is none."""
+        if query is not None and self.semantic is not None:
+            value = self.semantic.get(namespace, query)
+            if value is not None:
+                with self._lock:
+                    self._remember(key, value, now + self.ttl_for(namespace))
+                    self.stats["semantic_hits"] += 1
+                return value
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def set(self, namespace: str, key: str, value: str, query: Optional[str] = None) -> None:
+        """Store a response under the namespace's TTL (and for paraphrases of `query`, if given)."""
+        ttl = self.ttl_for(namespace)
+        if ttl <= 0:
+            return
+        if is_degraded():
+            with self._lock:
+                self.stats["degraded_skips"] += 1
+            return
+        if query is not None and self.semantic is not None:
+            self.semantic.set(namespace, query, value)
+
+        now = time.time()
+        expires_at = now + ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+        self._enqueue(("set", key, value, expires_at, now))
+
+    def _enqueue(self, write: Tuple[Any, ...]) -> None:
+        """Hand a disk write to the writer thread, dropping it if the writer is too far behind."""
+        if self._writer is None:
+            return
+        try:
+            self._queue.put_nowait(write)
+        except queue.Full:
+            with self._lock:
+                self.stats["dropped_writes"] += 1
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        """Put an entry in the memory tier, evicting the least recently used ones."""
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _run(self) -> None:
+        """Writer loop: apply whatever writes are queued in one transaction."""
+        while True:
+            batch = [self._queue.get()]
+            while batch[-1] is not _STOP:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._db_lock:
+                    self._write_batch([write for write in batch if write is not _STOP])
+            except sqlite3.Error as e:
+                logger.warning("LLM cache write error: %s", e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if batch[-1] is _STOP:
+                return
+
+    def _write_batch(self, batch: List[Tuple[Any, ...]]) -> None:
+        """Apply queued stores and access-time updates, then enforce the size cap."""
+        if not batch:
+            return
+        now = 0.0
+        for write in batch:
+            if write[0] == "touch":
+                _, key, accessed = write
+                self._db.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (accessed, key))
+                continue
+            _, key, value, expires_at, now = write
+            size = len(value.encode("utf-8"))
+            row = self._db.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, expires_at, now)
+            )
+            self._disk_bytes += size - (row[0] if row is not None else 0)
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_disk(now or time.time())
+        self._db.commit()
+
+    def _evict_disk(self, now: float) -> None:
+        """Drop expired rows, then least recently used rows until under the size cap."""
+        for key, size in self._db.execute("SELECT key, size FROM llm_cache WHERE expires_at <= ?", (now,)).fetchall():
+            self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._disk_bytes -= size
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+
+        for key, size in self._db.execute("SELECT key, size FROM llm_cache ORDER BY last_access").fetchall():
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._disk_bytes -= size
+            with self._lock:
+                self.stats["evictions"] += 1
+
+    def flush(self) -> None:
+        """Block until every queued disk write has been applied."""
+        if self._writer is not None:
+            self._queue.join()
+
+    def clear(self) -> None:
+        """Remove every cached entry from both tiers."""
+        if self.semantic is not None:
+            self.semantic.clear()
+        with self._lock:
+            self._memory.clear()
+        self.flush()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+                self._disk_bytes = 0
+
+    def close(self) -> None:
+        """Apply pending disk writes, stop the writer thread and close the disk tier."""
+        if self._writer is not None:
+            self._queue.put(_STOP)
+            self._writer.join()
+            self._writer = None
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+_cache: Optional[LLMCache] = None
+
+def get_llm_cache() -> LLMCache:
+    """Return the process-wide LLM response cache."""
+    global _cache
+    if _cache is None:
+        _cache = LLMCache(path=LLM_CACHE_FILE if LLM_CACHE_ENABLED else None,
+                          ttls=None if LLM_CACHE_ENABLED else {},
+                          semantic=SemanticCache() if SEMANTIC_CACHE_ENABLED else None)
+    return _cache
+
+def set_llm_cache(cache: Optional[LLMCache]) -> None:
+    """Replace the process-wide cache (None resets it to the configured default)."""
+    global _cache
+    if _cache is not None and _cache is not cache:
+        _cache.close()
+    _cache = cache
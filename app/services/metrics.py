@@ -0,0 +1,489 @@
+import bisect
+import functools
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.runnables.base import coerce_to_runnable
+from starlette.routing import Match
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+SIZE_BUCKETS = (0, 256, 1024, 4096, 16384, 65536, 262144)
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class MetricsRegistry:
+    """The metrics rendered by /metrics, in registration order."""
+
+    def __init__(self):
+        self._metrics: List["Metric"] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "Metric") -> None:
+        """Add a metric.
+
+        Raises:
+            ValueError: If a metric with the same name is already registered
+        """
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Drop every recorded value (the metrics stay registered)."""
+        with self._lock:
+            metrics = list(self._metrics)
+        for metric in metrics:
+            metric.clear()
+
+REGISTRY = MetricsRegistry()
+
+class Metric:
+    """A named metric with a fixed set of label names; one value per combination of label values."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 registry: Optional[MetricsRegistry] = REGISTRY):
+        """Initialize the metric and register it.
+
+        Args:
+            name: The metric name
+            help: One-line description
+            labels: Label names every update must set
+            registry: Where the metric is rendered from (None to leave it unregistered)
+        """
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        """Return the label values in label-name order.
+
+        Raises:
+            ValueError: If the labels don't match the metric's label names
+        """
+        if len(labels) != len(self.labels) or any(name not in labels for name in self.labels):
+            raise ValueError(f"{self.name} takes labels {', '.join(self.labels) or '(none)'}, got {', '.join(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def value(self, **labels: Any) -> Any:
+        """Return the current value for a combination of label values (None if never updated)."""
+        with self._lock:
+            return self._values.get(self._key(labels))
+
+    def samples(self) -> List[str]:
+        """Render the metric's sample lines."""
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+class Counter(Metric):
+    """A value that only goes up."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+class Gauge(Metric):
+    """A value that goes up and down."""
+
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track(self, **labels: Any) -> Iterator[None]:
+        """Count the block as in progress while it runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+                 registry: Optional[MetricsRegistry] = REGISTRY):
+        """Initialize the histogram and register it.
+
+        Args:
+            name: The metric name
+            help: One-line description
+            labels: Label names every observation must set
+            buckets: Bucket upper bounds in increasing order (+Inf is added)
+            registry: Where the metric is rendered from (None to leave it unregistered)
+        """
+        super().__init__(name, help, labels, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            entry["buckets"][index] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observe how many seconds the block takes, whether or not it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def value(self, **labels: Any) -> Optional[Dict[str, Any]]:
+        entry = super().value(**labels)
+        return None if entry is None else {"buckets": list(entry["buckets"]), "sum": entry["sum"],
+                                           "count": entry["count"]}
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, dict(entry, buckets=list(entry["buckets"]))) for key, entry in self._values.items())
+        lines = []
+        for key, entry in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), entry["buckets"]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(entry['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {entry['count']}")
+        return lines
+
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests being handled, including streams still sending.", ("method", "route")
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time from request to the end of the response body.",
+    ("method", "route", "status")
+)
+WORKFLOW_NODE_DURATION = Histogram(
+    "workflow_node_duration_seconds", "Time spent in each workflow graph node.", ("node",)
+)
+LLM_CALL_DURATION = Histogram(
+    "llm_call_duration_seconds", "Model call time, including scheduler queueing and retries.",
+    ("agent", "model", "outcome")
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds", "Time until a streamed model call yields its first chunk.", ("agent", "model")
+)
+LLM_INPUT_TOKENS = Histogram(
+    "llm_input_tokens", "Prompt tokens per model call, as reported by the model.", ("agent", "model"),
+    buckets=TOKEN_BUCKETS
+)
+LLM_OUTPUT_TOKENS = Histogram(
+    "llm_output_tokens", "Output tokens per model call, as reported by the model.", ("agent", "model"),
+    buckets=TOKEN_BUCKETS
+)
+LLM_ERRORS = Counter(
+    "llm_errors_total", "Model calls that raised, by exception type.", ("agent", "model", "error")
+)
+LLM_FALLBACKS = Counter(
+    "llm_fallbacks_total", "Canned responses served instead of a model response.", ("agent", "reason")
+)
+SEARCH_DURATION = Histogram(
+    "search_duration_seconds", "Upstream search time (cache hits don't reach the provider).", ("provider", "outcome")
+)
+SEARCH_RESULT_SIZE = Histogram(
+    "search_result_chars", "Characters of result text per upstream search.", ("provider",), buckets=SIZE_BUCKETS
+)
+AGENT_ERRORS = Counter(
+    "agent_errors_total", "Agent operations whose model or search call failed, by exception type.",
+    ("operation", "error")
+)
+ARTIFACT_SAVE_DURATION = Histogram(
+    "artifact_save_duration_seconds", "Time save_file blocks its caller (queueing, or writing when the queue is full).",
+    ("kind",)
+)
+ARTIFACT_WRITE_DURATION = Histogram(
+    "artifact_write_duration_seconds", "Time the artifact writer takes to write, fsync and index a batch."
+)
+
+_agent_logger = logging.getLogger("app.agents")
+
+def record_agent_error(operation: str, error: BaseException) -> None:
+    """Count a failed agent operation (e.g. "tutorial") and log it with its traceback."""
+    AGENT_ERRORS.inc(operation=operation, error=type(error).__name__)
+    _agent_logger.warning("%s failed: %s", operation, error, exc_info=error)
+
+def render_metrics() -> str:
+    """Render the process-wide metrics for a Prometheus scrape."""
+    return REGISTRY.render()
+
+def _usage(message: Any) -> Tuple[Optional[int], Optional[int]]:
+    """Return the input and output token counts a model reported for a message or chunk."""
+    usage = getattr(message, "usage_metadata", None)
+    if not isinstance(usage, dict):
+        return None, None
+    return usage.get("input_tokens"), usage.get("output_tokens")
+
+class MeteredChatModel(Runnable):
+    """Wraps a chat model so that each call's latency, token counts and errors are recorded under an agent's name.
+
+    Attribute lookups fall through to the wrapped model, so it can stand in
+    wherever the model itself was used (cache keys read `model` and `temperature`).
+    """
+
+    def __init__(self, model: Any, agent: str):
+        """Initialize the wrapper.
+
+        Args:
+            model: The chat model (usually already wrapped by the LLM scheduler)
+            agent: The agent making the calls, used as a label
+        """
+        self.wrapped = model
+        self.bound = coerce_to_runnable(model)
+        self.agent = agent
+        name = getattr(model, "model", None)
+        self.model_name = name if isinstance(name, str) else type(getattr(model, "wrapped", model)).__name__
+
+    def __getattr__(self, name: str) -> Any:
+        if name in ("wrapped", "bound", "agent", "model_name"):
+            raise AttributeError(name)
+        return getattr(self.wrapped, name)
+
+    def bind(self, **kwargs: Any) -> "MeteredChatModel":
+        """Bind call arguments to the wrapped model, keeping the metering."""
+        return MeteredChatModel(self.wrapped.bind(**kwargs), self.agent)
+
+    def _record(self, started: float, outcome: str, input_tokens: Optional[int] = None,
+                output_tokens: Optional[int] = None, error: Optional[BaseException] = None) -> None:
+        labels = {"agent": self.agent, "model": self.model_name}
+        LLM_CALL_DURATION.observe(time.perf_counter() - started, outcome=outcome, **labels)
+        if error is not None:
+            LLM_ERRORS.inc(error=type(error).__name__, **labels)
+        if input_tokens is not None:
+            LLM_INPUT_TOKENS.observe(input_tokens, **labels)
+        if output_tokens is not None:
+            LLM_OUTPUT_TOKENS.observe(output_tokens, **labels)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            result = self.bound.invoke(input, config, **kwargs)
+        except Exception as e:
+            self._record(started, "error", error=e)
+            raise
+        self._record(started, "ok", *_usage(result))
+        return result
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            result = await self.bound.ainvoke(input, config, **kwargs)
+        except Exception as e:
+            self._record(started, "error", error=e)
+            raise
+        self._record(started, "ok", *_usage(result))
+        return result
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None,
+                      **kwargs: Optional[Any]) -> AsyncIterator[Any]:
+        started = time.perf_counter()
+        outcome, error = "cancelled", None
+        tokens: List[Optional[int]] = [None, None]
+        first = True
+        try:
+            async for chunk in self.bound.astream(input, config, **kwargs):
+                if first:
+                    LLM_TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - started, agent=self.agent,
+                                                    model=self.model_name)
+                    first = False
+                for i, count in enumerate(_usage(chunk)):
+                    if count is not None:
+                        tokens[i] = (tokens[i] or 0) + count
+                yield chunk
+            outcome = "ok"
+        except Exception as e:
+            outcome, error = "error", e
+            raise
+        finally:
+            self._record(started, outcome, *tokens, error=error)
+
+class MeteredModel:
+    """An agent's `model`: whatever model is assigned is wrapped in a MeteredChatModel for the agent."""
+
+    def __init__(self, agent: str):
+        """Initialize the attribute for the agent whose calls it labels."""
+        self.agent = agent
+        self.attr = "_model"
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.attr = f"_{name}"
+
+    def __get__(self, obj: Any, objtype: Optional[type] = None) -> Any:
+        if obj is None:
+            return self
+        return getattr(obj, self.attr, None)
+
+    def __set__(self, obj: Any, value: Any) -> None:
+        if value is not None and not isinstance(value, MeteredChatModel):
+            value = MeteredChatModel(value, self.agent)
+        setattr(obj, self.attr, value)
+
+def counts_fallback(agent: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Count each call of an agent's fallback method; `reason` is "forced" when the agent is in fallback mode."""
+    def decorate(method: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(method)
+        def run(self: Any, *args: Any, **kwargs: Any) -> Any:
+            LLM_FALLBACKS.inc(agent=agent, reason="forced" if self.use_fallback else "error")
+            return method(self, *args, **kwargs)
+        return run
+    return decorate
+
+def _result_size(results: Any) -> int:
+    """Return the characters of text in raw search results (a string or a list of result dicts)."""
+    if isinstance(results, str):
+        return len(results)
+    if isinstance(results, list):
+        return sum(
+            sum(len(str(value)) for value in hit.values()) if isinstance(hit, dict) else len(str(hit))
+            for hit in results
+        )
+    return len(str(results))
+
+class MeteredSearch:
+    """Wraps a search provider so that each upstream search's latency and result size are recorded."""
+
+    def __init__(self, tool: Any, provider: str):
+        """Initialize the wrapper.
+
+        Args:
+            tool: The search provider or tool
+            provider: Its name, used as a label
+        """
+        self.tool = tool
+        self.provider = provider
+
+    def __getattr__(self, name: str) -> Any:
+        if name in ("tool", "provider"):
+            raise AttributeError(name)
+        return getattr(self.tool, name)
+
+    def _record(self, started: float, results: Any = None, error: bool = False) -> None:
+        SEARCH_DURATION.observe(time.perf_counter() - started, provider=self.provider,
+                                outcome="error" if error else "ok")
+        if not error:
+            SEARCH_RESULT_SIZE.observe(_result_size(results), provider=self.provider)
+
+    def invoke(self, query: str, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            results = self.tool.invoke(query, **kwargs)
+        except Exception:
+            self._record(started, error=True)
+            raise
+        self._record(started, results)
+        return results
+
+    async def ainvoke(self, query: str, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            results = await self.tool.ainvoke(query, **kwargs)
+        except Exception:
+            self._record(started, error=True)
+            raise
+        self._record(started, results)
+        return results
+
+def route_template(scope: Dict[str, Any]) -> str:
+    """Return the path template of the route a request matches (e.g. /api/artifacts/{artifact_id})."""
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", scope["path"])
+    return "unmatched"
+
+class MetricsMiddleware:
+    """ASGI middleware that tracks in-flight HTTP requests and times each one, labelled by route template.
+
+    A streaming response counts as in flight until its last chunk is sent.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        labels = {"method": scope["method"], "route": route_template(scope)}
+        status = ["500"]
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            with HTTP_REQUESTS_IN_FLIGHT.track(**labels):
+                await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, status=status[0], **labels)
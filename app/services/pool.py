@@ -0,0 +1,87 @@
+from typing import Optional
+from langchain_core.runnables import RunnableConfig
+
+from app.config import GEMINI_FLASH_MODEL, ROUTER_MAX_OUTPUT_TOKENS
+from app.services.artifacts import get_artifact_store
+from app.services.clients import get_chat_model, clear_clients
+from app.services.context import get_context_compressor
+from app.services.coalescer import RequestCoalescer
+from app.services.llm_cache import get_llm_cache
+from app.services.metrics import MeteredModel
+from app.services.search_cache import get_cached_search_tool, reset_search_cache
+from app.services.search_providers import reset_search_providers
+from app.services.sessions import get_session_store
+from app.agents.learning import LearningResourceAgent
+from app.agents.interview import InterviewAgent
+from app.agents.resume import ResumeMaker
+from app.agents.job import JobSearch
+from app.workflows.intent import get_intent_classifier
+
+class AgentPool:
+    """Long-lived agents and model clients shared by every request.
+    
+    Agents hold no per-request state, so a single instance of each can serve
+    concurrent requests from endpoints and graph nodes alike.
+    """
+    
+    # The routing model's calls are recorded in the LLM metrics as the "router" agent
+    router_model = MeteredModel("router")
+    
+    def __init__(self):
+        """Build the shared clients and one instance of every agent."""
+        # Routing only emits a route name, so keep it greedy, short and without thinking tokens
+        self.router_model = get_chat_model(
+            GEMINI_FLASH_MODEL,
+            temperature=0.0,
+            max_output_tokens=ROUTER_MAX_OUTPUT_TOKENS,
+            thinking_budget=0
+        )
+        self.search_tool = get_cached_search_tool()
+        self.llm_cache = get_llm_cache()
+        self.artifacts = get_artifact_store()
+        self.artifacts.start()
+        self.context = get_context_compressor()
+        self.sessions = get_session_store()
+        self.sessions.sweep()
+        shared = {"search_tool": self.search_tool, "cache": self.llm_cache, "context": self.context}
+        self.learning = LearningResourceAgent(**shared)
+        self.interview = InterviewAgent(**shared, sessions=self.sessions)
+        self.resume = ResumeMaker(**shared)
+        self.job = JobSearch(**shared)
+        self.intent_classifier = get_intent_classifier()
+        self.coalescer = RequestCoalescer()
+
+_pool: Optional[AgentPool] = None
+
+def init_pool() -> AgentPool:
+    """Create the process-wide agent pool (called from the app lifespan)."""
+    global _pool
+    _pool = AgentPool()
+    return _pool
+
+def get_pool() -> AgentPool:
+    """Return the process-wide agent pool, creating it on first use.
+    
+    Used as a FastAPI dependency and as the fallback for graph nodes that
+    are run without a pool in their config.
+    """
+    if _pool is None:
+        return init_pool()
+    return _pool
+
+def close_pool() -> None:
+    """Release the agent pool and its cached clients, spilling live interview sessions to disk."""
+    global _pool
+    if _pool is not None:
+        _pool.sessions.flush()
+        _pool.artifacts.flush()
+        _pool.llm_cache.flush()
+    _pool = None
+    reset_search_cache()
+    reset_search_providers()
+    clear_clients()
+
+def pool_from_config(config: Optional[RunnableConfig]) -> AgentPool:
+    """Return the pool passed to a graph run, or the process-wide one."""
+    pool = ((config or {}).get("configurable") or {}).get("pool")
+    return pool if pool is not None else get_pool()
@@ -0,0 +1,498 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.runnables.base import coerce_to_runnable
+
+from app.config import (
+    LLM_EXPECTED_OUTPUT_TOKENS,
+    LLM_MAX_QUEUE_WAIT,
+    LLM_MAX_RETRIES,
+    LLM_QUEUE_LIMIT,
+    LLM_RATE_LIMITS,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    LLM_SCHEDULER_ENABLED,
+)
+from app.services.breaker import get_breaker
+from app.services.deadlines import DeadlineExceeded, current_deadline, mark_degraded
+from app.services.metrics import MeteredChatModel
+from app.utils.async_utils import run_sync
+from app.utils.text_utils import estimate_tokens
+
+T = TypeVar("T")
+
+# Lower runs first: mock interview turns ahead of one-off requests ahead of bulk work
+PRIORITIES = {"interactive": 0, "normal": 1, "batch": 2}
+
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("llm_priority", default="normal")
+
+@contextmanager
+def llm_priority(name: str) -> Iterator[None]:
+    """Run the model calls made inside the block (and tasks started from it) at a priority class."""
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+class SchedulerRejected(RuntimeError):
+    """A model call was refused because its queue is full or it could not start in time."""
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Whether an exception is the provider reporting an exhausted quota (HTTP 429)."""
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests", "RateLimitError"):
+        return True
+    text = str(error)
+    return "429" in text or "RESOURCE_EXHAUSTED" in text
+
+class TokenBucket:
+    """Refills continuously at `per_minute / 60` per second, holding at most a minute's worth."""
+
+    def __init__(self, per_minute: float):
+        """Initialize a full bucket (a limit of 0 or less never runs dry)."""
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        """Add what has accrued since the last update."""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float, capped: bool = True) -> float:
+        """Seconds until `amount` can be taken.
+
+        A single call larger than the bucket waits for a full bucket; pass
+        `capped=False` to estimate how long several queued calls take to drain.
+        """
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        if capped:
+            amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float, now: float) -> None:
+        """Remove `amount` (or correct an earlier estimate with a negative one)."""
+        if self.rate <= 0:
+            return
+        self._refill(now)
+        self.level = min(self.capacity, self.level - amount)
+
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after the provider reported a 429."""
+        self.level = min(self.level, 0.0)
+
+class _Waiter:
+    """A call waiting for quota; only the head of its model's queue ever checks the buckets."""
+
+    __slots__ = ("priority", "seq", "tokens", "loop", "event")
+
+    def __init__(self, priority: int, seq: int, tokens: int):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def wake(self) -> None:
+        """Wake the waiter, whichever thread's event loop it runs on."""
+        self.loop.call_soon_threadsafe(self.event.set)
+
+class _ModelQueue:
+    """Quota buckets and the priority queue of waiting calls for one model."""
+
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.heap: List[_Waiter] = []
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        """Seconds until one call of `tokens` fits in both buckets."""
+        return max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+
+class LLMScheduler:
+    """Central admission control for model calls against per-model quotas.
+
+    Every call takes one request and its estimated tokens from its model's
+    requests-per-minute and tokens-per-minute buckets. Calls that don't fit
+    wait in a priority queue (interactive before normal before batch, then
+    first come first served). A call is refused up front if the queue is full
+    or if it could not start before its deadline, so callers fall back quickly
+    instead of timing out. Rate-limited (429) responses empty the buckets and
+    are retried with full-jitter exponential backoff. Calls fail fast while
+    the upstream's circuit breaker is open. Unless given one, a call takes the
+    current request's deadline, which also bounds how long async calls run.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None,
+                 max_queue: int = LLM_QUEUE_LIMIT,
+                 max_wait: Optional[Dict[str, float]] = None,
+                 max_retries: int = LLM_MAX_RETRIES,
+                 base_delay: float = LLM_RETRY_BASE_DELAY,
+                 max_delay: float = LLM_RETRY_MAX_DELAY,
+                 upstream: Optional[str] = None):
+        """Initialize the scheduler.
+
+        Args:
+            limits: {"rpm": ..., "tpm": ...} per model name (defaults to LLM_RATE_LIMITS)
+            max_queue: Calls that may wait per model
+            max_wait: Longest queue wait in seconds per priority class (defaults to LLM_MAX_QUEUE_WAIT)
+            max_retries: Retries of a rate-limited call
+            base_delay: Backoff before the first retry, doubled on each further one
+            max_delay: Cap on the backoff
+            upstream: Name of the circuit breaker guarding the calls (None for no breaker)
+        """
+        self.limits = dict(LLM_RATE_LIMITS if limits is None else limits)
+        self.max_queue = max_queue
+        self.max_wait = dict(LLM_MAX_QUEUE_WAIT if max_wait is None else max_wait)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.upstream = upstream
+        self.stats = {"calls": 0, "queued": 0, "rejected": 0, "retries": 0, "rate_limited": 0, "wait_seconds": 0.0}
+        self._queues: Dict[str, _ModelQueue] = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _queue_for(self, model: str) -> _ModelQueue:
+        """Return the queue of a model, creating it from its limits (unknown models are unlimited)."""
+        queue = self._queues.get(model)
+        if queue is None:
+            limits = self.limits.get(model, {})
+            queue = self._queues[model] = _ModelQueue(limits.get("rpm", 0), limits.get("tpm", 0))
+        return queue
+
+    def _deadline(self, priority: str, deadline: Optional[float]) -> float:
+        """Latest monotonic time a call may start: its own deadline or its class's maximum wait."""
+        latest = time.monotonic() + self.max_wait.get(priority, self.max_wait.get("normal", 60))
+        return latest if deadline is None else min(latest, deadline)
+
+    async def acquire(self, model: str, tokens: int, priority: str = "normal",
+                      deadline: Optional[float] = None) -> None:
+        """Wait until a call fits in the model's quota and take it.
+
+        Args:
+            model: The model name
+            tokens: Estimated prompt plus output tokens
+            priority: Priority class name (see PRIORITIES)
+            deadline: Latest monotonic time the call may start
+
+        Raises:
+            SchedulerRejected: If the queue is full or the call cannot start before its deadline
+        """
+        deadline = self._deadline(priority, deadline)
+        waiter = _Waiter(PRIORITIES.get(priority, PRIORITIES["normal"]), next(self._seq), tokens)
+        started = time.monotonic()
+
+        with self._lock:
+            queue = self._queue_for(model)
+            if len(queue.heap) >= self.max_queue:
+                self.stats["rejected"] += 1
+                raise SchedulerRejected(f"{model} queue is full")
+
+            # Deadline-aware admission: the quota ahead of this call must refill in time
+            ahead = [other for other in queue.heap if other < waiter]
+            estimate = max(
+                queue.requests.wait_time(1 + len(ahead), started, capped=False),
+                queue.tokens.wait_time(min(tokens, queue.tokens.capacity) + sum(other.tokens for other in ahead),
+                                       started, capped=False)
+            )
+            if started + estimate > deadline:
+                self.stats["rejected"] += 1
+                raise SchedulerRejected(f"{model} quota can't serve the call within its deadline")
+            heapq.heappush(queue.heap, waiter)
+
+        try:
+            while True:
+                waiter.event.clear()
+                with self._lock:
+                    now = time.monotonic()
+                    wait = None
+                    if queue.heap[0] is waiter:
+                        wait = queue.wait_time(tokens, now)
+                        if wait <= 0:
+                            queue.requests.take(1, now)
+                            queue.tokens.take(tokens, now)
+                            heapq.heappop(queue.heap)
+                            if queue.heap:
+                                queue.heap[0].wake()
+                            self.stats["calls"] += 1
+                            if now > started:
+                                self.stats["queued"] += 1
+                                self.stats["wait_seconds"] += now - started
+                            return
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    self.stats["rejected"] += 1
+                    raise SchedulerRejected(f"{model} call waited past its deadline")
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), min(wait, remaining) if wait is not None else remaining)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._lock:
+                if waiter in queue.heap:
+                    was_head = queue.heap[0] is waiter
+                    queue.heap.remove(waiter)
+                    heapq.heapify(queue.heap)
+                    if was_head and queue.heap:
+                        queue.heap[0].wake()
+            raise
+
+    def settle(self, model: str, estimated: int, actual: Optional[int]) -> None:
+        """Correct the tokens taken for a call once its real usage is known."""
+        if not actual:
+            return
+        with self._lock:
+            self._queue_for(model).tokens.take(actual - estimated, time.monotonic())
+
+    def _retry_delay(self, model: str, error: BaseException, attempt: int) -> Optional[float]:
+        """Return the backoff before retrying a failed call, or None if it must not be retried."""
+        if not is_rate_limited(error):
+            return None
+        self.stats["rate_limited"] += 1
+        with self._lock:
+            queue = self._queue_for(model)
+            queue.requests.drain()
+            queue.tokens.drain()
+        if attempt >= self.max_retries:
+            return None
+        self.stats["retries"] += 1
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def run(self, model: str, call: Callable[[], Awaitable[T]], tokens: int,
+                  priority: Optional[str] = None, deadline: Optional[float] = None) -> T:
+        """Run an async model call within the quota, retrying it on 429s.
+
+        Args:
+            model: The model name
+            call: Makes the call (invoked again for every retry)
+            tokens: Estimated prompt plus output tokens
+            priority: Priority class name (defaults to the one set with llm_priority)
+            deadline: Monotonic time by which the call must be done (defaults to the request's deadline)
+
+        Returns:
+            The call's result
+
+        Raises:
+            DeadlineExceeded: If the call is still running at its deadline (not counted against the breaker)
+        """
+        deadline = deadline if deadline is not None else current_deadline()
+        try:
+            if self.upstream is None:
+                return await self._run(model, call, tokens, priority, deadline)
+            return await get_breaker(self.upstream).call(
+                lambda: self._run(model, call, tokens, priority, deadline),
+                ignore=(SchedulerRejected, DeadlineExceeded)
+            )
+        except Exception as e:
+            mark_degraded("model_timeout" if isinstance(e, asyncio.TimeoutError) else "model_error")
+            raise
+
+    async def _run(self, model: str, call: Callable[[], Awaitable[T]], tokens: int,
+                   priority: Optional[str], deadline: Optional[float]) -> T:
+        """Admit and make a call, retrying it on 429s."""
+        priority = priority or _priority.get()
+        for attempt in itertools.count():
+            await self.acquire(model, tokens, priority, deadline)
+            try:
+                if deadline is None:
+                    return await call()
+                try:
+                    return await asyncio.wait_for(call(), max(deadline - time.monotonic(), 0.0))
+                except asyncio.TimeoutError:
+                    if time.monotonic() < deadline:
+                        # the provider's own timeout, which is its failure
+                        raise
+                    raise DeadlineExceeded(f"{model} call ran past its request's deadline") from None
+            except Exception as e:
+                delay = self._retry_delay(model, e, attempt)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+
+    def run_blocking(self, model: str, call: Callable[[], T], tokens: int,
+                     priority: Optional[str] = None, deadline: Optional[float] = None) -> T:
+        """Synchronous counterpart of `run` for the agents' blocking code paths.
+
+        The deadline only bounds the wait for admission; a blocking call can't be interrupted.
+        """
+        deadline = deadline if deadline is not None else current_deadline()
+        try:
+            if self.upstream is not None:
+                return get_breaker(self.upstream).call_blocking(
+                    lambda: self._run_blocking(model, call, tokens, priority, deadline),
+                    ignore=(SchedulerRejected,)
+                )
+            return self._run_blocking(model, call, tokens, priority, deadline)
+        except Exception:
+            mark_degraded("model_error")
+            raise
+
+    def _run_blocking(self, model: str, call: Callable[[], T], tokens: int,
+                      priority: Optional[str], deadline: Optional[float]) -> T:
+        """Admit and make a blocking call, retrying it on 429s."""
+        priority = priority or _priority.get()
+        for attempt in itertools.count():
+            run_sync(self.acquire(model, tokens, priority, deadline))
+            try:
+                return call()
+            except Exception as e:
+                delay = self._retry_delay(model, e, attempt)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the counters plus the number of calls waiting per model."""
+        with self._lock:
+            waiting = {model: len(queue.heap) for model, queue in self._queues.items()}
+        return {**self.stats, "waiting": waiting}
+
+def _input_tokens(value: Any) -> int:
+    """Estimate the prompt tokens of a model input (prompt value, messages or text)."""
+    if hasattr(value, "to_string"):
+        return estimate_tokens(value.to_string())
+    if isinstance(value, list):
+        return sum(estimate_tokens(str(getattr(message, "content", message))) for message in value)
+    return estimate_tokens(str(value))
+
+def _usage_tokens(message: Any) -> Optional[int]:
+    """Return the total tokens a response reports using, if any."""
+    usage = getattr(message, "usage_metadata", None)
+    total = usage.get("total_tokens") if isinstance(usage, dict) else None
+    return total if isinstance(total, int) else None
+
+class ScheduledChatModel(Runnable):
+    """Wraps a chat model so that every invoke and stream goes through the LLM scheduler.
+
+    Attribute lookups fall through to the wrapped model, so it can stand in
+    wherever the model itself was used (cache keys read `model` and `temperature`).
+    """
+
+    def __init__(self, model: Any, scheduler: LLMScheduler, model_name: str, priority: Optional[str] = None):
+        """Initialize the wrapper.
+
+        Args:
+            model: The chat model
+            scheduler: The scheduler that admits its calls
+            model_name: The quota the calls count against
+            priority: Priority class of every call (None uses the one set with llm_priority)
+        """
+        self.wrapped = model
+        self.bound = coerce_to_runnable(model)
+        self.scheduler = scheduler
+        self.model_name = model_name
+        self.priority = priority
+
+    def __getattr__(self, name: str) -> Any:
+        if name in ("wrapped", "bound", "scheduler", "model_name", "priority"):
+            raise AttributeError(name)
+        return getattr(self.wrapped, name)
+
+    def bind(self, **kwargs: Any) -> "ScheduledChatModel":
+        """Bind call arguments to the wrapped model, keeping the scheduling."""
+        return ScheduledChatModel(self.wrapped.bind(**kwargs), self.scheduler, self.model_name, self.priority)
+
+    def _estimate(self, input: Any) -> int:
+        """Estimate the tokens a call takes from the quota."""
+        max_output = getattr(self.wrapped, "max_output_tokens", None)
+        if not isinstance(max_output, int):
+            max_output = LLM_EXPECTED_OUTPUT_TOKENS
+        return _input_tokens(input) + max_output
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        tokens = self._estimate(input)
+        result = self.scheduler.run_blocking(
+            self.model_name, lambda: self.bound.invoke(input, config, **kwargs), tokens, self.priority
+        )
+        self.scheduler.settle(self.model_name, tokens, _usage_tokens(result))
+        return result
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        tokens = self._estimate(input)
+        result = await self.scheduler.run(
+            self.model_name, lambda: self.bound.ainvoke(input, config, **kwargs), tokens, self.priority
+        )
+        self.scheduler.settle(self.model_name, tokens, _usage_tokens(result))
+        return result
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None,
+                      **kwargs: Optional[Any]) -> AsyncIterator[Any]:
+        tokens = self._estimate(input)
+        # Admission and 429 retries cover the call up to its first chunk; later failures surface as-is
+        first, stream = await self.scheduler.run(
+            self.model_name,
+            lambda: _first_chunk(self.bound, input, config, kwargs),
+            tokens,
+            self.priority
+        )
+        used = 0
+        try:
+            if first is not None:
+                used += _usage_tokens(first) or 0
+                yield first
+            async for chunk in stream:
+                used += _usage_tokens(chunk) or 0
+                yield chunk
+        finally:
+            await stream.aclose()
+        self.scheduler.settle(self.model_name, tokens, used)
+
+async def _first_chunk(runnable: Runnable, input: Any, config: Optional[RunnableConfig],
+                       kwargs: Dict[str, Any]) -> Tuple[Any, AsyncIterator[Any]]:
+    """Start a stream and wait for its first chunk (None if it is empty), so a 429 on connect can be retried."""
+    stream = runnable.astream(input, config, **kwargs)
+    try:
+        return await stream.__anext__(), stream
+    except StopAsyncIteration:
+        return None, stream
+    except BaseException:
+        await stream.aclose()
+        raise
+
+_scheduler: Optional[LLMScheduler] = None
+
+def get_scheduler() -> LLMScheduler:
+    """Return the process-wide LLM scheduler."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler(upstream="gemini")
+    return _scheduler
+
+def set_scheduler(scheduler: Optional[LLMScheduler]) -> None:
+    """Replace the process-wide scheduler (None resets it to the configured default).
+
+    Models already wrapped keep the scheduler they were built with, so reset
+    the shared clients afterwards.
+    """
+    global _scheduler
+    _scheduler = scheduler
+
+def schedule_model(model: Any, model_name: str) -> Any:
+    """Route a chat model's calls through the scheduler (returned as-is when scheduling is disabled)."""
+    if not LLM_SCHEDULER_ENABLED:
+        return model
+    return ScheduledChatModel(model, get_scheduler(), model_name)
+
+def prioritized(model: Any, priority: str) -> Any:
+    """Return a model whose calls always run at a priority class (unscheduled models are returned as-is)."""
+    if isinstance(model, MeteredChatModel):
+        return MeteredChatModel(prioritized(model.wrapped, priority), model.agent)
+    if isinstance(model, ScheduledChatModel):
+        return ScheduledChatModel(model.wrapped, model.scheduler, model.model_name, priority)
+    return model
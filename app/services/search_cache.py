@@ -0,0 +1,264 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import SEARCH_BUDGET_SHARE, SEARCH_CACHE_MAX_ENTRIES, SEARCH_CACHE_TTLS, SEARCH_CACHE_DEFAULT_TTL
+from app.services.breaker import get_breaker
+from app.services.deadlines import mark_degraded, remaining
+from app.services.llm_cache import normalize_input
+from app.services.metrics import MeteredSearch
+from app.services.search_providers import get_search_provider
+from app.services.streaming import emit_progress
+
+def count_results(results: Any) -> int:
+    """Count the hits in a search result (DuckDuckGo's string format or a list)."""
+    if isinstance(results, list):
+        return len(results)
+    if isinstance(results, str):
+        return results.count("link: ")
+    return 0
+
+class _LeaderCancelled(Exception):
+    """Raised to followers when the request fetching their result was cancelled."""
+
+class CachedSearchTool:
+    """Search tool wrapper with a bounded TTL cache and single-flight upstream calls.
+
+    Exposes the same invoke/ainvoke interface the agents already use, so it can
+    stand in for DuckDuckGoSearchResults. Concurrent misses for the same query
+    share one upstream call; the in-flight marker is a thread-safe future so
+    sync callers, async callers and callers on other event loops all coalesce.
+    Upstream calls go through the upstream's circuit breaker, so while it is
+    open misses fail fast and cached results are still served.
+    """
+
+    def __init__(self, tool: Any, ttls: Optional[List[Tuple[str, float]]] = None,
+                 default_ttl: float = SEARCH_CACHE_DEFAULT_TTL,
+                 max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+                 upstream: Optional[str] = None):
+        """Initialize the cached search tool.
+
+        Args:
+            tool: The upstream search tool
+            ttls: (query prefix, seconds) pairs; the longest matching prefix wins
+            default_ttl: TTL for queries that match no prefix
+            max_entries: Maximum number of cached results
+            upstream: Name of the circuit breaker guarding the tool (None for no breaker)
+        """
+        self.tool = tool
+        pairs = ttls if ttls is not None else SEARCH_CACHE_TTLS
+        self.ttls = sorted(((prefix, float(ttl)) for prefix, ttl in pairs), key=lambda item: -len(item[0]))
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.upstream = upstream
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "upstream_calls": 0,
+            "upstream_errors": 0,
+            "upstream_seconds": 0.0,
+            "upstream_max_seconds": 0.0,
+        }
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def ttl_for(self, query: str) -> float:
+        """Return the TTL for a (normalized) query based on its prefix."""
+        for prefix, ttl in self.ttls:
+            if query.startswith(prefix):
+                return ttl
+        return self.default_ttl
+
+    def metrics(self) -> Dict[str, float]:
+        """Return the counters plus derived hit ratio and mean upstream latency."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_ratio"] = (stats["hits"] + stats["coalesced"]) / lookups if lookups else 0.0
+        stats["upstream_mean_seconds"] = (
+            stats["upstream_seconds"] / stats["upstream_calls"] if stats["upstream_calls"] else 0.0
+        )
+        return stats
+
+    def _lookup(self, key: str) -> Tuple[Any, Optional[Future], bool]:
+        """Check the cache and in-flight table for a key.
+
+        Returns:
+            A tuple of (cached value, future to wait on, whether the caller leads)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[0], None, False
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return None, future, False
+
+            self.stats["misses"] += 1
+            future = Future()
+            self._inflight[key] = future
+            return None, future, True
+
+    def _finish(self, key: str, future: Future, started: float,
+                result: Any = None, error: Optional[BaseException] = None) -> None:
+        """Record an upstream call's outcome, cache successes and wake followers."""
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._inflight.pop(key, None)
+            self.stats["upstream_calls"] += 1
+            self.stats["upstream_seconds"] += elapsed
+            self.stats["upstream_max_seconds"] = max(self.stats["upstream_max_seconds"], elapsed)
+            if error is None:
+                self._entries[key] = (result, time.monotonic() + self.ttl_for(key))
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            elif not isinstance(error, _LeaderCancelled):
+                self.stats["upstream_errors"] += 1
+
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def invoke(self, query: str, **kwargs: Any) -> Any:
+        """Run a search from synchronous code."""
+        key = normalize_input(query)
+        while True:
+            value, future, leader = self._lookup(key)
+            if future is None:
+                return value
+            if not leader:
+                try:
+                    return future.result()
+                except _LeaderCancelled:
+                    continue
+
+            started = time.monotonic()
+            try:
+                if self.upstream is None:
+                    result = self.tool.invoke(query, **kwargs)
+                else:
+                    result = get_breaker(self.upstream).call_blocking(lambda: self.tool.invoke(query, **kwargs))
+            except BaseException as e:
+                self._finish(key, future, started, error=e)
+                raise
+            self._finish(key, future, started, result=result)
+            return result
+
+    async def ainvoke(self, query: str, **kwargs: Any) -> Any:
+        """Run a search without blocking the event loop.
+
+        Under a request deadline the search may only use its share of the time
+        left; past that an empty result is returned so generation can go ahead
+        without it, while the search keeps running to fill the cache.
+        """
+        started = time.monotonic()
+        left = remaining()
+        if left is None:
+            result, source = await self._afetch(query, **kwargs)
+        else:
+            try:
+                result, source = await self._afetch_within(left * SEARCH_BUDGET_SHARE, query, **kwargs)
+            except asyncio.TimeoutError:
+                mark_degraded("search_timeout")
+                emit_progress("search_skipped", query=query, ms=round((time.monotonic() - started) * 1000, 1))
+                return ""
+            except Exception:
+                mark_degraded("search_error")
+                raise
+        emit_progress(
+            "search_done",
+            query=query,
+            results=count_results(result),
+            ms=round((time.monotonic() - started) * 1000, 1),
+            source=source
+        )
+        return result
+
+    async def prefetch(self, query: str, **kwargs: Any) -> Any:
+        """Fetch a search result into the cache ahead of the request that will need it.
+
+        Unlike ainvoke it ignores the request deadline and reports neither
+        progress nor degradation, and cancelling it cancels the upstream call
+        (callers that joined it retry on their own).
+        """
+        result, _ = await self._afetch(query, **kwargs)
+        return result
+
+    async def _afetch_within(self, budget: float, query: str, **kwargs: Any) -> Tuple[Any, str]:
+        """Fetch a search result, giving up waiting for it after `budget` seconds.
+
+        Raises:
+            asyncio.TimeoutError: If the result isn't ready in time (the fetch carries on)
+        """
+        task = asyncio.ensure_future(self._afetch(query, **kwargs))
+        # the fetch outlives a caller that stops waiting, so retrieve its outcome here
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return await asyncio.wait_for(asyncio.shield(task), budget)
+
+    async def _afetch(self, query: str, **kwargs: Any) -> Tuple[Any, str]:
+        """Return a search result and where it came from ("cache", "coalesced" or "upstream")."""
+        key = normalize_input(query)
+        while True:
+            value, future, leader = self._lookup(key)
+            if future is None:
+                return value, "cache"
+            if not leader:
+                try:
+                    # shield so a cancelled follower doesn't cancel the shared future
+                    return await asyncio.shield(asyncio.wrap_future(future)), "coalesced"
+                except _LeaderCancelled:
+                    continue
+
+            started = time.monotonic()
+            try:
+                if self.upstream is None:
+                    result = await self.tool.ainvoke(query, **kwargs)
+                else:
+                    result = await get_breaker(self.upstream).call(lambda: self.tool.ainvoke(query, **kwargs))
+            except asyncio.CancelledError:
+                self._finish(key, future, started, error=_LeaderCancelled())
+                raise
+            except BaseException as e:
+                self._finish(key, future, started, error=e)
+                raise
+            self._finish(key, future, started, result=result)
+            return result, "upstream"
+
+    def clear(self) -> None:
+        """Drop all cached results."""
+        with self._lock:
+            self._entries.clear()
+
+_search_cache: Optional[CachedSearchTool] = None
+_search_cache_lock = threading.Lock()
+
+def get_cached_search_tool() -> CachedSearchTool:
+    """Return the process-wide cached search tool wrapping the configured search provider."""
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            provider = get_search_provider()
+            _search_cache = CachedSearchTool(
+                MeteredSearch(provider, provider.name),
+                upstream=provider.name if provider.remote else None
+            )
+        return _search_cache
+
+def reset_search_cache() -> None:
+    """Drop the process-wide cached search tool."""
+    global _search_cache
+    with _search_cache_lock:
+        _search_cache = None
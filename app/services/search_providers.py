@@ -0,0 +1,136 @@
+import asyncio
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from app.config import (
+    SEARCH_LOCAL_RESULTS,
+    SEARCH_LOCAL_SNIPPET_CHARS,
+    SEARCH_PROVIDER,
+    SEARCH_REINDEX_INTERVAL,
+)
+from app.services.clients import get_search_tool
+from app.services.corpus_index import CorpusIndex
+
+class SearchProvider:
+    """A search backend the agents query through the shared search cache.
+
+    Subclasses implement `invoke`, returning DuckDuckGo-style result text or a
+    list of {"snippet", "title", "link"} dicts; `ainvoke` runs it in a worker
+    thread unless overridden. Remote providers get a circuit breaker named
+    after the provider.
+    """
+
+    name = "provider"
+    remote = True
+
+    def invoke(self, query: str, **kwargs: Any) -> Any:
+        """Run a search."""
+        raise NotImplementedError
+
+    async def ainvoke(self, query: str, **kwargs: Any) -> Any:
+        """Run a search without blocking the event loop."""
+        return await asyncio.to_thread(self.invoke, query, **kwargs)
+
+    def close(self) -> None:
+        """Release the provider's resources."""
+
+class DuckDuckGoProvider(SearchProvider):
+    """Web search through the shared DuckDuckGoSearchResults tool."""
+
+    name = "duckduckgo"
+
+    def invoke(self, query: str, **kwargs: Any) -> Any:
+        return get_search_tool().invoke(query, **kwargs)
+
+    async def ainvoke(self, query: str, **kwargs: Any) -> Any:
+        return await get_search_tool().ainvoke(query, **kwargs)
+
+class LocalCorpusProvider(SearchProvider):
+    """Offline search over a local document corpus with the on-disk BM25 index.
+
+    The index is brought up to date when the provider is created and then
+    re-checked for changed files every `reindex_interval` seconds, in a worker
+    thread for async callers. Searches themselves run inline: they only read
+    the memory-mapped postings of the query's terms.
+    """
+
+    name = "local"
+    remote = False
+
+    def __init__(self, index: Optional[CorpusIndex] = None, limit: int = SEARCH_LOCAL_RESULTS,
+                 snippet_chars: int = SEARCH_LOCAL_SNIPPET_CHARS,
+                 reindex_interval: float = SEARCH_REINDEX_INTERVAL):
+        """Initialize the provider and index the corpus.
+
+        Args:
+            index: The corpus index (defaults to one over SEARCH_CORPUS_DIR)
+            limit: Results returned per search
+            snippet_chars: Characters of each passage returned as its snippet
+            reindex_interval: Seconds between checks for changed files (0 never re-checks)
+        """
+        self.index = index or CorpusIndex()
+        self.limit = limit
+        self.snippet_chars = snippet_chars
+        self.reindex_interval = reindex_interval
+        self.index.refresh()
+
+    def _results(self, query: str) -> List[Dict[str, str]]:
+        """Search the index, trimming each passage to a snippet."""
+        results = []
+        for hit in self.index.search(query, self.limit):
+            snippet = hit["snippet"]
+            if len(snippet) > self.snippet_chars:
+                snippet = snippet[:self.snippet_chars].rsplit(" ", 1)[0] + "..."
+            results.append({"snippet": snippet, "title": hit["title"], "link": hit["link"]})
+        return results
+
+    def invoke(self, query: str, **kwargs: Any) -> List[Dict[str, str]]:
+        if self.index.refresh_due(self.reindex_interval):
+            self.index.refresh()
+        return self._results(query)
+
+    async def ainvoke(self, query: str, **kwargs: Any) -> List[Dict[str, str]]:
+        if self.index.refresh_due(self.reindex_interval):
+            await asyncio.to_thread(self.index.refresh)
+        return self._results(query)
+
+    def close(self) -> None:
+        self.index.close()
+
+# Provider factories by name; register_search_provider adds more
+SEARCH_PROVIDERS: Dict[str, Callable[[], SearchProvider]] = {
+    "duckduckgo": DuckDuckGoProvider,
+    "local": LocalCorpusProvider,
+}
+
+_providers: Dict[str, SearchProvider] = {}
+_providers_lock = threading.Lock()
+
+def register_search_provider(name: str, factory: Callable[[], SearchProvider]) -> None:
+    """Make a search provider selectable by name, e.g. through SEARCH_PROVIDER."""
+    with _providers_lock:
+        SEARCH_PROVIDERS[name] = factory
+        _providers.pop(name, None)
+
+def get_search_provider(name: Optional[str] = None) -> SearchProvider:
+    """Return the process-wide instance of a search provider (defaults to SEARCH_PROVIDER).
+
+    Raises:
+        ValueError: If no provider is registered under the name
+    """
+    name = name or SEARCH_PROVIDER
+    with _providers_lock:
+        if name not in _providers:
+            factory = SEARCH_PROVIDERS.get(name)
+            if factory is None:
+                raise ValueError(f"Unknown search provider: {name} (expected one of {', '.join(SEARCH_PROVIDERS)})")
+            _providers[name] = factory()
+        return _providers[name]
+
+def reset_search_providers() -> None:
+    """Close and drop the provider instances (the next lookup creates fresh ones)."""
+    with _providers_lock:
+        providers = list(_providers.values())
+        _providers.clear()
+    for provider in providers:
+        provider.close()
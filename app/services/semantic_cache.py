@@ -0,0 +1,269 @@
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import (
+    LLM_CACHE_TTLS,
+    SEMANTIC_CACHE_COMMON_SHARE,
+    SEMANTIC_CACHE_DIMENSIONS,
+    SEMANTIC_CACHE_HALF_LIFE,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_MIN_QUERIES,
+    SEMANTIC_CACHE_THRESHOLDS,
+)
+from app.utils.text_utils import tokenize
+
+# Words that change the phrasing of a request but not what is being asked for
+STOPWORDS = frozenset(
+    "a about an and any are as ask at be by can do explain for from give help how i in into is it me my need of on "
+    "or please should show some tell that the this to want what with you your".split()
+)
+
+def _stem(word: str) -> str:
+    """Strip a plural "s" ending."""
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+def _content_words(text: str) -> List[str]:
+    """Return the words of a text without stopwords, with plural "s" endings stripped."""
+    tokens = tokenize(text)
+    words = [token for token in tokens if token not in STOPWORDS] or tokens
+    return [_stem(word) for word in words]
+
+def _name_words(text: str) -> FrozenSet[str]:
+    """Return the content words written like names: "LangChain", "TCS", "GPT4", or capitalised past the first word."""
+    names = set()
+    for position, token in enumerate(re.findall(r"[A-Za-z0-9]+", text)):
+        if (any(char.isupper() for char in token[1:]) or any(char.isdigit() for char in token)
+                or (position > 0 and token[0].isupper())):
+            names.add(_stem(token.lower()))
+    return frozenset(names)
+
+class HashingEmbedder:
+    """Embeds a query as an L2-normalised hashed bag of its content words.
+
+    Each word adds to one signed hashed dimension, and its character trigrams
+    add a smaller weight each, so word order, stopwords and small spelling
+    differences barely move the vector. No model to load: a query embeds in
+    microseconds on the CPU.
+    """
+
+    def __init__(self, dimensions: int = SEMANTIC_CACHE_DIMENSIONS, trigram_weight: float = 0.5):
+        """Initialize the embedder.
+
+        Args:
+            dimensions: Size of the hashed vectors
+            trigram_weight: Total weight of a word's character trigrams relative to the word itself
+        """
+        self.dimensions = dimensions
+        self.trigram_weight = trigram_weight
+
+    def _add(self, vector: np.ndarray, feature: str, weight: float) -> None:
+        """Add a feature to its signed hashed dimension."""
+        # crc32 rather than hash() so vectors are stable across processes
+        digest = zlib.crc32(feature.encode("utf-8"))
+        vector[digest % self.dimensions] += weight if digest & 0x80000000 else -weight
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embed a text as a unit float32 vector (all zeros if it has no words)."""
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in _content_words(text):
+            self._add(vector, word, 1.0)
+            padded = f"#{word}#"
+            trigrams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+            for trigram in trigrams:
+                self._add(vector, f"#3:{trigram}", self.trigram_weight / len(trigrams))
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+class _Namespace:
+    """The vectors and entries of one agent operation; row i of `vectors` belongs to entry i.
+
+    Also counts how many stored queries contain each content word, which tells
+    common words of the operation ("tutorial", "create") from rare ones.
+    """
+
+    def __init__(self, dimensions: int):
+        self.vectors = np.zeros((0, dimensions), dtype=np.float32)
+        self.entries: List[Dict[str, Any]] = []
+        self.word_counts: Counter = Counter()
+
+    def add(self, vector: np.ndarray, entry: Dict[str, Any]) -> None:
+        self.vectors = np.vstack([self.vectors, vector[np.newaxis, :]])
+        self.entries.append(entry)
+        self.word_counts.update(entry["words"])
+
+    def _forget_words(self, words: FrozenSet[str]) -> None:
+        for word in words:
+            self.word_counts[word] -= 1
+            if self.word_counts[word] <= 0:
+                del self.word_counts[word]
+
+    def replace_words(self, index: int, words: FrozenSet[str]) -> None:
+        """Give an entry the words of the query that replaced its own."""
+        self._forget_words(self.entries[index]["words"])
+        self.word_counts.update(words)
+        self.entries[index]["words"] = words
+
+    def remove(self, index: int) -> None:
+        """Drop an entry by moving the last one into its slot."""
+        self._forget_words(self.entries[index]["words"])
+        last = len(self.entries) - 1
+        if index != last:
+            self.vectors[index] = self.vectors[last]
+            self.entries[index] = self.entries[last]
+        self.vectors = self.vectors[:last]
+        self.entries.pop()
+
+class SemanticCache:
+    """Near-duplicate response cache: paraphrased queries share one stored response.
+
+    Queries are embedded locally and kept per agent operation in a NumPy
+    matrix, so a lookup is a single matrix-vector product. A lookup hits when
+    the most similar stored query reaches the operation's threshold; an
+    operation without a threshold isn't cached. A similar query is rejected
+    if a content word only one of the two has looks like an entity: hashed
+    bags of words score long queries that differ in a single name (Infosys
+    vs TCS, LangChain vs LlamaIndex) well above any usable threshold. Until
+    an operation has stored enough queries to tell its rare words, only
+    words written like names count as entities; after that, any word that
+    is rare in the operation does. When an operation is full, the entry with the lowest hit count
+    discounted by its age is evicted.
+    """
+
+    def __init__(self, embedder: Optional[HashingEmbedder] = None,
+                 thresholds: Optional[Dict[str, float]] = None,
+                 ttls: Optional[Dict[str, float]] = None,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+                 half_life: float = SEMANTIC_CACHE_HALF_LIFE,
+                 common_share: float = SEMANTIC_CACHE_COMMON_SHARE,
+                 min_queries: int = SEMANTIC_CACHE_MIN_QUERIES):
+        """Initialize an empty cache.
+
+        Args:
+            embedder: Turns queries into unit vectors (defaults to a HashingEmbedder)
+            thresholds: Minimum cosine similarity for a hit per operation (defaults to SEMANTIC_CACHE_THRESHOLDS)
+            ttls: Seconds an entry is served per operation (defaults to LLM_CACHE_TTLS)
+            max_entries: Entries kept per operation
+            half_life: Seconds after which an entry's hits count half as much for eviction
+            common_share: Share of an operation's stored queries a word must appear in to be allowed to differ
+            min_queries: Stored queries an operation needs before any word counts as common
+        """
+        self.embedder = embedder or HashingEmbedder()
+        self.thresholds = dict(SEMANTIC_CACHE_THRESHOLDS if thresholds is None else thresholds)
+        self.ttls = dict(LLM_CACHE_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self.half_life = half_life
+        self.common_share = common_share
+        self.min_queries = min_queries
+        self.stats = {"hits": 0, "misses": 0, "rejected": 0, "stores": 0, "evictions": 0, "expired": 0}
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.Lock()
+
+    def enabled_for(self, namespace: str) -> bool:
+        """Whether an operation has a similarity threshold and a positive TTL."""
+        return namespace in self.thresholds and self.ttls.get(namespace, 0) > 0
+
+    def _differs_in_entity(self, space: _Namespace, words: FrozenSet[str], names: FrozenSet[str],
+                           entry: Dict[str, Any]) -> bool:
+        """Whether a word only one of two queries has looks like an entity (see the class docstring)."""
+        stored = len(space.entries)
+        for word in words ^ entry["words"]:
+            if stored >= self.min_queries:
+                if space.word_counts[word] < self.common_share * stored:
+                    return True
+            elif word in (names if word in words else entry["names"]):
+                return True
+        return False
+
+    def _match(self, namespace: str, space: _Namespace, vector: np.ndarray,
+               words: FrozenSet[str], names: FrozenSet[str]) -> int:
+        """Return the index of the most similar stored query that matches this one (-1 if none)."""
+        if not space.entries:
+            return -1
+        similarities = space.vectors @ vector
+        candidates = np.flatnonzero(similarities >= self.thresholds[namespace])
+        for index in candidates[np.argsort(-similarities[candidates], kind="stable")]:
+            if not self._differs_in_entity(space, words, names, space.entries[index]):
+                return int(index)
+            self.stats["rejected"] += 1
+        return -1
+
+    def get(self, namespace: str, query: str) -> Optional[str]:
+        """Return the response stored for a query similar enough to this one, or None."""
+        if not self.enabled_for(namespace):
+            return None
+        vector = self.embedder.embed(query)
+        words = frozenset(_content_words(query))
+        names = _name_words(query)
+        now = time.time()
+        with self._lock:
+            space = self._namespaces.get(namespace)
+            index = self._match(namespace, space, vector, words, names) if space is not None else -1
+            if index >= 0:
+                entry = space.entries[index]
+                if now - entry["created"] < self.ttls[namespace]:
+                    entry["hits"] += 1
+                    self.stats["hits"] += 1
+                    return entry["value"]
+                space.remove(index)
+                self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, namespace: str, query: str, value: str) -> None:
+        """Store a response for a query, replacing the entry of a matching stored query."""
+        if not self.enabled_for(namespace):
+            return
+        vector = self.embedder.embed(query)
+        if not vector.any():
+            return
+        words = frozenset(_content_words(query))
+        names = _name_words(query)
+        now = time.time()
+        with self._lock:
+            space = self._namespaces.setdefault(namespace, _Namespace(self.embedder.dimensions))
+            index = self._match(namespace, space, vector, words, names)
+            if index >= 0:
+                space.entries[index].update(value=value, created=now, names=names)
+                space.replace_words(index, words)
+                return
+
+            self._evict(namespace, space, now)
+            space.add(vector, {"query": query, "words": words, "names": names, "value": value, "created": now,
+                               "hits": 0})
+            self.stats["stores"] += 1
+
+    def _evict(self, namespace: str, space: _Namespace, now: float) -> None:
+        """Drop expired entries, then make room by evicting the least useful one."""
+        ttl = self.ttls[namespace]
+        for index in range(len(space.entries) - 1, -1, -1):
+            if now - space.entries[index]["created"] >= ttl:
+                space.remove(index)
+                self.stats["expired"] += 1
+
+        while space.entries and len(space.entries) >= self.max_entries:
+            utility = [
+                (1 + entry["hits"]) * 0.5 ** ((now - entry["created"]) / self.half_life)
+                for entry in space.entries
+            ]
+            space.remove(int(np.argmin(utility)))
+            self.stats["evictions"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the counters plus the entries held per operation."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = {namespace: len(space.entries) for namespace, space in self._namespaces.items()}
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._namespaces.clear()
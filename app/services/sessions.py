@@ -0,0 +1,278 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.config import MOCK_SESSION_DIR, MOCK_SESSION_MEMORY_LIMIT, MOCK_SESSION_SWEEP_INTERVAL, MOCK_SESSION_TTL
+from app.utils.text_utils import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+
+class InterviewSession:
+    """A mock interview's server-side state: a rolling summary plus the recent messages."""
+
+    def __init__(self, session_id: str, topic: str = "", summary: str = "",
+                 messages: Optional[List[Dict[str, str]]] = None,
+                 turns: int = 0, updated_at: Optional[float] = None):
+        """Initialize a session.
+
+        Args:
+            session_id: The session's id
+            topic: The request that started the interview
+            summary: Summary of the turns that were folded out of `messages`
+            messages: Recent chat messages ({"role": ..., "content": ...})
+            turns: Number of candidate turns so far
+            updated_at: Last activity (epoch seconds)
+        """
+        self.session_id = session_id
+        self.topic = topic
+        self.summary = summary
+        self.messages = list(messages or [])
+        self.turns = turns
+        self.updated_at = updated_at or time.time()
+
+    def history_tokens(self) -> int:
+        """Estimated prompt tokens taken by the summary and recent messages."""
+        return estimate_tokens(self.summary) + sum(estimate_tokens(msg["content"]) for msg in self.messages)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the session for the disk spill and the API."""
+        return {
+            "session_id": self.session_id,
+            "topic": self.topic,
+            "summary": self.summary,
+            "messages": self.messages,
+            "turns": self.turns,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "InterviewSession":
+        """Rebuild a session from `to_dict` output."""
+        return cls(**data)
+
+class SessionStore:
+    """In-memory LRU of interview sessions that spills the least recent ones to disk.
+
+    Sessions evicted from memory (and every session on flush) are written as
+    one JSON file each and loaded back transparently on their next turn.
+    The `*_async` methods do that file I/O on a worker thread, so use them
+    from the event loop.
+    Sessions idle for longer than the TTL are dropped from both tiers: when
+    they are next read, or by a sweep on startup, on flush and every
+    `sweep_interval` seconds, so abandoned spill files don't pile up.
+    """
+
+    def __init__(self, directory: Optional[str] = MOCK_SESSION_DIR,
+                 max_memory_sessions: int = MOCK_SESSION_MEMORY_LIMIT,
+                 ttl: float = MOCK_SESSION_TTL,
+                 sweep_interval: float = MOCK_SESSION_SWEEP_INTERVAL):
+        """Initialize the store.
+
+        Args:
+            directory: Folder for spilled sessions (None keeps sessions in memory only)
+            max_memory_sessions: Number of sessions kept in memory
+            ttl: Seconds of inactivity after which a session expires
+            sweep_interval: Seconds between background sweeps of expired sessions (0 sweeps only on startup and flush)
+        """
+        self.directory = directory
+        self.max_memory_sessions = max_memory_sessions
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.stats = {"created": 0, "spilled": 0, "loaded": 0, "expired": 0, "swept": 0}
+        self._sessions: "OrderedDict[str, InterviewSession]" = OrderedDict()
+        # A lock lives as long as a turn holds it, whether or not its session is still in memory
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def _path(self, session_id: str) -> Optional[str]:
+        """Return the spill file of a session (None when spilling is disabled)."""
+        if not self.directory:
+            return None
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def create(self, topic: str = "") -> InterviewSession:
+        """Start a new session."""
+        session = InterviewSession(uuid.uuid4().hex, topic=topic)
+        with self._lock:
+            self.stats["created"] += 1
+            self._remember(session)
+            sweep_due = self.sweep_interval > 0 and time.monotonic() >= self._next_sweep
+            if sweep_due:
+                self._next_sweep = time.monotonic() + self.sweep_interval
+        if sweep_due:
+            threading.Thread(target=self.sweep, name="session-sweep", daemon=True).start()
+        return session
+
+    def get(self, session_id: str) -> Optional[InterviewSession]:
+        """Return a live session from memory or disk, or None if it is unknown or expired."""
+        if not _SESSION_ID.match(session_id):
+            return None
+
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._load(session_id)
+                if session is None:
+                    return None
+                self.stats["loaded"] += 1
+
+            if time.time() - session.updated_at > self.ttl:
+                self._drop(session_id)
+                self.stats["expired"] += 1
+                return None
+
+            self._remember(session)
+            return session
+
+    def save(self, session: InterviewSession) -> None:
+        """Record activity on a session after a turn."""
+        session.updated_at = time.time()
+        with self._lock:
+            self._remember(session)
+
+    def delete(self, session_id: str) -> bool:
+        """Remove a session from both tiers; returns whether it existed."""
+        if not _SESSION_ID.match(session_id):
+            return False
+        with self._lock:
+            existed = session_id in self._sessions
+            path = self._path(session_id)
+            existed = existed or bool(path and os.path.exists(path))
+            self._drop(session_id)
+            return existed
+
+    async def create_async(self, topic: str = "") -> InterviewSession:
+        """Start a new session; evicted sessions are spilled on a worker thread."""
+        return await asyncio.to_thread(self.create, topic)
+
+    async def get_async(self, session_id: str) -> Optional[InterviewSession]:
+        """Return a live session like `get`, reading a spilled one on a worker thread."""
+        return await asyncio.to_thread(self.get, session_id)
+
+    async def save_async(self, session: InterviewSession) -> None:
+        """Record activity on a session like `save`, spilling evicted sessions on a worker thread."""
+        await asyncio.to_thread(self.save, session)
+
+    async def delete_async(self, session_id: str) -> bool:
+        """Remove a session like `delete`, deleting its file on a worker thread."""
+        return await asyncio.to_thread(self.delete, session_id)
+
+    def lock(self, session_id: str) -> asyncio.Lock:
+        """Return the lock serializing turns of one session."""
+        with self._lock:
+            lock = self._locks.get(session_id)
+            if lock is None:
+                lock = self._locks[session_id] = asyncio.Lock()
+            return lock
+
+    def flush(self) -> None:
+        """Write every in-memory session to disk (called on shutdown), after sweeping expired ones."""
+        self.sweep()
+        with self._lock:
+            for session in self._sessions.values():
+                self._spill(session)
+
+    def sweep(self) -> int:
+        """Drop every expired session from memory and disk; returns how many were dropped.
+
+        Spilled files are judged by their modification time, which is never
+        older than the session's last activity, so no live session is removed.
+        """
+        now = time.time()
+        with self._lock:
+            expired = [session_id for session_id, session in self._sessions.items()
+                       if now - session.updated_at > self.ttl]
+            for session_id in expired:
+                self._drop(session_id)
+        swept = len(expired)
+
+        try:
+            names = os.listdir(self.directory) if self.directory else []
+        except OSError:
+            names = []
+        for name in names:
+            session_id, extension = os.path.splitext(name)
+            if extension != ".json" or not _SESSION_ID.match(session_id):
+                continue
+            path = os.path.join(self.directory, name)
+            with self._lock:
+                if session_id in self._sessions:
+                    continue
+                try:
+                    if now - os.path.getmtime(path) > self.ttl:
+                        os.remove(path)
+                        swept += 1
+                except OSError:
+                    continue
+
+        with self._lock:
+            self.stats["expired"] += swept
+            self.stats["swept"] += swept
+        return swept
+
+    def _remember(self, session: InterviewSession) -> None:
+        """Put a session at the front of the memory tier, spilling the least recent ones."""
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        while len(self._sessions) > self.max_memory_sessions:
+            _, evicted = self._sessions.popitem(last=False)
+            self._spill(evicted)
+
+    def _spill(self, session: InterviewSession) -> None:
+        """Write a session to its JSON file atomically."""
+        path = self._path(session.session_id)
+        if path is None:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(session.to_dict(), f)
+            os.replace(tmp_path, path)
+            self.stats["spilled"] += 1
+        except OSError as e:
+            logger.warning("Session spill error: %s", e)
+
+    def _load(self, session_id: str) -> Optional[InterviewSession]:
+        """Read a spilled session back from disk."""
+        path = self._path(session_id)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return InterviewSession.from_dict(json.load(f))
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning("Session load error: %s", e)
+            return None
+
+    def _drop(self, session_id: str) -> None:
+        """Forget a session in memory and on disk."""
+        self._sessions.pop(session_id, None)
+        path = self._path(session_id)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+_store: Optional[SessionStore] = None
+
+def get_session_store() -> SessionStore:
+    """Return the process-wide interview session store."""
+    global _store
+    if _store is None:
+        _store = SessionStore()
+    return _store
+
+def set_session_store(store: Optional[SessionStore]) -> None:
+    """Replace the process-wide session store (None resets it to the configured default)."""
+    global _store
+    _store = store
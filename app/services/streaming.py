@@ -0,0 +1,177 @@
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict
+
+from fastapi.responses import StreamingResponse
+from langgraph.config import get_stream_writer
+
+from app.services.llm_cache import LLMCache
+from app.services.artifacts import get_artifact_store
+from app.services.metrics import record_agent_error
+
+def make_event(event: str, **data: Any) -> Dict[str, Any]:
+    """Build a stream event stamped with the current wall-clock time."""
+    return {"event": event, "ts": time.time(), **data}
+
+def emit_progress(event: str, **data: Any) -> None:
+    """Send a progress event to the workflow stream when running inside a streamed graph run.
+
+    Outside a graph run (plain endpoint calls, tests) this does nothing.
+    """
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return
+    writer(make_event(event, **data))
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Render a stream event as a server-sent event frame."""
+    payload = {key: value for key, value in event.items() if key != "event"}
+    return f"event: {event['event']}\ndata: {json.dumps(payload)}\n\n"
+
+async def sse_stream(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Render an event stream as server-sent event frames."""
+    async for event in events:
+        yield format_sse(event)
+
+def sse_response(events: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    """Wrap an event stream in an unbuffered text/event-stream response."""
+    return StreamingResponse(
+        sse_stream(events),
+        media_type="text/event-stream",
+        # keep proxies from holding back the first bytes
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+_END_OF_STREAM = object()
+
+async def pump_events(events: AsyncIterator[Dict[str, Any]], send: Callable[[Dict[str, Any]], Awaitable[None]],
+                      max_buffered: int, send_timeout: float) -> None:
+    """Forward an event stream to a possibly slow consumer through a bounded buffer.
+    
+    The producer stops pulling from the stream (and so from the model) while the
+    buffer is full, and token events that pile up are merged into one frame so a
+    slow client receives fewer, larger messages instead of falling further behind.
+    
+    Args:
+        events: The events to forward
+        send: Coroutine function delivering one event to the consumer
+        max_buffered: Maximum number of events waiting to be sent
+        send_timeout: Seconds a single send may take before the consumer is given up on
+        
+    Raises:
+        asyncio.TimeoutError: If the consumer does not accept an event in time
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffered)
+    
+    async def produce():
+        try:
+            async for event in events:
+                await queue.put(event)
+        except Exception as e:
+            await queue.put(make_event("error", detail=str(e)))
+        finally:
+            # runs the stream's own cleanup now (e.g. releasing a session lock) rather than at GC
+            if hasattr(events, "aclose"):
+                await events.aclose()
+        await queue.put(_END_OF_STREAM)
+    
+    producer = asyncio.create_task(produce())
+    try:
+        pending = None
+        while True:
+            event = pending if pending is not None else await queue.get()
+            pending = None
+            if event is _END_OF_STREAM:
+                break
+            
+            while event["event"] == "token" and not queue.empty():
+                following = queue.get_nowait()
+                if following is _END_OF_STREAM or following["event"] != "token":
+                    pending = following
+                    break
+                event = {**event, "text": event["text"] + following["text"]}
+            
+            await asyncio.wait_for(send(event), timeout=send_timeout)
+    finally:
+        producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+
+def chunk_text(chunk: Any) -> str:
+    """Extract the text from a streamed message chunk."""
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(part if isinstance(part, str) else part.get("text", "") for part in content)
+    return str(content)
+
+async def stream_markdown(chain: Any, prepare: Callable[[], Awaitable[Dict[str, Any]]],
+                          cache: LLMCache, namespace: str, cache_key: str,
+                          fallback: Callable[[], str], query: str) -> AsyncIterator[Dict[str, Any]]:
+    """Stream a generation token by token while writing it to a markdown file.
+
+    Emits a `start` event straight away, a `token` event per chunk (the whole
+    response in one chunk on a cache hit), and a closing `done` event with the
+    file path. A partial file is flushed after every chunk so it grows with the
+    stream, then moved into the artifact store once the response is complete.
+
+    Args:
+        chain: The prompt | model chain to stream
+        prepare: Coroutine function returning the chain's inputs (e.g. after a search)
+        cache: The response cache
+        namespace: The cache namespace of the operation (also the artifact kind)
+        cache_key: The cache key of the request
+        fallback: Returns the fallback content if generation fails before any output
+        query: The user's query, recorded with the artifact and matched against cached paraphrases
+
+    Yields:
+        Stream events
+    """
+    yield make_event("start")
+
+    store = get_artifact_store()
+    partial_path, f = store.open_partial()
+    parts = []
+    try:
+        content = await cache.get_async(namespace, cache_key, query=query)
+        if content is not None:
+            f.write(content)
+            yield make_event("token", text=content, cached=True)
+        else:
+            try:
+                inputs = await prepare()
+                emit_progress("generation_started", namespace=namespace)
+                async for chunk in chain.astream(inputs):
+                    text = chunk_text(chunk)
+                    if not text:
+                        continue
+                    parts.append(text)
+                    f.write(text)
+                    f.flush()
+                    yield make_event("token", text=text)
+                content = "".join(parts)
+                cache.set(namespace, cache_key, content, query=query)
+            except Exception as e:
+                record_agent_error(namespace, e)
+                if parts:
+                    # keep what the client has already seen rather than swapping it out
+                    content = "".join(parts)
+                    yield make_event("error", detail=str(e))
+                else:
+                    content = fallback()
+                    f.write(content)
+                    yield make_event("token", text=content, fallback=True)
+    except BaseException:
+        # Abandoned mid-stream (e.g. the client went away): don't leave the partial file behind
+        f.close()
+        store.discard_partial(partial_path)
+        raise
+    f.close()
+
+    artifact = store.adopt(partial_path, content, kind=namespace, query=query)
+    yield make_event("done", file_path=artifact.path, artifact_id=artifact.id, characters=len(content))
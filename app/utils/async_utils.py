@@ -0,0 +1,27 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Coroutine, TypeVar
+
+T = TypeVar("T")
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine to completion from synchronous code.
+    
+    Uses asyncio.run when no event loop is running in this thread. When called
+    from inside a running loop (e.g. a sync helper used under uvicorn), the
+    coroutine is run on a fresh loop in a worker thread instead, because
+    asyncio.run cannot be nested.
+    
+    Args:
+        coro: The coroutine to run
+        
+    Returns:
+        The coroutine's result
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
@@ -0,0 +1,10 @@
+import re
+from typing import List
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the number of model tokens in a text (about four characters each)."""
+    return (len(text) + 3) // 4
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens."""
+    return re.findall(r"[a-z0-9]+", text.lower())
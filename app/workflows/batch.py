@@ -0,0 +1,141 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig
+
+from app.config import BATCH_CONCURRENCY, REQUEST_TIMEOUTS
+from app.services.deadlines import deadline_after, deadline_timestamp, tracked
+from app.services.llm_cache import normalize_input
+from app.services.metrics import record_agent_error
+from app.services.pool import pool_from_config
+from app.services.scheduler import llm_priority
+from app.services.streaming import make_event
+from app.workflows.graph import run_route
+
+# A batch item: the query and an optional leaf route that skips classification
+BatchItem = Tuple[str, Optional[str]]
+
+async def _run_item(workflow: Any, query: str, route: Optional[str],
+                    config: Optional[RunnableConfig]) -> Dict[str, Any]:
+    """Run one item through the workflow, or straight through its forced route.
+
+    Each item runs under its own "batch.item" deadline, counted from when it
+    starts, and its result carries the same `degraded` and `partial` markers
+    as the single-query endpoints. Identical items of concurrent batches share
+    one run through the pool's coalescer under batch-only keys, so an item
+    never joins (or is joined by) an interactive request.
+    """
+    pool = pool_from_config(config)
+    with deadline_after(REQUEST_TIMEOUTS.get("batch.item", REQUEST_TIMEOUTS["default"])):
+        if route:
+            return await pool.coalescer.run(f"batch.{route}", query, lambda: tracked(run_route(route, query, config)))
+        return await pool.coalescer.run(
+            "batch.workflow",
+            query,
+            lambda: tracked(workflow.ainvoke({"query": query, "deadline": deadline_timestamp()}, config=config))
+        )
+
+async def _as_completed(workflow: Any, items: List[BatchItem], config: Optional[RunnableConfig],
+                        concurrency: int) -> AsyncIterator[Tuple[List[int], Dict[str, Any]]]:
+    """Run the distinct items with bounded concurrency, yielding each outcome as it finishes.
+
+    Yields:
+        The positions of every item sharing the outcome, and the outcome itself
+    """
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for index, (query, route) in enumerate(items):
+        groups.setdefault((route or "", normalize_input(query)), []).append(index)
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run(indices: List[int]) -> Tuple[List[int], Dict[str, Any]]:
+        query, route = items[indices[0]]
+        async with semaphore:
+            try:
+                # Bulk work queues behind interactive calls for the model quota
+                with llm_priority("batch"):
+                    state = await _run_item(workflow, query, route, config)
+                outcome = {
+                    "status": "ok",
+                    "category": state.get("category", ""),
+                    "response": state.get("response", ""),
+                    "degraded": state["degraded"],
+                    "partial": state["partial"],
+                }
+            except Exception as e:
+                record_agent_error("batch_item", e)
+                outcome = {"status": "error", "error": str(e)}
+        return indices, outcome
+
+    tasks = [asyncio.ensure_future(run(indices)) for indices in groups.values()]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # A disconnected stream leaves the remaining items unfinished
+        for task in tasks:
+            task.cancel()
+
+def _item_result(items: List[BatchItem], index: int, outcome: Dict[str, Any]) -> Dict[str, Any]:
+    """Describe the result of one batch item."""
+    query, route = items[index]
+    return {"index": index, "query": query, "route": route, **outcome}
+
+def count_unique(items: List[BatchItem]) -> int:
+    """Number of distinct (route, normalized query) items in a batch."""
+    return len({(route or "", normalize_input(query)) for query, route in items})
+
+async def run_batch(workflow: Any, items: List[BatchItem], config: Optional[RunnableConfig] = None,
+                    concurrency: int = BATCH_CONCURRENCY) -> Dict[str, Any]:
+    """Run a batch of queries and return their results in the order they were given.
+
+    Identical items (same route and normalized query) run once and share the
+    result. A failing item is reported in its own result without failing the batch.
+
+    Args:
+        workflow: The compiled workflow graph
+        items: The queries, each with an optional forced route
+        config: Run config (carries the agent pool)
+        concurrency: Maximum number of items running at once
+
+    Returns:
+        A dictionary with the ordered `results` and success and failure counts
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    async for indices, outcome in _as_completed(workflow, items, config, concurrency):
+        for index in indices:
+            results[index] = _item_result(items, index, outcome)
+
+    failed = sum(1 for result in results if result["status"] == "error")
+    return {
+        "results": results,
+        "total": len(items),
+        "unique": count_unique(items),
+        "succeeded": len(items) - failed,
+        "failed": failed,
+    }
+
+async def stream_batch(workflow: Any, items: List[BatchItem], config: Optional[RunnableConfig] = None,
+                       concurrency: int = BATCH_CONCURRENCY) -> AsyncIterator[Dict[str, Any]]:
+    """Run a batch of queries, yielding each item's result as soon as it completes.
+
+    Args:
+        workflow: The compiled workflow graph
+        items: The queries, each with an optional forced route
+        config: Run config (carries the agent pool)
+        concurrency: Maximum number of items running at once
+
+    Yields:
+        A `start` event, one `item` event per query (in completion order) and a final `done`
+    """
+    yield make_event("start", total=len(items), unique=count_unique(items))
+
+    succeeded = failed = 0
+    async for indices, outcome in _as_completed(workflow, items, config, concurrency):
+        for index in indices:
+            if outcome["status"] == "ok":
+                succeeded += 1
+            else:
+                failed += 1
+            yield make_event("item", **_item_result(items, index, outcome))
+
+    yield make_event("done", succeeded=succeeded, failed=failed)
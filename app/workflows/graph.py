@@ -1,119 +1,141 @@
-from typing import Dict, Any
+import asyncio
+import functools
+from typing import Awaitable, Callable, Dict, Any, Optional
 # Updated imports for langgraph 0.1.0
 from langgraph.graph import StateGraph
 from langgraph.graph.graph import END, START
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig
 
+from app.config import INTENT_CONFIDENCE_THRESHOLD, SEARCH_PREFETCH_ENABLED
 from app.models.state import State
-from app.config import GOOGLE_API_KEY, GEMINI_FLASH_MODEL
-from app.agents.learning import LearningResourceAgent
-from app.agents.interview import InterviewAgent
-from app.agents.resume import ResumeMaker
-from app.agents.job import JobSearch
-
-# Initialize the LLM for categorization
-llm = ChatGoogleGenerativeAI(
-    model=GEMINI_FLASH_MODEL,
-    google_api_key=GOOGLE_API_KEY,
-    temperature=0.5
+from app.workflows.intent import INTENT_ROUTES, DEFAULT_ROUTE, parse_route, log_routed_query
+from app.services.deadlines import deadline_at, deadline_timestamp
+from app.services.metrics import WORKFLOW_NODE_DURATION
+from app.services.pool import pool_from_config
+
+# Single routing prompt that picks the final leaf node in one call
+ROUTER_PROMPT = ChatPromptTemplate.from_template(
+    "Route the following user query to exactly one of these handlers:\n"
+    "- tutorial_agent: creating tutorials, blogs, guides or documentation on generative AI\n"
+    "- ask_query_bot: general questions about generative AI topics (default if nothing else fits)\n"
+    "- handle_resume_making: creating or improving a resume\n"
+    "- mock_interview: conducting or practicing a mock interview\n"
+    "- interview_topics_questions: interview questions, topics or preparation advice\n"
+    "- job_search: finding job openings or listings\n"
+    "Give the handler name only as an output.\n\n"
+    "Examples:\n"
+    "Query: 'How to create a blog on prompt engineering for generative AI?' -> tutorial_agent\n"
+    "Query: 'Provide me the documentation for Langchain?' -> tutorial_agent\n"
+    "Query: 'What are the basics of generative AI, and how can I start learning it?' -> ask_query_bot\n"
+    "Query: 'Is there any generative AI course available?' -> ask_query_bot\n"
+    "Query: 'Can you help me improve my resume for a tech position?' -> handle_resume_making\n"
+    "Query: 'Can you conduct a mock interview with me for a Gen AI role?' -> mock_interview\n"
+    "Query: 'I need to practice interview focused on Gen AI.' -> mock_interview\n"
+    "Query: 'What are some common questions asked in AI interviews?' -> interview_topics_questions\n"
+    "Query: 'Can you list important coding topics for AI tech interviews?' -> interview_topics_questions\n"
+    "Query: 'Are there any job openings for AI engineers?' -> job_search\n\n"
+    "Now, route the following user query:\n"
+    "Query: {query}"
 )
 
-def categorize(state: State) -> Dict[str, Any]:
-    """Categorizes the user query into one of four main categories."""
-    prompt = ChatPromptTemplate.from_template(
-        "Categorize the following customer query into one of these categories:\n"
-        "1: Learn Generative AI Technology\n"
-        "2: Resume Making\n"
-        "3: Interview Preparation\n"
-        "4: Job Search\n"
-        "Give the number only as an output.\n\n"
-        "Examples:\n"
-        "1. Query: 'What are the basics of generative AI, and how can I start learning it?' -> 1\n"
-        "2. Query: 'Can you help me improve my resume for a tech position?' -> 2\n"
-        "3. Query: 'What are some common questions asked in AI interviews?' -> 3\n"
-        "4. Query: 'Are there any job openings for AI engineers?' -> 4\n\n"
-        "Now, categorize the following customer query:\n"
-        "Query: {query}"
-    )
-
-    chain = prompt | llm
-    category = chain.invoke({"query": state["query"]}).content
-    return {"category": category}
-
-def handle_learning_resource(state: State) -> Dict[str, Any]:
-    """Determines if the query is related to Tutorial creation or general Questions."""
-    prompt = ChatPromptTemplate.from_template(
-        "Categorize the following user query into one of these categories:\n\n"
-        "Categories:\n"
-        "- Tutorial: For queries related to creating tutorials, blogs, or documentation on generative AI.\n"
-        "- Question: For general queries asking about generative AI topics.\n"
-        "- Default to Question if the query doesn't fit either of these categories.\n\n"
-        "Examples:\n"
-        "1. User query: 'How to create a blog on prompt engineering for generative AI?' -> Category: Tutorial\n"
-        "2. User query: 'Can you provide a step-by-step guide on fine-tuning a generative model?' -> Category: Tutorial\n"
-        "3. User query: 'Provide me the documentation for Langchain?' -> Category: Tutorial\n"
-        "4. User query: 'What are the main applications of generative AI?' -> Category: Question\n"
-        "5. User query: 'Is there any generative AI course available?' -> Category: Question\n\n"
-        "Now, categorize the following user query:\n"
-        "The user query is: {query}\n"
-    )
-
-    chain = prompt | llm
-    response = chain.invoke({"query": state["query"]}).content
-    return {"category": response}
-
-def handle_interview_preparation(state: State) -> Dict[str, Any]:
-    """Determines if the query is related to Mock Interviews or general Interview Questions."""
-    prompt = ChatPromptTemplate.from_template(
-        "Categorize the following user query into one of these categories:\n\n"
-        "Categories:\n"
-        "- Mock: For requests related to mock interviews.\n"
-        "- Question: For general queries asking about interview topics or preparation.\n"
-        "- Default to Question if the query doesn't fit either of these categories.\n\n"
-        "Examples:\n"
-        "1. User query: 'Can you conduct a mock interview with me for a Gen AI role?' -> Category: Mock\n"
-        "2. User query: 'What topics should I prepare for an AI Engineer interview?' -> Category: Question\n"
-        "3. User query: 'I need to practice interview focused on Gen AI.' -> Category: Mock\n"
-        "4. User query: 'Can you list important coding topics for AI tech interviews?' -> Category: Question\n\n"
-        "Now, categorize the following user query:\n"
-        "The user query is: {query}\n"
-    )
-
-    chain = prompt | llm
-    response = chain.invoke({"query": state["query"]}).content
-    return {"category": response}
-
-def route_query(state: State):
-    """Route the query based on its category to the appropriate handler."""
-    if '1' in state["category"]:
-        return "handle_learning_resource"
-    elif '2' in state["category"]:
-        return "handle_resume_making"
-    elif '3' in state["category"]:
-        return "handle_interview_preparation"
-    elif '4' in state["category"]:
-        return "job_search"
-    else:
-        return None
+# Web search each leaf runs first; these must match the agents' queries so the
+# agent joins a speculative prefetch through the shared search cache
+PREFETCH_SEARCHES = {
+    "tutorial_agent": "tutorial {query}",
+    "ask_query_bot": "{query}",
+    "handle_resume_making": "resume examples for {query}",
+    "interview_topics_questions": "interview questions {query}",
+    "job_search": "job listings {query}",
+}
+
+# Constrain the model's answer to the leaf node names
+ROUTER_GENERATION_CONFIG = {
+    "response_mime_type": "text/x.enum",
+    "response_schema": {"type_": "STRING", "enum": INTENT_ROUTES},
+}
+
+async def classify_intent(state: State, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+    """Predicts the leaf route locally, leaving `route` empty when the classifier is not confident."""
+    route, confidence = pool_from_config(config).intent_classifier.predict(state["query"])
+    if confidence < INTENT_CONFIDENCE_THRESHOLD:
+        return {"route": "", "confidence": confidence, "predicted_route": route}
+    return {"category": route, "route": route, "confidence": confidence}
+
+async def categorize(state: State, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+    """Routes the user query to a leaf node with a single, enum-constrained LLM call.
+    
+    While the model decides, the search for the local classifier's best guess
+    is started speculatively. A right guess leaves it running for the chosen
+    agent to pick up from the search cache; a wrong one cancels it.
+    """
+    pool = pool_from_config(config)
+    prefetch = start_prefetch(pool.search_tool, state.get("predicted_route", ""), state["query"])
+    
+    model = pool.router_model.bind(generation_config=ROUTER_GENERATION_CONFIG)
+    chain = ROUTER_PROMPT | model
+    try:
+        route = parse_route((await chain.ainvoke({"query": state["query"]})).content)
+    except BaseException:
+        if prefetch is not None:
+            prefetch.cancel()
+        raise
+    
+    if prefetch is not None and route != state.get("predicted_route"):
+        prefetch.cancel()
+    
+    # Feed the decision back to the local classifier's training log, off the event loop
+    await asyncio.to_thread(log_routed_query, state["query"], route)
+    return {"category": route, "route": route}
 
-def route_interview(state: State) -> str:
-    """Route the query to the appropriate interview-related handler."""
-    if 'Question'.lower() in state["category"].lower():
-        return "interview_topics_questions"
-    elif 'Mock'.lower() in state["category"].lower():
-        return "mock_interview"
-    else:
-        return "mock_interview"  # Default to mock interview
-
-def route_learning(state: State):
-    """Route the query based on the learning path category."""
-    if 'Question'.lower() in state["category"].lower():
-        return "ask_query_bot"
-    elif 'Tutorial'.lower() in state["category"].lower():
-        return "tutorial_agent"
-    else:
+def start_prefetch(search_tool: Any, route: str, query: str) -> Optional[asyncio.Task]:
+    """Start the search a leaf route would run, so it overlaps with categorization.
+    
+    The search goes through the tool's prefetch, so a wrong guess cancelled
+    later stops the upstream call and never marks or reports on the request.
+    
+    Args:
+        search_tool: The shared search tool the agents use
+        route: The guessed leaf route
+        query: The user's query
+        
+    Returns:
+        The running search task, or None when the route does no search or the tool can't prefetch
+    """
+    template = PREFETCH_SEARCHES.get(route)
+    prefetch = getattr(search_tool, "prefetch", None)
+    if not SEARCH_PREFETCH_ENABLED or template is None or prefetch is None:
         return None
+    
+    task = asyncio.ensure_future(prefetch(template.format(query=query)))
+    # a failed prefetch is retried by the agent itself, so just retrieve the error here
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
+    return task
+
+def route_intent(state: State) -> str:
+    """Route straight to the predicted leaf node, or fall through to the LLM categorizer."""
+    return state.get("route") or "categorize"
+
+def route_category(state: State) -> str:
+    """Route the query to the leaf node chosen by the LLM categorizer."""
+    route = state.get("route")
+    return route if route in INTENT_ROUTES else DEFAULT_ROUTE
+
+def with_deadline(node: Callable[..., Awaitable[Dict[str, Any]]]) -> Callable[..., Awaitable[Dict[str, Any]]]:
+    """Run a node under the deadline carried in the state, so its search and model calls honour it."""
+    @functools.wraps(node)
+    async def run(state: State, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+        with deadline_at(state.get("deadline")):
+            return await node(state, config)
+    return run
+
+def timed(name: str, node: Callable[..., Awaitable[Dict[str, Any]]]) -> Callable[..., Awaitable[Dict[str, Any]]]:
+    """Record how long each run of a node takes in the workflow node duration histogram."""
+    @functools.wraps(node)
+    async def run(state: State, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+        with WORKFLOW_NODE_DURATION.time(node=name):
+            return await node(state, config)
+    return run
 
 def create_workflow():
     """Create and return the workflow graph."""
@@ -121,120 +143,112 @@ def create_workflow():
     workflow = StateGraph(State)
 
     # Add nodes for each state in the workflow
-    workflow.add_node("categorize", categorize)
-    workflow.add_node("handle_learning_resource", handle_learning_resource)
-    workflow.add_node("handle_interview_preparation", handle_interview_preparation)
-    workflow.add_node("handle_resume_making", handle_resume_making)  # Add this node
-    workflow.add_node("job_search", job_search)  # Add this node
-    workflow.add_node("mock_interview", mock_interview)  # Add this node
-    workflow.add_node("interview_topics_questions", interview_topics_questions)  # Add this node
-    workflow.add_node("tutorial_agent", tutorial_agent)  # Add this node
-    workflow.add_node("ask_query_bot", ask_query_bot)  # Add this node
-
-    # Define the starting edge to the categorization node
-    workflow.add_edge(START, "categorize")
-
-    # Add conditional edges based on category routing function
+    workflow.add_node("classify_intent", timed("classify_intent", classify_intent))
+    workflow.add_node("categorize", timed("categorize", with_deadline(categorize)))
+    workflow.add_node("handle_resume_making", timed("handle_resume_making", with_deadline(handle_resume_making)))
+    workflow.add_node("job_search", timed("job_search", with_deadline(job_search)))
+    workflow.add_node("mock_interview", timed("mock_interview", with_deadline(mock_interview)))
+    workflow.add_node("interview_topics_questions", timed("interview_topics_questions", with_deadline(interview_topics_questions)))
+    workflow.add_node("tutorial_agent", timed("tutorial_agent", with_deadline(tutorial_agent)))
+    workflow.add_node("ask_query_bot", timed("ask_query_bot", with_deadline(ask_query_bot)))
+
+    # Define the starting edge to the local intent classifier
+    workflow.add_edge(START, "classify_intent")
+
+    # Confident local predictions skip the LLM categorizer entirely
     workflow.add_conditional_edges(
-        "categorize",
-        route_query,
-        {
-            "handle_learning_resource": "handle_learning_resource",
-            "handle_resume_making": "handle_resume_making",
-            "handle_interview_preparation": "handle_interview_preparation",
-            "job_search": "job_search"
-        }
+        "classify_intent",
+        route_intent,
+        {"categorize": "categorize", **{route: route for route in INTENT_ROUTES}}
     )
 
-    # Add conditional edges for further routing in interview preparation
+    # The LLM categorizer picks the leaf node directly
     workflow.add_conditional_edges(
-        "handle_interview_preparation",
-        route_interview,
-        {
-            "mock_interview": "mock_interview",
-            "interview_topics_questions": "interview_topics_questions",
-        }
-    )
-
-    # Add conditional edges for further routing in learning resources
-    workflow.add_conditional_edges(
-        "handle_learning_resource",
-        route_learning,
-        {
-            "tutorial_agent": "tutorial_agent",
-            "ask_query_bot": "ask_query_bot",
-        }
+        "categorize",
+        route_category,
+        {route: route for route in INTENT_ROUTES}
     )
 
     # Define edges that lead to the end of the workflow
-    workflow.add_edge("handle_resume_making", END)
-    workflow.add_edge("job_search", END)
-    workflow.add_edge("interview_topics_questions", END)
-    workflow.add_edge("mock_interview", END)
-    workflow.add_edge("ask_query_bot", END)
-    workflow.add_edge("tutorial_agent", END)
-
-    # Set the initial entry point to start the workflow at the categorize node
-    workflow.set_entry_point("categorize")
+    for route in INTENT_ROUTES:
+        workflow.add_edge(route, END)
 
     # Compile the workflow graph into an application
     return workflow.compile()
 
-def handle_resume_making(state: State) -> Dict[str, Any]:
+_workflow = None
+
+def get_workflow():
+    """Return the process-wide compiled workflow graph."""
+    global _workflow
+    if _workflow is None:
+        _workflow = create_workflow()
+    return _workflow
+
+async def handle_resume_making(state: State, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """Generate a customized resume based on user details for a tech role in AI and Generative AI."""
-    from app.agents.resume import ResumeMaker
-    
-    agent = ResumeMaker()
-    result = agent.create_resume(state["query"])
+    agent = pool_from_config(config).resume
+    result = await agent.create_resume_async(state["query"])
     
     return {"response": result["file_path"]}
 
-def job_search(state: State) -> Dict[str, Any]:
+async def job_search(state: State, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """Search for jobs based on user criteria."""
-    from app.agents.job import JobSearch
-    
-    agent = JobSearch()
-    result = agent.find_jobs(state["query"])
+    agent = pool_from_config(config).job
+    result = await agent.find_jobs_async(state["query"])
     
     return {"response": result["file_path"]}
 
-def mock_interview(state: State) -> Dict[str, Any]:
+async def mock_interview(state: State, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """Conduct a mock interview session."""
-    from app.agents.interview import InterviewAgent
-    
-    agent = InterviewAgent()
-    result = agent.conduct_mock_interview(state["query"])
+    agent = pool_from_config(config).interview
+    result = await agent.conduct_mock_interview_async(state["query"])
     
     return {"response": result["content"]}
 
-def interview_topics_questions(state: State) -> Dict[str, Any]:
+async def interview_topics_questions(state: State, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """Generate interview questions and topics."""
-    from app.agents.interview import InterviewAgent
-    
-    agent = InterviewAgent()
-    result = agent.generate_interview_questions(state["query"])
+    agent = pool_from_config(config).interview
+    result = await agent.generate_interview_questions_async(state["query"])
     
     return {"response": result["file_path"]}
 
-def tutorial_agent(state: State) -> Dict[str, Any]:
+async def tutorial_agent(state: State, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """Create a tutorial on a generative AI topic."""
-    from app.agents.learning import LearningResourceAgent
-    
-    agent = LearningResourceAgent()
-    result = agent.create_tutorial(state["query"])
+    agent = pool_from_config(config).learning
+    result = await agent.create_tutorial_async(state["query"])
     
     return {"response": result["file_path"]}
 
-def ask_query_bot(state: State) -> Dict[str, Any]:
+async def ask_query_bot(state: State, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """Answer a query about generative AI."""
-    from app.agents.learning import LearningResourceAgent
-    
-    agent = LearningResourceAgent()
-    result = agent.answer_query(state["query"])
+    agent = pool_from_config(config).learning
+    result = await agent.answer_query_async(state["query"])
     
     return {"response": result["file_path"]}
 
 
+# Leaf node functions, for callers that already know the route
+LEAF_NODES = {
+    "tutorial_agent": tutorial_agent,
+    "ask_query_bot": ask_query_bot,
+    "handle_resume_making": handle_resume_making,
+    "mock_interview": mock_interview,
+    "interview_topics_questions": interview_topics_questions,
+    "job_search": job_search,
+}
 
-
-
+async def run_route(route: str, query: str, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+    """Run one leaf node directly, skipping intent classification.
+    
+    Args:
+        route: The leaf node to run (one of INTENT_ROUTES)
+        query: The user's query
+        config: Run config (carries the agent pool)
+        
+    Returns:
+        The final state, shaped like the workflow's own output
+    """
+    state = {"query": query, "category": route, "route": route, "deadline": deadline_timestamp()}
+    state.update(await with_deadline(LEAF_NODES[route])(state, config))
+    return state
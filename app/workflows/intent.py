@@ -0,0 +1,267 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+# Leaf nodes of the workflow graph that the classifier can route to directly
+INTENT_ROUTES = [
+    "tutorial_agent",
+    "ask_query_bot",
+    "handle_resume_making",
+    "mock_interview",
+    "interview_topics_questions",
+    "job_search",
+]
+
+# Route used when the LLM router's answer cannot be matched to a leaf node
+DEFAULT_ROUTE = "ask_query_bot"
+
+# Few-shot examples from the categorization prompts plus queries seen in production
+SEED_EXAMPLES: List[Tuple[str, str]] = [
+    ("How to create a blog on prompt engineering for generative AI?", "tutorial_agent"),
+    ("Can you provide a step-by-step guide on fine-tuning a generative model?", "tutorial_agent"),
+    ("Provide me the documentation for Langchain?", "tutorial_agent"),
+    ("teach me langchain", "tutorial_agent"),
+    ("Write a tutorial on retrieval augmented generation", "tutorial_agent"),
+    ("Create a beginner's guide to diffusion models", "tutorial_agent"),
+    ("Make a tutorial about vector databases with code examples", "tutorial_agent"),
+    ("Teach me how to build a chatbot with LangChain", "tutorial_agent"),
+    ("Walk me through fine-tuning Llama step by step", "tutorial_agent"),
+    ("Write documentation on using embeddings in Python", "tutorial_agent"),
+    ("What are the main applications of generative AI?", "ask_query_bot"),
+    ("Is there any generative AI course available?", "ask_query_bot"),
+    ("What are the basics of generative AI, and how can I start learning it?", "ask_query_bot"),
+    ("What is the difference between GPT and BERT?", "ask_query_bot"),
+    ("What is RAG?", "ask_query_bot"),
+    ("How does a transformer model work?", "ask_query_bot"),
+    ("Which is better, LoRA or full fine-tuning?", "ask_query_bot"),
+    ("Why do large language models hallucinate?", "ask_query_bot"),
+    ("What is prompt engineering?", "ask_query_bot"),
+    ("What is generative AI?", "ask_query_bot"),
+    ("Can you help me improve my resume for a tech position?", "handle_resume_making"),
+    ("create a resume for a 3rd year computer science student", "handle_resume_making"),
+    ("Write a resume for an AI engineer with 3 years of experience", "handle_resume_making"),
+    ("Help me create a resume for an AI engineer position", "handle_resume_making"),
+    ("Improve my CV for a data scientist role", "handle_resume_making"),
+    ("Make my resume ATS friendly", "handle_resume_making"),
+    ("Build a resume highlighting my machine learning projects", "handle_resume_making"),
+    ("Review my resume summary section", "handle_resume_making"),
+    ("Draft a CV for a fresher in generative AI", "handle_resume_making"),
+    ("Can you conduct a mock interview with me for a Gen AI role?", "mock_interview"),
+    ("I need to practice interview focused on Gen AI.", "mock_interview"),
+    ("Can you conduct a mock interview for a Generative AI role?", "mock_interview"),
+    ("Let's do a mock interview for a data scientist position", "mock_interview"),
+    ("Interview me for a machine learning engineer job", "mock_interview"),
+    ("Start a practice interview with me", "mock_interview"),
+    ("Act as an interviewer and ask me questions one at a time", "mock_interview"),
+    ("Simulate a technical interview for an AI role", "mock_interview"),
+    ("I'm ready for the mock interview", "mock_interview"),
+    ("What are some common questions asked in AI interviews?", "interview_topics_questions"),
+    ("What topics should I prepare for an AI Engineer interview?", "interview_topics_questions"),
+    ("Can you list important coding topics for AI tech interviews?", "interview_topics_questions"),
+    ("interview questions of the infosys data analyst role", "interview_topics_questions"),
+    ("lets discuss some interview questions for machine learning", "interview_topics_questions"),
+    ("What questions should I prepare for a machine learning interview?", "interview_topics_questions"),
+    ("Give me interview questions for a data analyst", "interview_topics_questions"),
+    ("Top 20 LLM interview questions with answers", "interview_topics_questions"),
+    ("System design questions asked in ML engineer interviews", "interview_topics_questions"),
+    ("How to prepare for a generative AI interview?", "interview_topics_questions"),
+    ("Are there any job openings for AI engineers?", "job_search"),
+    ("AI Software Engineer jobs in noida", "job_search"),
+    ("data analyst jobs in delhi", "job_search"),
+    ("search job in swe in noida", "job_search"),
+    ("Find AI engineer jobs in San Francisco", "job_search"),
+    ("Find remote machine learning jobs", "job_search"),
+    ("Job listings for data scientists in Bangalore", "job_search"),
+    ("Internship openings in generative AI", "job_search"),
+    ("Who is hiring LLM engineers right now?", "job_search"),
+    ("Which companies are hiring prompt engineers?", "job_search"),
+    ("Entry level AI jobs in London", "job_search"),
+]
+
+class IntentClassifier:
+    """Local intent classifier that predicts the graph's leaf route without an LLM call.
+
+    A multinomial logistic regression over hashed word unigrams and bigrams,
+    trained in-process with plain SGD. Prediction touches only the handful of
+    features present in the query, so it runs in microseconds.
+    """
+
+    def __init__(self, routes: Optional[List[str]] = None, n_features: int = 2 ** 18):
+        """Initialize an untrained classifier.
+
+        Args:
+            routes: The labels to predict (defaults to the graph's leaf nodes)
+            n_features: Size of the hashed feature space
+        """
+        self.routes = list(routes or INTENT_ROUTES)
+        self.n_features = n_features
+        self.weights: Dict[str, Dict[int, float]] = {route: {} for route in self.routes}
+        self.bias: Dict[str, float] = {route: 0.0 for route in self.routes}
+
+    def _features(self, text: str) -> Dict[int, float]:
+        """Hash the query's word n-grams into an L2-normalised sparse vector."""
+        tokens = re.findall(r"[a-z0-9]+", text.lower())
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+        features: Dict[int, float] = {}
+        for gram in grams:
+            # crc32 rather than hash() so features are stable across processes
+            index = zlib.crc32(gram.encode("utf-8")) % self.n_features
+            features[index] = features.get(index, 0.0) + 1.0
+
+        norm = math.sqrt(sum(value * value for value in features.values())) or 1.0
+        return {index: value / norm for index, value in features.items()}
+
+    def _probabilities(self, features: Dict[int, float]) -> Dict[str, float]:
+        """Return the softmax probability of every route for a feature vector."""
+        scores = {}
+        for route in self.routes:
+            weights = self.weights[route]
+            scores[route] = self.bias[route] + sum(
+                weights.get(index, 0.0) * value for index, value in features.items()
+            )
+
+        top = max(scores.values())
+        exps = {route: math.exp(score - top) for route, score in scores.items()}
+        total = sum(exps.values())
+        return {route: value / total for route, value in exps.items()}
+
+    def fit(self, examples: Iterable[Tuple[str, str]], epochs: int = 40,
+            learning_rate: float = 0.5, l2: float = 1e-4) -> "IntentClassifier":
+        """Train the classifier on (query, route) pairs.
+
+        Args:
+            examples: Labelled queries; unknown routes are ignored
+            epochs: Number of passes over the examples
+            learning_rate: SGD step size
+            l2: L2 regularisation strength
+
+        Returns:
+            The trained classifier
+        """
+        data = [(self._features(query), route) for query, route in examples if route in self.weights]
+
+        for _ in range(epochs):
+            for features, label in data:
+                probabilities = self._probabilities(features)
+                for route in self.routes:
+                    gradient = probabilities[route] - (1.0 if route == label else 0.0)
+                    weights = self.weights[route]
+                    for index, value in features.items():
+                        weight = weights.get(index, 0.0)
+                        weights[index] = weight - learning_rate * (gradient * value + l2 * weight)
+                    self.bias[route] -= learning_rate * gradient
+
+        return self
+
+    def predict(self, query: str) -> Tuple[str, float]:
+        """Predict the leaf route for a query.
+
+        Args:
+            query: The user's query
+
+        Returns:
+            A tuple of the most likely route and its probability
+        """
+        probabilities = self._probabilities(self._features(query))
+        route = max(probabilities, key=probabilities.get)
+        return route, probabilities[route]
+
+def parse_route(text: str) -> str:
+    """Map the LLM router's answer onto a leaf route, falling back to DEFAULT_ROUTE.
+
+    Args:
+        text: The raw model output
+
+    Returns:
+        One of INTENT_ROUTES
+    """
+    answer = text.strip().strip("`'\".").lower()
+    return answer if answer in INTENT_ROUTES else DEFAULT_ROUTE
+
+_log_lock = threading.Lock()
+
+def log_routed_query(query: str, route: str, path: Optional[str] = None, max_bytes: Optional[int] = None) -> None:
+    """Append an LLM-routed query to the training log so the classifier can learn it.
+
+    This blocks on the disk, so call it off the event loop. A log that would
+    grow past `max_bytes` is first rotated to "<path>.1", replacing the
+    previous rotation, so at most two logs' worth of queries are kept.
+
+    Args:
+        query: The user's query
+        route: The leaf route chosen for it
+        path: JSONL log file (defaults to INTENT_LOG_FILE; an empty value disables logging)
+        max_bytes: Size at which the log is rotated (defaults to INTENT_LOG_MAX_BYTES; 0 never rotates)
+    """
+    path = path if path is not None else config.INTENT_LOG_FILE
+    if not path:
+        return
+    max_bytes = max_bytes if max_bytes is not None else config.INTENT_LOG_MAX_BYTES
+    line = (json.dumps({"query": query, "route": route}) + "\n").encode("utf-8")
+
+    try:
+        with _log_lock:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            if max_bytes > 0 and os.path.exists(path) and os.path.getsize(path) + len(line) > max_bytes:
+                os.replace(path, f"{path}.1")
+            with open(path, "ab") as f:
+                f.write(line)
+    except OSError as e:
+        logger.warning("Intent log error: %s", e)
+
+def load_logged_queries(path: Optional[str] = None, max_examples: Optional[int] = None) -> List[Tuple[str, str]]:
+    """Load (query, route) pairs previously recorded by the LLM router, oldest first.
+
+    Queries that differ only in case and punctuation (the same features to the
+    classifier) are kept once, with their latest route, and only the newest
+    `max_examples` are returned, so training time at startup stays bounded.
+
+    Args:
+        path: JSONL file with one {"query": ..., "route": ...} object per line
+            (defaults to INTENT_LOG_FILE; its rotated "<path>.1" is read first)
+        max_examples: Number of distinct queries returned (defaults to INTENT_LOG_MAX_EXAMPLES; 0 for no limit)
+
+    Returns:
+        The labelled queries, or an empty list if the log does not exist
+    """
+    path = path if path is not None else config.INTENT_LOG_FILE
+    if not path:
+        return []
+    max_examples = max_examples if max_examples is not None else config.INTENT_LOG_MAX_EXAMPLES
+
+    examples: Dict[str, Tuple[str, str]] = {}
+    for log_path in (f"{path}.1", path):
+        if not os.path.exists(log_path):
+            continue
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    query, route = record["query"], record["route"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+                key = " ".join(re.findall(r"[a-z0-9]+", str(query).lower()))
+                # re-insert so the dict stays ordered by each query's latest appearance
+                examples.pop(key, None)
+                examples[key] = (query, route)
+    pairs = list(examples.values())
+    return pairs[-max_examples:] if max_examples > 0 else pairs
+
+_classifier: Optional[IntentClassifier] = None
+
+def get_intent_classifier() -> IntentClassifier:
+    """Return the process-wide classifier, training it on first use."""
+    global _classifier
+    if _classifier is None:
+        _classifier = IntentClassifier().fit(SEED_EXAMPLES + load_logged_queries())
+    return _classifier
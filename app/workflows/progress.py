@@ -0,0 +1,69 @@
+from typing import Any, AsyncIterator, Dict, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+from app.services.metrics import record_agent_error
+from app.services.streaming import chunk_text, make_event
+from app.workflows.intent import INTENT_ROUTES
+
+# Leaf nodes whose response is the path of the markdown file they saved
+FILE_ROUTES = [route for route in INTENT_ROUTES if route != "mock_interview"]
+
+async def stream_workflow(workflow: Any, inputs: Dict[str, Any],
+                          config: Optional[RunnableConfig] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Run the compiled workflow and translate its stream into progress events.
+
+    Combines the graph's `updates` (routing decisions and saved files),
+    `messages` (token deltas from the leaf agents' model calls) and `custom`
+    (search and generation progress sent through emit_progress) stream modes.
+    Every event carries a `ts` timestamp.
+
+    Args:
+        workflow: The compiled workflow graph
+        inputs: The graph's input state
+        config: Run config (carries the agent pool)
+
+    Yields:
+        Progress events, ending with `done` (or `error`)
+    """
+    yield make_event("start", query=inputs["query"])
+
+    state = dict(inputs)
+    try:
+        async for mode, chunk in workflow.astream(
+            inputs,
+            config=config,
+            stream_mode=["updates", "messages", "custom"]
+        ):
+            if mode == "custom":
+                yield chunk
+
+            elif mode == "messages":
+                message, metadata = chunk
+                node = metadata.get("langgraph_node")
+                text = chunk_text(message)
+                # The router's own output is reported as a routing decision instead
+                if node in INTENT_ROUTES and text:
+                    yield make_event("token", node=node, text=text)
+
+            elif mode == "updates":
+                for node, update in chunk.items():
+                    update = update or {}
+                    state.update(update)
+                    if node == "classify_intent":
+                        if update.get("route"):
+                            yield make_event("routed", route=update["route"], by="classifier",
+                                             confidence=update.get("confidence"))
+                        else:
+                            yield make_event("categorizing", predicted_route=update.get("predicted_route"),
+                                             confidence=update.get("confidence"))
+                    elif node == "categorize":
+                        yield make_event("routed", route=update.get("route"), by="llm")
+                    elif node in FILE_ROUTES:
+                        yield make_event("saved", node=node, file_path=update.get("response"))
+    except Exception as e:
+        record_agent_error("workflow", e)
+        yield make_event("error", detail=str(e))
+        return
+
+    yield make_event("done", category=state.get("category", ""), response=state.get("response", ""))
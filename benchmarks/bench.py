@@ -0,0 +1,338 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from unittest.mock import patch
+
+import httpx
+
+from app.main import app
+from app.services.artifacts import ArtifactStore, set_artifact_store
+from app.services.breaker import reset_breakers
+from app.services.llm_cache import LLMCache, set_llm_cache
+from app.services.pool import close_pool
+from app.services.scheduler import LLMScheduler, set_scheduler
+from app.services.semantic_cache import SemanticCache
+from app.services.sessions import SessionStore, set_session_store
+from benchmarks.fakes import FakeSearch, Latency, ModelProfile, fake_backends
+
+RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Topics the request queries are built from
+TOPICS = [
+    "LangChain", "retrieval augmented generation", "prompt engineering", "vector databases",
+    "fine-tuning LLMs", "LangGraph agents", "diffusion models", "LLM evaluation",
+]
+
+class Scenario(NamedTuple):
+    """One endpoint to load: its method and path, and how a request body is built from a topic."""
+    method: str
+    path: str
+    body: Optional[Callable[[str], Dict[str, Any]]]
+
+def _query(template: str) -> Callable[[str], Dict[str, Any]]:
+    return lambda topic: {"query": template.format(topic=topic)}
+
+SCENARIOS: Dict[str, Scenario] = {
+    "workflow": Scenario("POST", "/workflow", _query("Teach me about {topic}")),
+    "workflow.stream": Scenario("POST", "/workflow/stream", _query("Teach me about {topic}")),
+    "learning.tutorial": Scenario("POST", "/api/learning/tutorial", _query("Create a tutorial on {topic}")),
+    "learning.tutorial.stream": Scenario("POST", "/api/learning/tutorial/stream", _query("Create a tutorial on {topic}")),
+    "learning.query": Scenario("POST", "/api/learning/query", _query("What is {topic}?")),
+    "interview.questions": Scenario("POST", "/api/interview/questions", _query("Interview questions on {topic}")),
+    "interview.questions.stream": Scenario("POST", "/api/interview/questions/stream",
+                                           _query("Interview questions on {topic}")),
+    "interview.mock": Scenario("POST", "/api/interview/mock", _query("Start a mock interview on {topic}")),
+    "resume.create": Scenario("POST", "/api/resume/create", _query("Create a resume for a {topic} engineer")),
+    "resume.create.stream": Scenario("POST", "/api/resume/create/stream", _query("Create a resume for a {topic} engineer")),
+    "job.search": Scenario("POST", "/api/job/search", _query("{topic} engineer jobs in Bangalore")),
+    "job.search.stream": Scenario("POST", "/api/job/search/stream", _query("{topic} engineer jobs in Bangalore")),
+    "batch": Scenario("POST", "/api/batch", lambda topic: {
+        "items": [{"query": f"What is {topic}?"}, {"query": f"Interview questions on {topic}",
+                                                   "route": "interview_topics_questions"}]
+    }),
+    "artifacts": Scenario("GET", "/api/artifacts?limit=20", None),
+}
+
+def percentile(values: List[float], q: float) -> float:
+    """Return the q-th percentile (0-100) of sorted values, interpolating between ranks."""
+    if not values:
+        return 0.0
+    rank = (len(values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+def summarize(seconds: List[float]) -> Dict[str, float]:
+    """Describe a latency sample in milliseconds."""
+    values = sorted(seconds)
+    return {
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a task that sleeps for a fixed interval."""
+
+    def __init__(self, interval: float = 0.01):
+        """Initialize the monitor.
+
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(time.perf_counter() - expected, 0.0))
+
+    def start(self) -> None:
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> Dict[str, float]:
+        """Stop sampling and describe the lag."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        return summarize(self.samples)
+
+async def run_scenario(client: httpx.AsyncClient, name: str, requests: int, concurrency: int,
+                       unique: bool = True) -> Dict[str, Any]:
+    """Send requests to one endpoint from `concurrency` workers and measure them.
+
+    Args:
+        client: Client bound to the app
+        name: The scenario (a key of SCENARIOS)
+        requests: Requests to send
+        concurrency: Requests in flight at once
+        unique: Give every request its own query (False cycles through TOPICS, so caches and coalescing kick in)
+
+    Returns:
+        Request and error counts, throughput, latency percentiles and event-loop lag
+    """
+    scenario = SCENARIOS[name]
+    counter = itertools.count()
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    monitor = LoopLagMonitor()
+
+    async def worker() -> None:
+        for number in iter(lambda: next(counter), None):
+            if number >= requests:
+                return
+            topic = TOPICS[number % len(TOPICS)]
+            if unique:
+                topic = f"{topic} {number}"
+            started = time.perf_counter()
+            try:
+                response = await client.request(
+                    scenario.method,
+                    scenario.path,
+                    json=scenario.body(topic) if scenario.body else None
+                )
+                error = str(response.status_code) if response.status_code >= 400 else None
+            except Exception as e:
+                error = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+
+    monitor.start()
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(max(concurrency, 1))])
+    elapsed = time.perf_counter() - started
+    lag = await monitor.stop()
+
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors.values()),
+        "error_codes": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "latency": summarize(latencies),
+        "loop_lag": lag,
+    }
+
+async def run_benchmark(endpoints: List[str], requests: int, concurrency: int,
+                        profile: ModelProfile, search: FakeSearch, unique: bool = True,
+                        cache: bool = False, quota: bool = False, warmup: int = 2) -> Dict[str, Dict[str, Any]]:
+    """Run the scenarios against the app with fake backends and isolated local state.
+
+    Args:
+        endpoints: Scenario names to run, in order
+        requests: Requests per scenario
+        concurrency: Requests in flight at once
+        profile: Behaviour of the fake Gemini model
+        search: The fake search backend
+        unique: Give every request its own query
+        cache: Keep the LLM response caches on (off measures generation every time)
+        quota: Enforce the configured Gemini rate limits in the LLM scheduler
+        warmup: Unmeasured requests sent to each endpoint first
+
+    Returns:
+        The results per scenario
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as folder, fake_backends(profile, search), \
+            patch("app.config.INTENT_LOG_FILE", ""):
+        set_artifact_store(ArtifactStore(directory=os.path.join(folder, "output")))
+        set_llm_cache(LLMCache(path=None, ttls=None if cache else {}, semantic=SemanticCache() if cache else None))
+        set_session_store(SessionStore(directory=None))
+        set_scheduler(LLMScheduler(limits=None if quota else {}, upstream="gemini"))
+        reset_breakers()
+        close_pool()
+        try:
+            async with app.router.lifespan_context(app):
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+                    for name in endpoints:
+                        if warmup:
+                            await run_scenario(client, name, warmup, 1, unique=False)
+                        results[name] = await run_scenario(client, name, requests, concurrency, unique)
+                        print(f"{name}: {format_result(results[name])}", file=sys.stderr)
+        finally:
+            close_pool()
+            set_scheduler(None)
+            set_session_store(None)
+            set_llm_cache(None)
+            set_artifact_store(None)
+            reset_breakers()
+    return results
+
+def format_result(result: Dict[str, Any]) -> str:
+    """Render one scenario's result as a line."""
+    latency, lag = result["latency"], result["loop_lag"]
+    return (
+        f"{result['requests_per_second']:.1f} req/s, "
+        f"p50 {latency['p50_ms']:.1f} ms, p95 {latency['p95_ms']:.1f} ms, p99 {latency['p99_ms']:.1f} ms, "
+        f"loop lag p99 {lag['p99_ms']:.1f} ms, {result['errors']} errors"
+    )
+
+def git_commit() -> Optional[str]:
+    """Return the checked-out commit, if this is a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Describe the change in throughput and p95/p99 latency against a baseline report."""
+    lines = []
+    for name, result in report["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            continue
+        changes = []
+        for label, now, then in [
+            ("req/s", result["requests_per_second"], before["requests_per_second"]),
+            ("p95", result["latency"]["p95_ms"], before["latency"]["p95_ms"]),
+            ("p99", result["latency"]["p99_ms"], before["latency"]["p99_ms"]),
+        ]:
+            changes.append(f"{label} {(now - then) / then * 100:+.1f}%" if then else f"{label} n/a")
+        lines.append(f"{name}: {', '.join(changes)}")
+    return lines
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Load-test the API in-process against deterministic Gemini and search stand-ins."
+    )
+    parser.add_argument("--endpoints", default=",".join(SCENARIOS),
+                        help=f"Comma-separated scenarios (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once")
+    parser.add_argument("--model-latency", default="lognormal:0.3,0.5",
+                        help="Time to first token: fixed:S, uniform:LOW,HIGH or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Model tokens per second (0 for instant)")
+    parser.add_argument("--output-tokens", type=int, default=400, help="Tokens per model response")
+    parser.add_argument("--search-latency", default="lognormal:0.25,0.4", help="Search latency distribution")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the latency distributions")
+    parser.add_argument("--repeat-queries", action="store_true",
+                        help="Cycle through a few queries instead of making each one unique")
+    parser.add_argument("--cache", action="store_true", help="Keep the LLM response caches on")
+    parser.add_argument("--quota", action="store_true", help="Enforce the configured Gemini rate limits")
+    parser.add_argument("--output", default=None,
+                        help=f"JSON file (or folder) for the results (default: {RESULTS_FOLDER})")
+    parser.add_argument("--baseline", default=None, help="Earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.endpoints.split(",") if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    try:
+        Latency(args.model_latency)
+        Latency(args.search_latency)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Run the benchmark from the command line and save its report."""
+    args = parse_args(argv)
+    profile = ModelProfile(Latency(args.model_latency, args.seed), args.token_rate, args.output_tokens)
+    search = FakeSearch(Latency(args.search_latency, args.seed + 1))
+    endpoints = args.endpoints.split(",")
+
+    results = asyncio.run(run_benchmark(
+        endpoints, args.requests, args.concurrency, profile, search,
+        unique=not args.repeat_queries, cache=args.cache, quota=args.quota
+    ))
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "model_latency": args.model_latency,
+            "token_rate": args.token_rate,
+            "output_tokens": args.output_tokens,
+            "search_latency": args.search_latency,
+            "seed": args.seed,
+            "unique_queries": not args.repeat_queries,
+            "cache": args.cache,
+            "quota": args.quota,
+        },
+        "backends": {"model": profile.stats, "search": search.stats},
+        "results": results,
+    }
+
+    path = args.output or RESULTS_FOLDER
+    if not path.endswith(".json"):
+        os.makedirs(path, exist_ok=True)
+        path = os.path.join(path, f"{time.strftime('%Y%m%d_%H%M%S')}_{commit or 'nogit'}.json")
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {path}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            for line in compare(report, json.load(f)):
+                print(line, file=sys.stderr)
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import asyncio
+import math
+import random
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+from unittest.mock import patch
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from app.workflows.intent import INTENT_ROUTES
+
+# Words the fake model writes its markdown from
+_VOCABULARY = (
+    "model prompt agent retrieval embedding vector token context chain graph tool memory evaluation "
+    "dataset training inference latency pipeline transformer attention layer fine-tuning adapter "
+    "interview resume skill project experience role team python langchain gemini search answer"
+).split()
+
+class Latency:
+    """A seeded latency distribution in seconds.
+
+    Parsed from "fixed:S", "uniform:LOW,HIGH" or "lognormal:MEDIAN,SIGMA".
+    Samples are drawn from one seeded generator, so a run's sequence of
+    latencies is reproducible.
+    """
+
+    def __init__(self, spec: str, seed: int = 0):
+        """Parse a distribution spec.
+
+        Raises:
+            ValueError: If the spec is not one of the supported forms
+        """
+        kind, _, args = spec.partition(":")
+        try:
+            values = [float(value) for value in args.split(",")] if args else []
+        except ValueError:
+            raise ValueError(f"Invalid latency spec: {spec}")
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2}.get(kind)
+        if expected is None or len(values) != expected or any(value < 0 for value in values):
+            raise ValueError(f"Invalid latency spec: {spec} (use fixed:S, uniform:LOW,HIGH or lognormal:MEDIAN,SIGMA)")
+        self.spec = spec
+        self.kind = kind
+        self.values = values
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        """Draw the next latency."""
+        with self._lock:
+            if self.kind == "fixed":
+                return self.values[0]
+            if self.kind == "uniform":
+                return self._random.uniform(*self.values)
+            median, sigma = self.values
+            return self._random.lognormvariate(math.log(median), sigma) if median else 0.0
+
+class ModelProfile:
+    """How the fake model behaves: time to first token, token rate and response length."""
+
+    def __init__(self, first_token: Latency, tokens_per_second: float = 0.0, output_tokens: int = 400,
+                 chunk_tokens: int = 8):
+        """Initialize the profile.
+
+        Args:
+            first_token: Time until the first token
+            tokens_per_second: Generation speed after the first token (0 for instant)
+            output_tokens: Tokens per response (capped by the client's max_output_tokens)
+            chunk_tokens: Tokens per streamed chunk
+        """
+        self.first_token = first_token
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.chunk_tokens = chunk_tokens
+        self.stats = {"calls": 0, "streams": 0, "output_tokens": 0}
+        self._lock = threading.Lock()
+
+    def count(self, kind: str, tokens: int) -> None:
+        """Count a call and the tokens it produced."""
+        with self._lock:
+            self.stats[kind] += 1
+            self.stats["output_tokens"] += tokens
+
+    def seconds_for(self, tokens: int) -> float:
+        """Seconds it takes to produce a number of tokens after the first one."""
+        return tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+class FakeGemini(BaseChatModel):
+    """Deterministic stand-in for ChatGoogleGenerativeAI with configurable latency.
+
+    The response text depends only on the prompt. Routing prompts get a leaf
+    route name back; everything else gets markdown of the profile's length.
+    Reports usage metadata, so the LLM scheduler settles real token counts.
+    """
+
+    model: str = "fake-gemini"
+    temperature: Optional[float] = None
+    max_output_tokens: Optional[int] = None
+    profile: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    def _respond(self, messages: List[BaseMessage]) -> List[str]:
+        """Return the response for a prompt, split into tokens."""
+        prompt = "\n".join(str(message.content) for message in messages)
+        seed = zlib.crc32(prompt.encode("utf-8"))
+        if "Give the handler name only" in prompt:
+            return [INTENT_ROUTES[seed % len(INTENT_ROUTES)]]
+        tokens = self.profile.output_tokens
+        if self.max_output_tokens:
+            tokens = min(tokens, self.max_output_tokens)
+        rng = random.Random(seed)
+        words = [rng.choice(_VOCABULARY) for _ in range(max(tokens - 2, 1))]
+        return ["# Response\n\n"] + [f"{word} " for word in words] + ["\n"]
+
+    def _message(self, tokens: List[str], messages: List[BaseMessage]) -> AIMessage:
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4
+        return AIMessage(
+            content="".join(tokens),
+            usage_metadata={"input_tokens": input_tokens, "output_tokens": len(tokens),
+                            "total_tokens": input_tokens + len(tokens)}
+        )
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        tokens = self._respond(messages)
+        time.sleep(self.profile.first_token.sample() + self.profile.seconds_for(len(tokens) - 1))
+        self.profile.count("calls", len(tokens))
+        return ChatResult(generations=[ChatGeneration(message=self._message(tokens, messages))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        tokens = self._respond(messages)
+        await asyncio.sleep(self.profile.first_token.sample() + self.profile.seconds_for(len(tokens) - 1))
+        self.profile.count("calls", len(tokens))
+        return ChatResult(generations=[ChatGeneration(message=self._message(tokens, messages))])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = self._respond(messages)
+        size = self.profile.chunk_tokens
+        await asyncio.sleep(self.profile.first_token.sample())
+        for start in range(0, len(tokens), size):
+            if start:
+                await asyncio.sleep(self.profile.seconds_for(size))
+            yield ChatGenerationChunk(message=AIMessageChunk(content="".join(tokens[start:start + size])))
+        self.profile.count("streams", len(tokens))
+
+    @classmethod
+    def factory(cls, profile: ModelProfile) -> Callable[..., "FakeGemini"]:
+        """Return a constructor taking ChatGoogleGenerativeAI's arguments."""
+        def build(model: str = "fake-gemini", temperature: Optional[float] = None,
+                  max_output_tokens: Optional[int] = None, **kwargs: Any) -> FakeGemini:
+            return cls(model=model, temperature=temperature, max_output_tokens=max_output_tokens, profile=profile)
+        return build
+
+class FakeSearch:
+    """Deterministic stand-in for DuckDuckGoSearchResults with configurable latency."""
+
+    def __init__(self, latency: Latency, results: int = 4):
+        """Initialize the fake search.
+
+        Args:
+            latency: Time each search takes
+            results: Hits per search
+        """
+        self.latency = latency
+        self.results = results
+        self.stats = {"calls": 0}
+
+    def _results(self, query: str) -> str:
+        """Return DuckDuckGo-formatted results for a query."""
+        rng = random.Random(zlib.crc32(query.encode("utf-8")))
+        hits = []
+        for i in range(self.results):
+            words = " ".join(rng.choice(_VOCABULARY) for _ in range(30))
+            hits.append(f"snippet: {query} {words}, title: Result {i + 1} for {query}, link: https://example.com/{i + 1}")
+        return ", ".join(hits)
+
+    def invoke(self, query: str, **kwargs: Any) -> str:
+        time.sleep(self.latency.sample())
+        self.stats["calls"] += 1
+        return self._results(query)
+
+    async def ainvoke(self, query: str, **kwargs: Any) -> str:
+        await asyncio.sleep(self.latency.sample())
+        self.stats["calls"] += 1
+        return self._results(query)
+
+@contextmanager
+def fake_backends(profile: ModelProfile, search: FakeSearch) -> Iterator[None]:
+    """Build every Gemini client and the search tool from the fakes while the block runs."""
+    with patch("app.services.clients.ChatGoogleGenerativeAI", FakeGemini.factory(profile)), \
+            patch("app.services.clients.DuckDuckGoSearchResults", lambda: search):
+        yield
@@ -1,10 +1,56 @@
 import pytest
 import os
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock, MagicMock
 
 from app.main import app
 from app.config import GOOGLE_API_KEY
+from app.services.pool import close_pool
+from app.services.llm_cache import LLMCache, set_llm_cache
+from app.services.sessions import SessionStore, set_session_store
+from app.services.artifacts import ArtifactStore, set_artifact_store
+from app.services.breaker import reset_breakers
+from app.services.metrics import REGISTRY
+
+@pytest.fixture(autouse=True)
+def session_store():
+    """Give every test an empty, memory-only interview session store."""
+    store = SessionStore(directory=None)
+    set_session_store(store)
+    yield store
+    set_session_store(None)
+
+@pytest.fixture(autouse=True)
+def artifact_store(tmp_path):
+    """Give every test an artifact store writing under its own temporary folder."""
+    store = ArtifactStore(directory=str(tmp_path / "output"))
+    set_artifact_store(store)
+    yield store
+    set_artifact_store(None)
+
+@pytest.fixture(autouse=True)
+def breakers():
+    """Start every test with all upstream circuits closed."""
+    reset_breakers()
+    yield
+    reset_breakers()
+
+@pytest.fixture(autouse=True)
+def metrics():
+    """Start every test with no recorded metrics."""
+    REGISTRY.reset()
+    yield REGISTRY
+    REGISTRY.reset()
+
+@pytest.fixture(autouse=True)
+def llm_cache(session_store, artifact_store):
+    """Give every test an empty, memory-only LLM response cache."""
+    cache = LLMCache(path=None)
+    set_llm_cache(cache)
+    close_pool()
+    yield cache
+    set_llm_cache(None)
+    close_pool()
 
 @pytest.fixture
 def test_client():
@@ -14,27 +60,40 @@ def test_client():
 @pytest.fixture
 def mock_google_llm():
     """Mock the Google Generative AI model responses."""
-    with patch("langchain_google_genai.ChatGoogleGenerativeAI") as mock_llm:
+    with patch("app.services.clients.ChatGoogleGenerativeAI") as mock_llm:
         mock_instance = MagicMock()
         mock_instance.invoke.return_value.content = "Mocked response"
+        # Chains coerce the model into a callable runnable, so route calls to invoke's result
+        mock_instance.side_effect = lambda *args, **kwargs: mock_instance.invoke.return_value
+        mock_instance.bind.return_value = mock_instance
         mock_llm.return_value = mock_instance
+        close_pool()
         yield mock_llm
+    close_pool()
 
 @pytest.fixture
 def mock_duckduckgo():
     """Mock the DuckDuckGo search results."""
-    with patch("langchain_community.tools.DuckDuckGoSearchResults") as mock_search:
+    with patch("app.services.clients.DuckDuckGoSearchResults") as mock_search:
         mock_instance = MagicMock()
         mock_instance.invoke.return_value = "Mocked search results"
+        mock_instance.ainvoke = AsyncMock(return_value="Mocked search results")
         mock_search.return_value = mock_instance
+        close_pool()
         yield mock_search
+    close_pool()
 
 @pytest.fixture
 def mock_file_utils():
-    """Mock the file utility functions."""
-    with patch("app.utils.file_utils.save_file") as mock_save:
+    """Mock the artifact store's save_file."""
+    with patch("app.services.artifacts.save_file") as mock_save:
         mock_save.return_value = "mocked/file/path.md"
-        yield mock_save
+        # Agents import save_file by name, so patch it where it is used as well
+        with patch("app.agents.learning.save_file", mock_save), \
+             patch("app.agents.interview.save_file", mock_save), \
+             patch("app.agents.resume.save_file", mock_save), \
+             patch("app.agents.job.save_file", mock_save):
+            yield mock_save
 
 @pytest.fixture
 def sample_queries():
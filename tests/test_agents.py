@@ -1,10 +1,13 @@
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.runnables import RunnableLambda
 
 from app.agents.learning import LearningResourceAgent
 from app.agents.interview import InterviewAgent
 from app.agents.resume import ResumeMaker
-from app.agents.job import JobSearch
+from app.agents.job import JobSearch, JOB_SEARCH_PROMPT
 
 def test_learning_resource_agent_create_tutorial(mock_google_llm, mock_duckduckgo, mock_file_utils, api_key_env):
     """Test the LearningResourceAgent's create_tutorial method."""
@@ -15,7 +18,7 @@ def test_learning_resource_agent_create_tutorial(mock_google_llm, mock_duckduckg
     assert "file_path" in result
     assert result["file_path"] == "mocked/file/path.md"
 
-def test_learning_resource_agent_answer_query(mock_google_llm, api_key_env):
+def test_learning_resource_agent_answer_query(mock_google_llm, mock_duckduckgo, api_key_env):
     """Test the LearningResourceAgent's answer_query method."""
     agent = LearningResourceAgent()
     result = agent.answer_query("What is generative AI?")
@@ -68,4 +71,150 @@ def test_job_search_find_jobs(mock_google_llm, mock_duckduckgo, mock_file_utils,
     
     assert "content" in result
     assert "file_path" in result
-    assert result["file_path"] == "mocked/file/path.md"
\ No newline at end of file
+    assert result["file_path"] == "mocked/file/path.md"
+
+def test_agents_async_variants(monkeypatch, mock_google_llm, mock_duckduckgo, api_key_env):
+    """Test that the async agent methods go through ainvoke and return the same shape."""
+    for module in ("learning", "interview", "resume"):
+        monkeypatch.setattr(f"app.agents.{module}.save_file", lambda **kwargs: "mocked/file/path.md")
+    
+    search_tool = RunnableLambda(lambda query: "Mocked search results")
+    
+    learning = LearningResourceAgent()
+    learning.model = FakeListChatModel(responses=["Mocked tutorial", "Mocked answer"])
+    learning.search_tool = search_tool
+    result = asyncio.run(learning.create_tutorial_async("Teach me LangChain"))
+    assert result == {"content": "Mocked tutorial", "file_path": "mocked/file/path.md"}
+    result = asyncio.run(learning.answer_query_async("What is RAG?", [{"role": "user", "content": "Hi"}]))
+    assert result["content"] == "Mocked answer"
+    assert result["role"] == "assistant"
+    
+    interview = InterviewAgent()
+    interview.model = FakeListChatModel(responses=["Mocked questions", "Mocked question"])
+    interview.search_tool = search_tool
+    result = asyncio.run(interview.generate_interview_questions_async("Data analyst interview"))
+    assert result["content"] == "Mocked questions"
+    result = asyncio.run(interview.conduct_mock_interview_async("I'm ready for the interview"))
+    assert result == {"content": "Mocked question", "role": "assistant"}
+    
+    resume = ResumeMaker()
+    resume.use_fallback = False
+    resume.model = FakeListChatModel(responses=["Mocked resume"])
+    resume.search_tool = search_tool
+    result = asyncio.run(resume.create_resume_async("AI engineer with 3 years of experience"))
+    assert result == {"content": "Mocked resume", "file_path": "mocked/file/path.md"}
+
+def test_job_search_find_jobs_inside_running_loop(monkeypatch, mock_google_llm, mock_duckduckgo, api_key_env):
+    """Test that the sync job search wrapper works even when called from a running event loop."""
+    monkeypatch.setattr("app.agents.job.save_file", lambda **kwargs: "mocked/file/path.md")
+    
+    agent = JobSearch()
+    agent.use_fallback = False
+    agent.model = FakeListChatModel(responses=["Mocked job listings"])
+    agent.search_tool = RunnableLambda(lambda query: "Mocked search results")
+    
+    async def call_from_loop():
+        return agent.find_jobs("Find AI engineer jobs in Noida")
+    
+    result = asyncio.run(call_from_loop())
+    assert result == {"content": "Mocked job listings", "file_path": "mocked/file/path.md"}
+
+def test_job_search_generates_without_listings_when_the_search_fails(monkeypatch, llm_cache, api_key_env):
+    """Test that a failed search is counted, generation goes ahead without it and the answer isn't cached."""
+    from app.services.metrics import AGENT_ERRORS
+    monkeypatch.setattr("app.agents.job.save_file", lambda **kwargs: "mocked/file/path.md")
+
+    def fail(query):
+        raise ConnectionError("search unavailable")
+
+    agent = JobSearch(model=FakeListChatModel(responses=["Listings from memory"]),
+                      search_tool=RunnableLambda(fail), cache=llm_cache)
+    agent.use_fallback = False
+    result = asyncio.run(agent.find_jobs_async("ml jobs in Pune"))
+    assert result["content"] == "Listings from memory"
+    assert AGENT_ERRORS.value(operation="job_search", error="ConnectionError") == 1
+    assert llm_cache.get("job_search", llm_cache.make_key("job_search", agent.model, JOB_SEARCH_PROMPT, "ml jobs in Pune")) is None
+
+def test_agents_stream_tokens_and_write_file_incrementally(monkeypatch, tmp_path, api_key_env):
+    """Test that streamed generations arrive as tokens and end with the saved file path."""
+    search_tool = RunnableLambda(lambda query: "Mocked search results")
+    
+    async def collect(events):
+        return [event async for event in events]
+    
+    agent = JobSearch(model=FakeListChatModel(responses=["# Jobs\n- ML Engineer"]), search_tool=search_tool)
+    agent.use_fallback = False
+    events = asyncio.run(collect(agent.find_jobs_stream("ml jobs")))
+    
+    assert events[0]["event"] == "start"
+    tokens = [event["text"] for event in events if event["event"] == "token"]
+    assert len(tokens) > 1
+    assert "".join(tokens) == "# Jobs\n- ML Engineer"
+    assert events[-1]["event"] == "done"
+    assert all("ts" in event for event in events)
+    with open(events[-1]["file_path"], encoding="utf-8") as f:
+        assert f.read() == "# Jobs\n- ML Engineer"
+    
+    # A repeated request is served from the cache in a single token event
+    events = asyncio.run(collect(agent.find_jobs_stream("ml jobs")))
+    assert [event["event"] for event in events] == ["start", "token", "done"]
+    assert events[1]["cached"] is True
+
+def test_mock_interview_session_folds_old_turns_into_summary(api_key_env):
+    """Test that session turns keep server-side history bounded by a rolling summary."""
+    from app.services.sessions import SessionStore
+    
+    agent = InterviewAgent(
+        model=FakeListChatModel(responses=["Question " + "x" * 400]),
+        sessions=SessionStore(directory=None),
+        summary_model=FakeListChatModel(responses=["Candidate covered transformers and RAG."])
+    )
+    agent.use_fallback = False
+    
+    async def interview():
+        opening = await agent.start_session_async("Mock interview for an LLM engineer")
+        for turn in range(12):
+            result = await agent.conduct_session_turn_async(opening["session_id"], f"Answer {turn} " + "y" * 400)
+        return opening, result
+    
+    opening, result = asyncio.run(interview())
+    assert opening["turn"] == 1
+    assert result["turn"] == 13
+    assert result["session_id"] == opening["session_id"]
+    
+    session = agent.sessions.get(opening["session_id"])
+    assert session.summary == "Candidate covered transformers and RAG."
+    assert session.history_tokens() <= 2000
+    assert session.messages[-1]["role"] == "assistant"
+    assert asyncio.run(agent.conduct_session_turn_async("0" * 32, "hello")) is None
+
+def test_concurrent_session_turns_keep_history_when_the_session_is_spilled(tmp_path, mock_google_llm, api_key_env):
+    """Test that a turn waiting on another reads the session after it, even if it was spilled meanwhile."""
+    from app.services.sessions import SessionStore
+    
+    from langchain_core.messages import AIMessage
+    
+    async def slow_model(prompt):
+        await asyncio.sleep(0.05)
+        return AIMessage(content="Next question")
+    
+    agent = InterviewAgent(
+        model=RunnableLambda(slow_model),
+        sessions=SessionStore(directory=str(tmp_path), max_memory_sessions=1)
+    )
+    agent.use_fallback = False
+    
+    async def interview():
+        opening = await agent.start_session_async("Mock interview for a data engineer")
+        session_id = opening["session_id"]
+        first = asyncio.ensure_future(agent.conduct_session_turn_async(session_id, "Answer A"))
+        await asyncio.sleep(0.01)
+        # Another session pushes this one out to disk while the first turn runs
+        await agent.sessions.create_async(topic="other")
+        second = asyncio.ensure_future(agent.conduct_session_turn_async(session_id, "Answer B"))
+        await asyncio.gather(first, second)
+        return await agent.sessions.get_async(session_id)
+    
+    session = asyncio.run(interview())
+    assert session.turns == 3
+    assert [m["content"] for m in session.messages if m["role"] == "user"][-2:] == ["Answer A", "Answer B"]
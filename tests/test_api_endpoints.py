@@ -1,3 +1,4 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 
@@ -7,7 +8,7 @@ def test_root_endpoint(test_client):
     assert response.status_code == 200
     assert response.json() == {"message": "GenAI Career Assistant API is running"}
 
-def test_workflow_endpoint(test_client, mock_google_llm, mock_file_utils, sample_queries, api_key_env):
+def test_workflow_endpoint(test_client, mock_google_llm, mock_duckduckgo, mock_file_utils, sample_queries, api_key_env):
     """Test the workflow endpoint with a learning query."""
     response = test_client.post(
         "/workflow",
@@ -27,7 +28,7 @@ def test_learning_tutorial_endpoint(test_client, mock_google_llm, mock_duckduckg
     assert "content" in response.json()
     assert "file_path" in response.json()
 
-def test_learning_query_endpoint(test_client, mock_google_llm, sample_queries, api_key_env):
+def test_learning_query_endpoint(test_client, mock_google_llm, mock_duckduckgo, sample_queries, api_key_env):
     """Test the learning query endpoint."""
     response = test_client.post(
         "/api/learning/query",
@@ -75,4 +76,196 @@ def test_job_search_endpoint(test_client, mock_google_llm, mock_duckduckgo, mock
     )
     assert response.status_code == 200
     assert "content" in response.json()
-    assert "file_path" in response.json()
\ No newline at end of file
+    assert "file_path" in response.json()
+def test_lifespan_creates_shared_agent_pool(mock_google_llm, mock_duckduckgo, api_key_env):
+    """Test that the app lifespan builds one agent pool that every request reuses."""
+    from app.main import app
+    from app.services.pool import get_pool
+    
+    with TestClient(app) as client:
+        pool = app.state.pool
+        assert get_pool() is pool
+        assert pool.learning.search_tool is pool.interview.search_tool
+        
+        response = client.post("/api/interview/mock", json={"query": "Start a mock interview"})
+        assert response.status_code == 200
+        assert get_pool() is pool
+
+def test_tutorial_stream_endpoint(test_client, mock_google_llm, mock_duckduckgo, sample_queries, api_key_env, monkeypatch, tmp_path):
+    """Test that the streaming tutorial endpoint sends server-sent events ending with the file path."""
+    response = test_client.post(
+        "/api/learning/tutorial/stream",
+        json={"query": sample_queries["learning"]}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    
+    events = [line[len("event: "):] for line in response.text.splitlines() if line.startswith("event: ")]
+    assert events[0] == "start"
+    assert "token" in events
+    assert events[-1] == "done"
+    assert str(tmp_path) in response.text.strip().splitlines()[-1]
+
+def test_mock_interview_session_endpoints(test_client, mock_google_llm, sample_queries, api_key_env):
+    """Test starting, continuing, reading and ending a server-side mock interview session."""
+    response = test_client.post("/api/interview/sessions", json={"query": sample_queries["mock_interview"]})
+    assert response.status_code == 200
+    session_id = response.json()["session_id"]
+    
+    response = test_client.post(f"/api/interview/sessions/{session_id}", json={"query": "I have built RAG systems."})
+    assert response.status_code == 200
+    assert response.json()["turn"] == 2
+    
+    session = test_client.get(f"/api/interview/sessions/{session_id}").json()
+    assert [msg["role"] for msg in session["messages"]] == ["user", "assistant", "user", "assistant"]
+    
+    assert test_client.delete(f"/api/interview/sessions/{session_id}").status_code == 200
+    assert test_client.post(f"/api/interview/sessions/{session_id}", json={"query": "hi"}).status_code == 404
+
+def test_mock_interview_websocket(test_client, mock_google_llm, sample_queries, api_key_env, monkeypatch):
+    """Test a mock interview over the WebSocket endpoint, including the idle timeout."""
+    from starlette.websockets import WebSocketDisconnect
+    
+    def receive_reply(websocket):
+        events = []
+        while not events or events[-1]["event"] not in ("done", "error"):
+            events.append(websocket.receive_json())
+        return events
+    
+    with test_client.websocket_connect("/api/interview/ws") as websocket:
+        websocket.send_json({"content": sample_queries["mock_interview"]})
+        session = websocket.receive_json()
+        assert session["event"] == "session"
+        events = receive_reply(websocket)
+        assert events[0]["event"] == "token"
+        assert events[-1]["turn"] == 1
+        
+        websocket.send_text("I would start with a retrieval baseline.")
+        assert receive_reply(websocket)[-1]["turn"] == 2
+    
+    monkeypatch.setattr("app.api.endpoints.interview.MOCK_WS_IDLE_TIMEOUT", 0.05)
+    with test_client.websocket_connect(f"/api/interview/ws?session_id={session['session_id']}") as websocket:
+        with pytest.raises(WebSocketDisconnect) as disconnect:
+            websocket.receive_json()
+        assert disconnect.value.code == 1000
+
+def test_artifact_endpoints(test_client, mock_google_llm, mock_duckduckgo, sample_queries, api_key_env):
+    """Test returning only the artifact id and fetching it with ETags, ranges and gzip."""
+    import gzip
+    from app.services.artifacts import get_artifact_store
+    
+    response = test_client.post(
+        "/api/learning/tutorial?include_content=false",
+        json={"query": sample_queries["learning"]}
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert "content" not in result
+    
+    response = test_client.get(result["artifact_url"])
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/markdown")
+    assert "Mocked response" in response.text
+    etag = response.headers["etag"]
+    
+    assert test_client.get(result["artifact_url"], headers={"If-None-Match": etag}).status_code == 304
+    
+    response = test_client.get(result["artifact_url"], headers={"Range": "bytes=0-1"})
+    assert response.status_code == 206
+    assert response.content == b"Mo"
+    assert response.headers["content-range"].startswith("bytes 0-1/")
+    assert test_client.get(result["artifact_url"], headers={"Range": "bytes=100000-"}).status_code == 416
+    
+    large = get_artifact_store().put("# Notes\n" + "transformers " * 100, kind="tutorial", query="notes")
+    response = test_client.get(f"/api/artifacts/{large.id}", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text.startswith("# Notes")
+    raw = test_client.get(f"/api/artifacts/{large.id}", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+    assert raw.headers["etag"] != response.headers["etag"]
+    
+    listing = test_client.get("/api/artifacts", params={"kind": "tutorial", "q": "basics"}).json()
+    assert [item["id"] for item in listing] == [result["artifact_id"]]
+    assert test_client.get("/api/artifacts/0123456789abcdef0123456789abcdef").status_code == 404
+
+def test_batch_endpoint(test_client, mock_google_llm, mock_duckduckgo, mock_file_utils, sample_queries, api_key_env):
+    """Test the batch endpoint with forced routes, duplicates and an invalid route."""
+    response = test_client.post("/api/batch", json={"items": [
+        {"query": sample_queries["resume"], "route": "handle_resume_making"},
+        {"query": sample_queries["job_search"], "route": "job_search"},
+        {"query": sample_queries["resume"], "route": "handle_resume_making"},
+    ]})
+    assert response.status_code == 200
+    result = response.json()
+    assert [item["status"] for item in result["results"]] == ["ok", "ok", "ok"]
+    assert result["results"][1]["category"] == "job_search"
+    assert result["unique"] == 2
+    
+    response = test_client.post("/api/batch", json={"items": [{"query": "hi", "route": "not_a_route"}]})
+    assert response.status_code == 422
+
+def test_request_deadline_marks_partial_results(test_client, mock_google_llm, mock_duckduckgo, sample_queries, api_key_env):
+    """Test that a search outlasting the request's budget is skipped and the response is marked partial."""
+    import asyncio
+    
+    async def slow_search(*args, **kwargs):
+        await asyncio.sleep(0.6)
+        return "Mocked search results"
+    
+    mock_duckduckgo.return_value.ainvoke = slow_search
+    response = test_client.post(
+        "/api/learning/tutorial",
+        json={"query": sample_queries["learning"]},
+        # below the minimum budget, so it is raised to a second; the search gets 0.3s of it
+        headers={"X-Request-Timeout": "0.1"}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["content"]
+    assert body["partial"] is True
+    assert body["degraded"] == ["search_timeout"]
+    
+    response = test_client.post(
+        "/api/learning/tutorial/stream",
+        json={"query": sample_queries["learning"]},
+        headers={"X-Request-Timeout": "0.1"}
+    )
+    lines = response.text.strip().splitlines()
+    assert lines[-2] == "event: done"
+    done = json.loads(lines[-1][len("data: "):])
+    assert done["degraded"] == ["search_timeout"] and done["partial"] is True
+    
+    response = test_client.post("/api/learning/query", json={"query": sample_queries["learning"]})
+    assert response.json()["degraded"] == [] and response.json()["partial"] is False
+
+def test_job_search_endpoint_gives_up_without_a_fallback_past_the_deadline(test_client, mock_google_llm, sample_queries,
+                                                                           api_key_env, monkeypatch):
+    """Test that a request cut off by its deadline isn't answered with a fallback artifact."""
+    from app.services.deadlines import DeadlineExceeded
+    from app.services.pool import get_pool
+    
+    async def past_deadline(query):
+        raise DeadlineExceeded("out of budget")
+    
+    monkeypatch.setattr(get_pool().job, "find_jobs_async", past_deadline)
+    with pytest.raises(DeadlineExceeded):
+        test_client.post("/api/job/search", json={"query": sample_queries["job_search"]})
+
+def test_metrics_endpoint_exposes_hot_path_histograms(test_client, mock_google_llm, mock_duckduckgo, sample_queries, api_key_env):
+    """Test that /metrics reports graph nodes, model and search calls, artifact saves and in-flight requests."""
+    assert test_client.post("/workflow", json={"query": sample_queries["learning"]}).status_code == 200
+    assert test_client.post("/api/learning/tutorial", json={"query": sample_queries["learning"]}).status_code == 200
+    
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'workflow_node_duration_seconds_count{node="classify_intent"} 1' in text
+    assert 'llm_call_duration_seconds_count{agent="learning"' in text
+    assert 'search_duration_seconds_count{provider="duckduckgo",outcome="ok"}' in text
+    assert 'search_result_chars_sum{provider="duckduckgo"} 42' in text
+    assert 'artifact_save_duration_seconds_count{kind="tutorial"} 1' in text
+    assert 'http_request_duration_seconds_count{method="POST",route="/api/learning/tutorial",status="200"} 1' in text
+    assert 'http_requests_in_flight{method="POST",route="/workflow"} 0' in text
+    # The scrape itself is in flight while the metrics are rendered
+    assert 'http_requests_in_flight{method="GET",route="/metrics"} 1' in text
@@ -0,0 +1,962 @@
+import asyncio
+import json
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.runnables import RunnableLambda
+
+from app.agents.learning import LearningResourceAgent, TUTORIAL_PROMPT
+from app.services.llm_cache import LLMCache
+
+def test_llm_cache_key_normalizes_input():
+    """Test that the cache key ignores case and whitespace but not the model or prompt."""
+    cache = LLMCache(path=None)
+    model = FakeListChatModel(responses=["x"])
+    key = cache.make_key("tutorial", model, TUTORIAL_PROMPT, "Teach me  LangChain?")
+    assert key == cache.make_key("tutorial", model, TUTORIAL_PROMPT, "teach me langchain")
+    assert key != cache.make_key("answer", model, TUTORIAL_PROMPT, "teach me langchain")
+
+def test_llm_cache_memory_tier_lru_and_ttl(monkeypatch):
+    """Test LRU eviction, TTL expiry and hit/miss counters in the memory tier."""
+    now = [1000.0]
+    monkeypatch.setattr("app.services.llm_cache.time.time", lambda: now[0])
+    cache = LLMCache(path=None, max_memory_entries=2, ttls={"tutorial": 60, "mock_interview": 0})
+    
+    cache.set("tutorial", "a", "A")
+    cache.set("tutorial", "b", "B")
+    assert cache.get("tutorial", "a") == "A"
+    cache.set("tutorial", "c", "C")
+    assert cache.get("tutorial", "b") is None
+    assert cache.get("tutorial", "a") == "A"
+    
+    now[0] += 61
+    assert cache.get("tutorial", "a") is None
+    
+    cache.set("mock_interview", "m", "M")
+    assert cache.get("mock_interview", "m") is None
+    assert cache.stats["memory_hits"] == 2
+    assert cache.stats["misses"] == 2
+    assert cache.stats["evictions"] == 1
+
+def test_llm_cache_disk_tier_persists_and_enforces_size(tmp_path):
+    """Test that the SQLite tier survives restarts and evicts by total size."""
+    path = str(tmp_path / "cache.sqlite3")
+    cache = LLMCache(path=path, max_disk_bytes=10, ttls={"tutorial": 60})
+    cache.set("tutorial", "a", "12345")
+    cache.set("tutorial", "b", "67890")
+    cache.close()
+    
+    reopened = LLMCache(path=path, max_disk_bytes=10, ttls={"tutorial": 60})
+    assert reopened.get("tutorial", "a") == "12345"
+    assert reopened.stats["disk_hits"] == 1
+    reopened.set("tutorial", "c", "abcde")
+    reopened.flush()
+    assert reopened.get("tutorial", "b") is None
+    assert reopened.get("tutorial", "c") == "abcde"
+    reopened.close()
+
+def test_llm_cache_writes_disk_tier_in_the_background(tmp_path):
+    """Test that disk writes go through the writer thread and the size total is kept without scans."""
+    import asyncio
+    
+    path = str(tmp_path / "cache.sqlite3")
+    cache = LLMCache(path=path, max_memory_entries=1, max_disk_bytes=12, ttls={"tutorial": 60})
+    cache.set("tutorial", "a", "12345")
+    cache.set("tutorial", "a", "1234")
+    cache.set("tutorial", "b", "6789")
+    cache.flush()
+    assert cache._disk_bytes == 8
+    
+    # "a" is only on disk now; the async lookup reads it on a worker thread
+    assert asyncio.run(cache.get_async("tutorial", "a")) == "1234"
+    assert cache.stats["disk_hits"] == 1
+    cache.set("tutorial", "c", "abcde")
+    cache.flush()
+    # "b" was used least recently, so it makes room for "c"
+    assert cache._disk_bytes == 9
+    assert asyncio.run(cache.get_async("tutorial", "b")) is None
+    cache.close()
+
+def test_agent_serves_repeated_requests_from_cache(monkeypatch, llm_cache, api_key_env):
+    """Test that identical tutorial requests reuse the cached completion and skip the search."""
+    monkeypatch.setattr("app.agents.learning.save_file", lambda **kwargs: "mocked/file/path.md")
+    searches = []
+    agent = LearningResourceAgent(
+        model=FakeListChatModel(responses=["First tutorial", "Second tutorial"]),
+        search_tool=RunnableLambda(lambda query: searches.append(query) or "Mocked search results"),
+        cache=llm_cache
+    )
+    
+    first = asyncio.run(agent.create_tutorial_async("Teach me LangChain"))
+    second = agent.create_tutorial("teach me langchain")
+    assert first["content"] == second["content"] == "First tutorial"
+    assert len(searches) == 1
+    assert llm_cache.stats["memory_hits"] == 1
+
+class SlowSearchTool:
+    """Search stand-in that counts upstream calls and takes a little while to answer."""
+    
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.calls = []
+    
+    def invoke(self, query):
+        self.calls.append(query)
+        return f"results for {query}"
+    
+    async def ainvoke(self, query):
+        self.calls.append(query)
+        await asyncio.sleep(self.delay)
+        return f"results for {query}"
+
+def test_search_cache_coalesces_concurrent_misses():
+    """Test that concurrent identical searches make a single upstream call."""
+    from app.services.search_cache import CachedSearchTool
+    
+    upstream = SlowSearchTool()
+    tool = CachedSearchTool(upstream)
+    
+    async def burst():
+        return await asyncio.gather(*[tool.ainvoke("tutorial LangChain") for _ in range(10)])
+    
+    results = asyncio.run(burst())
+    assert results == ["results for tutorial LangChain"] * 10
+    assert len(upstream.calls) == 1
+    assert tool.invoke("Tutorial  langchain") == "results for tutorial LangChain"
+    
+    metrics = tool.metrics()
+    assert metrics["misses"] == 1
+    assert metrics["coalesced"] == 9
+    assert metrics["hits"] == 1
+    assert metrics["hit_ratio"] == pytest.approx(10 / 11)
+    assert metrics["upstream_calls"] == 1
+
+def test_search_cache_prefix_ttls_and_bounded_size(monkeypatch):
+    """Test per-prefix TTLs and LRU bounding of cached results."""
+    from app.services.search_cache import CachedSearchTool
+    
+    now = [100.0]
+    monkeypatch.setattr("app.services.search_cache.time.monotonic", lambda: now[0])
+    upstream = SlowSearchTool()
+    tool = CachedSearchTool(upstream, ttls=[("job listings", 10), ("tutorial", 1000)], default_ttl=100, max_entries=2)
+    
+    tool.invoke("job listings data analyst")
+    tool.invoke("tutorial rag")
+    now[0] += 50
+    tool.invoke("job listings data analyst")
+    tool.invoke("tutorial rag")
+    assert upstream.calls == ["job listings data analyst", "tutorial rag", "job listings data analyst"]
+    
+    tool.invoke("what is rag")
+    assert tool.metrics()["entries"] == 2
+
+def test_search_cache_follower_retries_when_leader_cancelled():
+    """Test that cancelling the leading request doesn't fail the requests waiting on it."""
+    from app.services.search_cache import CachedSearchTool
+    
+    upstream = SlowSearchTool(delay=0.1)
+    tool = CachedSearchTool(upstream)
+    
+    async def scenario():
+        leader = asyncio.create_task(tool.ainvoke("interview questions sql"))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(tool.ainvoke("interview questions sql"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+    
+    assert asyncio.run(scenario()) == "results for interview questions sql"
+    assert len(upstream.calls) == 2
+
+def test_request_coalescer_shares_one_run():
+    """Test that identical concurrent requests share one run and get the same result."""
+    from app.services.coalescer import RequestCoalescer
+    
+    coalescer = RequestCoalescer(enabled=True)
+    runs = []
+    
+    async def work(query):
+        runs.append(query)
+        await asyncio.sleep(0.02)
+        return {"content": f"questions for {query}", "file_path": "output/questions.md"}
+    
+    async def burst():
+        same = [coalescer.run("interview.questions", q, lambda q=q: work(q))
+                for q in ["Interview questions for data analyst", "interview questions for  data analyst?"] * 3]
+        other = coalescer.run("learning.tutorial", "Interview questions for data analyst",
+                              lambda: work("tutorial"))
+        return await asyncio.gather(*same, other)
+    
+    results = asyncio.run(burst())
+    assert len(runs) == 2
+    assert all(result == results[0] for result in results[:6])
+    assert results[0] is not results[1]
+    assert results[6]["content"] == "questions for tutorial"
+    assert coalescer.stats == {"leaders": 2, "followers": 5}
+    assert coalescer._inflight == {}
+
+def test_request_coalescer_propagates_errors_and_forgets_them():
+    """Test that a failing leader fails its followers without poisoning later requests."""
+    from app.services.coalescer import RequestCoalescer
+    
+    coalescer = RequestCoalescer(enabled=True)
+    
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+    
+    async def burst():
+        return await asyncio.gather(*[coalescer.run("workflow", "q", failing) for _ in range(3)],
+                                    return_exceptions=True)
+    
+    results = asyncio.run(burst())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    
+    async def ok():
+        return {"response": "fine"}
+    
+    assert asyncio.run(coalescer.run("workflow", "q", ok)) == {"response": "fine"}
+
+def test_session_store_spills_to_disk_and_expires(tmp_path, monkeypatch):
+    """Test that sessions evicted from memory are reloaded from disk and expire when idle."""
+    from app.services.sessions import SessionStore
+    
+    store = SessionStore(directory=str(tmp_path), max_memory_sessions=1, ttl=60)
+    first = store.create(topic="ML engineer")
+    first.messages.append({"role": "assistant", "content": "Tell me about yourself."})
+    store.save(first)
+    second = store.create(topic="Data analyst")
+    
+    assert (tmp_path / f"{first.session_id}.json").exists()
+    reloaded = store.get(first.session_id)
+    assert reloaded is not first
+    assert reloaded.messages == [{"role": "assistant", "content": "Tell me about yourself."}]
+    assert store.stats["loaded"] == 1
+    
+    assert store.get("../../etc/passwd") is None
+    monkeypatch.setattr("app.services.sessions.time.time", lambda: second.updated_at + 120)
+    assert store.get(second.session_id) is None
+    assert store.stats["expired"] == 1
+
+def test_session_store_keeps_turn_locks_across_eviction_and_sweeps_abandoned_files(tmp_path):
+    """Test that evicting a session keeps its turn lock and that expired spill files are swept."""
+    import os
+    from app.services.sessions import SessionStore
+    
+    store = SessionStore(directory=str(tmp_path), max_memory_sessions=1, ttl=60, sweep_interval=0)
+    first = store.create(topic="ML engineer")
+    held = store.lock(first.session_id)
+    store.create(topic="Data analyst")
+    # the first session was spilled while a turn held its lock; a new turn must wait on the same lock
+    assert store.lock(first.session_id) is held
+    
+    abandoned = store.create(topic="Prompt engineer")
+    store.create(topic="MLOps")
+    path = tmp_path / f"{abandoned.session_id}.json"
+    stale = abandoned.updated_at - 120
+    os.utime(path, (stale, stale))
+    (tmp_path / "notes.txt").write_text("not a session")
+    
+    assert store.sweep() == 1
+    assert not path.exists()
+    assert (tmp_path / "notes.txt").exists()
+    assert (tmp_path / f"{first.session_id}.json").exists()
+    assert store.get(abandoned.session_id) is None
+
+def test_pump_events_merges_tokens_for_slow_consumers_and_times_out():
+    """Test that queued tokens are merged for a slow consumer and a stuck consumer is given up on."""
+    from app.services.streaming import make_event, pump_events
+    
+    closed = []
+    
+    async def reply():
+        try:
+            for text in ["Tell", " me", " about", " RAG"]:
+                yield make_event("token", text=text)
+            yield make_event("done", content="Tell me about RAG")
+        finally:
+            closed.append(True)
+    
+    sent = []
+    
+    async def slow_send(event):
+        sent.append(event)
+        await asyncio.sleep(0.01)
+    
+    asyncio.run(pump_events(reply(), slow_send, max_buffered=8, send_timeout=1))
+    assert "".join(event["text"] for event in sent if event["event"] == "token") == "Tell me about RAG"
+    assert len(sent) < 5
+    assert sent[-1]["event"] == "done"
+    
+    async def stuck_send(event):
+        await asyncio.sleep(10)
+    
+    closed.clear()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(pump_events(reply(), stuck_send, max_buffered=1, send_timeout=0.05))
+    assert closed == [True]
+
+def test_context_compressor_dedupes_ranks_and_packs_into_budget():
+    """Test that search results are deduplicated, ranked by BM25 and packed into the agent's budget."""
+    from app.services.context import ContextCompressor, parse_results
+    
+    raw = ", ".join([
+        "snippet: Celebrity gossip and weekend box office numbers, title: Entertainment, link: https://a.example",
+        "snippet: RAG interview questions: explain retrieval, chunking and reranking in RAG pipelines, "
+        "title: RAG interview prep, link: https://b.example",
+        "snippet: RAG interview questions: explain retrieval, chunking and reranking in RAG pipelines!, "
+        "title: RAG interview prep (mirror), link: https://c.example",
+        "snippet: " + "Generic careers filler text. " * 40 + ", title: Careers, link: https://d.example",
+    ])
+    assert [snippet["link"] for snippet in parse_results(raw)] == [
+        "https://a.example", "https://b.example", "https://c.example", "https://d.example"
+    ]
+    
+    compressor = ContextCompressor(budgets={"interview_questions": 60})
+    context = compressor.compress("interview_questions", "RAG interview questions", raw)
+    lines = context.splitlines()
+    assert lines[0].startswith("- RAG interview prep:")
+    assert "https://c.example" not in context
+    assert "https://d.example" not in context
+    assert compressor.stats["requests"] == 1
+    assert compressor.stats["tokens_saved"] > 0
+    assert compressor.stats["tokens_out"] <= 60
+
+def test_artifact_store_writes_in_background_and_dedupes(tmp_path):
+    """Test that artifacts get stable content-addressed paths immediately and identical content is stored once."""
+    import os
+    from app.services.artifacts import ArtifactStore
+    
+    store = ArtifactStore(directory=str(tmp_path), batch_size=4)
+    first = store.put("# Tutorial\nSame text", kind="tutorial", query="teach me rag / now")
+    again = store.put("# Tutorial\nSame text", kind="tutorial", query="Teach me RAG now")
+    other = store.put("# Answer", kind="answer", query="what is rag")
+    
+    assert first.id == again.id
+    assert first.id != other.id
+    assert os.path.dirname(first.path) == str(tmp_path)
+    assert store.read(first.id) == "# Tutorial\nSame text"
+    assert store.stats["deduplicated"] == 1
+    
+    store.flush()
+    with open(first.path, encoding="utf-8") as f:
+        assert f.read() == "# Tutorial\nSame text"
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".md")) == sorted([f"{first.id}.md", f"{other.id}.md"])
+    assert store.stats["saved"] == 2
+    store.close()
+
+def test_artifact_store_dedupes_without_waiting_on_the_index(tmp_path):
+    """Test that saves and lookups are answered from memory while the writer holds the SQLite index."""
+    import concurrent.futures
+    from app.services.artifacts import ArtifactStore
+
+    store = ArtifactStore(directory=str(tmp_path))
+    first = store.put("# Tutorial\nStored", kind="tutorial", query="teach me rag")
+    store.flush()
+    store.close()
+
+    # A fresh store loads the index into memory once
+    store = ArtifactStore(directory=str(tmp_path))
+    with store._db_lock, concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        again = executor.submit(store.put, "# Tutorial\nStored", "tutorial", "teach me rag").result(timeout=2)
+        looked_up = executor.submit(store.get, first.id).result(timeout=2)
+        other = executor.submit(store.put, "# Answer", "answer", "what is rag").result(timeout=2)
+    assert again.id == first.id and looked_up == again
+    assert store.stats["deduplicated"] == 1
+
+    store.flush()
+    assert store.get(other.id) == other
+    assert [a.id for a in store.list()] == [other.id, first.id]
+    store.close()
+
+def test_artifact_store_adopts_streamed_partial_files(tmp_path):
+    """Test that a streamed partial file is renamed into place, or dropped when its content is already stored."""
+    import os
+    from app.services.artifacts import ArtifactStore
+    
+    store = ArtifactStore(directory=str(tmp_path))
+    partial_path, f = store.open_partial()
+    f.write("# Jobs")
+    f.close()
+    artifact = store.adopt(partial_path, "# Jobs", kind="job_search", query="ml jobs")
+    assert not os.path.exists(partial_path)
+    assert store.read(artifact.id) == "# Jobs"
+    
+    partial_path, f = store.open_partial()
+    f.write("# Jobs")
+    f.close()
+    assert store.adopt(partial_path, "# Jobs", kind="job_search", query="ml jobs") == artifact
+    assert os.listdir(tmp_path / ".partial") == []
+
+def test_artifact_store_indexes_compresses_and_enforces_retention(tmp_path):
+    """Test that artifacts are listed from the index, gzipped when old and evicted past the limits."""
+    import os
+    import time
+    from app.services.artifacts import ArtifactStore
+    
+    store = ArtifactStore(directory=str(tmp_path), max_age=100, max_count=3, max_bytes=0,
+                          compress_after=10, compact_interval=0)
+    artifacts = [store.put(f"# Tutorial {i}\n" + "text " * 50, kind="tutorial", query=f"topic {i}") for i in range(4)]
+    store.put("# Answer", kind="answer", query="what is rag")
+    store.flush()
+    
+    assert [a.query for a in store.list(kind="tutorial", limit=2)] == ["topic 3", "topic 2"]
+    assert [a.kind for a in store.list(query="RAG")] == ["answer"]
+    assert store.usage()["artifacts"] == 5
+    
+    # Everything is past compress_after and the oldest two are beyond max_count
+    result = store.compact(now=time.time() + 50)
+    assert result == {"removed": 2, "compressed": 3}
+    assert store.get(artifacts[0].id) is None
+    assert not os.path.exists(artifacts[0].path)
+    
+    newest = store.get(artifacts[3].id)
+    assert newest.compressed and newest.path.endswith(".md.gz")
+    assert not os.path.exists(artifacts[3].path)
+    assert store.read(newest.id) == f"# Tutorial 3\n" + "text " * 50
+    assert store.usage()["disk_bytes"] < store.usage()["bytes"]
+    
+    # Past max_age everything goes
+    assert store.compact(now=time.time() + 200)["removed"] == 3
+    assert store.list() == []
+
+def test_artifact_store_keeps_artifacts_handed_out_again_on_a_dedup_hit(tmp_path):
+    """Test that a dedup hit refreshes an artifact's age so retention doesn't delete a file just returned."""
+    import os
+    import time
+    from app.services.artifacts import ArtifactStore
+
+    store = ArtifactStore(directory=str(tmp_path), max_age=100, compact_interval=0)
+    reused = store.put("# Tutorial\nReused", kind="tutorial", query="teach me rag")
+    idle = store.put("# Tutorial\nIdle", kind="tutorial", query="teach me agents")
+    store.flush()
+
+    # Age both artifacts past max_age, then hand one out again
+    store._db.execute("UPDATE artifacts SET created = created - 150")
+    store._db.commit()
+    store._artifacts = {a.id: a._replace(created=a.created - 150) for a in store._artifacts.values()}
+    again = store.put("# Tutorial\nReused", kind="tutorial", query="teach me rag")
+    assert again.id == reused.id and again.created >= reused.created
+
+    assert store.compact()["removed"] == 1
+    assert store.get(idle.id) is None and not os.path.exists(idle.path)
+    assert store.read(reused.id) == "# Tutorial\nReused"
+    assert [a.id for a in store.list()] == [reused.id]
+
+    # A hit that lands after the touches were applied still protects the file from that pass
+    store.put("# Tutorial\nReused", kind="tutorial", query="teach me rag")
+    assert store._remove("WHERE id = ?", (reused.id,)) == 0
+    assert os.path.exists(reused.path)
+    store.close()
+
+def test_artifact_store_imports_documents_saved_before_the_store(tmp_path):
+    """Test that legacy timestamped documents are indexed in place and never deleted by retention."""
+    import os
+    from app.services.artifacts import ArtifactStore
+
+    (tmp_path / "tutorial_teach_me_langchain_20250509_201943.md").write_text("# LangChain", encoding="utf-8")
+    (tmp_path / "tutorial_teach_me_langchain_20250509_202108.md").write_text("# LangChain", encoding="utf-8")
+    (tmp_path / "job_search_data_analyst_in_delhi_20250524_221738.md").write_text("# Jobs", encoding="utf-8")
+    (tmp_path / "notes.md").write_text("# Not a generated document", encoding="utf-8")
+    os.utime(tmp_path / "job_search_data_analyst_in_delhi_20250524_221738.md", (1_000_000, 1_000_000))
+
+    store = ArtifactStore(directory=str(tmp_path), max_age=100, compact_interval=0)
+    # The writer imports them when it starts
+    store.start()
+    store.close()
+    assert store.stats["imported"] == 2 and store.stats["legacy_duplicates"] == 1
+    # Duplicates are kept on disk, just not indexed twice
+    assert (tmp_path / "tutorial_teach_me_langchain_20250509_201943.md").exists()
+    assert (tmp_path / "tutorial_teach_me_langchain_20250509_202108.md").exists()
+
+    listed = {a.kind: a for a in store.list()}
+    assert listed["tutorial"].query == "teach me langchain"
+    assert listed["job_search"].query == "data analyst in delhi"
+    assert listed["job_search"].created == 1_000_000
+    assert store.read(listed["job_search"].id) == "# Jobs"
+    assert store.put("# LangChain", kind="tutorial").path == listed["tutorial"].path
+    assert (tmp_path / "notes.md").exists()
+
+    # The old job search is long past max_age, but it is the user's own file
+    new = store.put("# New tutorial", kind="tutorial")
+    store.flush()
+    assert store.compact(now=new.created + 1000) == {"removed": 1, "compressed": 0}
+    assert os.path.exists(tmp_path / "job_search_data_analyst_in_delhi_20250524_221738.md")
+    assert store.get(new.id) is None
+    assert store.import_legacy() == 0
+    store.close()
+
+def test_llm_scheduler_orders_by_priority_and_rejects_late_calls():
+    """Test that queued interactive calls overtake batch calls and calls that can't start in time fail fast."""
+    import asyncio
+    import time
+    from app.services.scheduler import LLMScheduler, SchedulerRejected
+    
+    scheduler = LLMScheduler(limits={"gemini": {"rpm": 600, "tpm": 0}},
+                             max_wait={"interactive": 5, "normal": 5, "batch": 5})
+    order = []
+    
+    async def call(name, priority):
+        await scheduler.run("gemini", lambda: asyncio.sleep(0, result=name), tokens=10, priority=priority)
+        order.append(name)
+    
+    async def main():
+        scheduler._queue_for("gemini").requests.drain()
+        batch = asyncio.ensure_future(call("batch", "batch"))
+        await asyncio.sleep(0.01)
+        interactive = asyncio.ensure_future(call("interactive", "interactive"))
+        await asyncio.gather(batch, interactive)
+        
+        # 60 calls ahead at 10 per second can't drain within a 1 second deadline
+        scheduler._queue_for("gemini").requests.level = -60
+        with pytest.raises(SchedulerRejected):
+            await scheduler.acquire("gemini", 10, "interactive", deadline=time.monotonic() + 1)
+    
+    asyncio.run(main())
+    assert order == ["interactive", "batch"]
+    assert scheduler.stats["rejected"] == 1
+    assert scheduler.metrics()["waiting"] == {"gemini": 0}
+
+def test_scheduled_model_retries_rate_limits_and_streams():
+    """Test that a wrapped model retries a 429 with backoff, streams through chains and exposes the model's settings."""
+    import asyncio
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from langchain_core.prompts import ChatPromptTemplate
+    from app.services.scheduler import LLMScheduler, ScheduledChatModel
+    
+    scheduler = LLMScheduler(limits={}, base_delay=0.01)
+    attempts = []
+    
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED: quota exceeded")
+        return "ok"
+    
+    assert asyncio.run(scheduler.run("gemini", flaky, tokens=5)) == "ok"
+    assert len(attempts) == 2 and scheduler.stats["retries"] == 1
+    
+    model = ScheduledChatModel(FakeListChatModel(responses=["hello"]), scheduler, "gemini")
+    assert model.responses == ["hello"]
+    chain = ChatPromptTemplate.from_template("{q}") | model
+    
+    async def stream():
+        return "".join([chunk.content async for chunk in chain.astream({"q": "hi"})])
+    
+    assert asyncio.run(stream()) == "hello"
+    assert chain.invoke({"q": "hi"}).content == "hello"
+    assert scheduler.stats["calls"] == 4
+
+def test_circuit_breaker_opens_probes_and_closes(monkeypatch):
+    """Test that a breaker opens on the failure rate, fails fast, and closes after a successful half-open probe."""
+    import asyncio
+    from app.services.breaker import CircuitBreaker, CircuitOpenError
+    
+    now = [1000.0]
+    monkeypatch.setattr("app.services.breaker.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker("gemini", window=60, min_calls=4, failure_rate=0.5, open_seconds=30, probes=1)
+    
+    async def fail():
+        raise RuntimeError("503 unavailable")
+    
+    async def ok():
+        return "ok"
+    
+    async def main():
+        assert await breaker.call(ok) == "ok"
+        assert await breaker.call(ok) == "ok"
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await breaker.call(fail)
+        assert breaker.state == "open" and breaker.is_open()
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(ok)
+        
+        now[0] += 31
+        assert not breaker.is_open()
+        with pytest.raises(RuntimeError):
+            await breaker.call(fail)
+        assert breaker.state == "open"
+        
+        now[0] += 31
+        assert await breaker.call(ok) == "ok"
+        assert breaker.state == "closed"
+    
+    asyncio.run(main())
+    snapshot = breaker.snapshot()
+    assert (snapshot["opened"], snapshot["half_opened"], snapshot["closed"]) == (2, 2, 1)
+    assert snapshot["fast_fails"] == 1
+
+def test_agents_fall_back_without_searching_while_gemini_circuit_is_open():
+    """Test that an open Gemini circuit sends agents straight to their fallback content."""
+    import asyncio
+    from unittest.mock import AsyncMock, MagicMock
+    from app.agents.learning import LearningResourceAgent
+    from app.services.breaker import get_breaker
+    
+    search_tool = MagicMock()
+    cache = MagicMock()
+    cache.get_async = AsyncMock(return_value=None)
+    agent = LearningResourceAgent(model=MagicMock(), search_tool=search_tool, cache=cache, context=MagicMock())
+    assert agent.use_fallback is False
+    
+    breaker = get_breaker("gemini")
+    for _ in range(breaker.min_calls):
+        breaker.record(False)
+    assert agent.use_fallback is True
+    
+    result = asyncio.run(agent.create_tutorial_async("transformers"))
+    assert result["content"] == agent._fallback_response("transformers")
+    search_tool.ainvoke.assert_not_called()
+
+def test_deadline_skips_slow_search_and_bounds_model_calls():
+    """Test that a search past its share of the deadline is skipped (but still cached) and model calls time out."""
+    from app.services.deadlines import deadline_after, tracked
+    from app.services.scheduler import LLMScheduler
+    from app.services.search_cache import CachedSearchTool
+    
+    upstream = SlowSearchTool(delay=0.1)
+    tool = CachedSearchTool(upstream)
+    
+    async def search():
+        return {"content": await tool.ainvoke("tutorial rag")}
+    
+    async def scenario():
+        with deadline_after(0.1):
+            result = await tracked(search())
+        await asyncio.sleep(0.15)
+        return result
+    
+    assert asyncio.run(scenario()) == {"content": "", "degraded": ["search_timeout"], "partial": True}
+    # the abandoned search kept running and filled the cache
+    assert tool.invoke("tutorial rag") == "results for tutorial rag"
+    assert len(upstream.calls) == 1
+    
+    scheduler = LLMScheduler(limits={})
+    
+    async def generate():
+        await asyncio.sleep(1)
+        return {"content": "too late"}
+    
+    async def call():
+        try:
+            return await scheduler.run("gemini", generate, tokens=5)
+        except asyncio.TimeoutError:
+            return {"content": "fallback"}
+    
+    async def timed():
+        with deadline_after(0.05):
+            return await tracked(call())
+    
+    assert asyncio.run(timed()) == {"content": "fallback", "degraded": ["model_timeout"], "partial": False}
+
+def test_answers_generated_without_search_results_are_not_cached(llm_cache, api_key_env):
+    """Test that a tutorial generated after its search timed out is served but not cached."""
+    from app.services.deadlines import deadline_after, tracked
+    from app.services.search_cache import CachedSearchTool
+    
+    agent = LearningResourceAgent(
+        model=FakeListChatModel(responses=["Tutorial from memory", "Tutorial with sources"]),
+        search_tool=CachedSearchTool(SlowSearchTool(delay=0.2)),
+        cache=llm_cache
+    )
+    agent.use_fallback = False
+    
+    async def within(seconds):
+        with deadline_after(seconds):
+            return await tracked(agent.create_tutorial_async("Teach me RAG"))
+    
+    result = asyncio.run(within(0.1))
+    assert result["content"] == "Tutorial from memory" and result["degraded"] == ["search_timeout"]
+    assert llm_cache.stats["degraded_skips"] == 1
+    
+    # The next request searches in time and gets (and caches) a full answer
+    result = asyncio.run(within(5))
+    assert result["content"] == "Tutorial with sources" and result["degraded"] == []
+    assert asyncio.run(within(5))["content"] == "Tutorial with sources"
+
+def test_deadline_timeouts_leave_the_gemini_breaker_closed():
+    """Test that calls cut off by their request's deadline aren't counted as upstream failures."""
+    from app.config import BREAKER_MIN_CALLS
+    from app.services.breaker import get_breaker
+    from app.services.deadlines import DeadlineExceeded, deadline_after
+    from app.services.scheduler import LLMScheduler
+    
+    scheduler = LLMScheduler(limits={}, upstream="gemini")
+    
+    async def generate():
+        await asyncio.sleep(1)
+        return "too late"
+    
+    async def calls():
+        for _ in range(BREAKER_MIN_CALLS + 2):
+            with deadline_after(0.02):
+                with pytest.raises(DeadlineExceeded):
+                    await scheduler.run("gemini", generate, tokens=5)
+    
+    asyncio.run(calls())
+    breaker = get_breaker("gemini")
+    assert breaker.state == "closed"
+    assert breaker.stats["failures"] == 0
+
+def test_request_coalescer_cancels_run_once_every_caller_is_gone():
+    """Test that a coalesced run keeps going for remaining callers and is cancelled when the last one leaves."""
+    from app.services.coalescer import RequestCoalescer
+    
+    coalescer = RequestCoalescer(enabled=True)
+    cancelled = []
+    
+    async def work():
+        try:
+            await asyncio.sleep(0.1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return {"response": "done"}
+    
+    async def scenario():
+        first = asyncio.create_task(coalescer.run("workflow", "q", work))
+        second = asyncio.create_task(coalescer.run("workflow", "q", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled
+        second.cancel()
+        await asyncio.sleep(0.01)
+    
+    asyncio.run(scenario())
+    assert cancelled == [True]
+    assert coalescer._inflight == {} and coalescer._waiters == {}
+
+def test_local_corpus_provider_searches_and_reindexes_incrementally(tmp_path):
+    """Test BM25 search over markdown and JSONL documents, and that refreshes only re-read changed files."""
+    import json
+    import os
+    from app.services.corpus_index import CorpusIndex
+    from app.services.search_providers import LocalCorpusProvider
+    from app.services.search_cache import CachedSearchTool
+    
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "rag.md").write_text(
+        "# Retrieval augmented generation\nRAG retrieves documents and feeds them to the model.\n\n"
+        "## Vector databases\nEmbeddings are stored in a vector database for similarity search.\n"
+    )
+    (corpus / "jobs.jsonl").write_text("\n".join(json.dumps(record) for record in [
+        {"title": "ML engineer interview", "text": "Common machine learning interview questions.", "url": "https://example.com/ml"},
+        {"title": "Prompt engineering", "text": "Prompt engineering tips for large language models."},
+    ]))
+    
+    index = CorpusIndex(str(corpus), str(tmp_path / "index"))
+    provider = LocalCorpusProvider(index, limit=2, reindex_interval=0)
+    assert os.path.getsize(tmp_path / "index" / "postings.bin") > 0
+    
+    results = provider.invoke("vector database embeddings")
+    assert results[0] == {
+        "snippet": "Embeddings are stored in a vector database for similarity search.",
+        "title": "Vector databases",
+        "link": "rag.md#vector-databases",
+    }
+    assert provider.invoke("vector database embeddings") == results
+    assert provider.invoke("interview questions")[0]["link"] == "https://example.com/ml"
+    assert provider.invoke("kubernetes") == []
+    
+    (corpus / "jobs.jsonl").unlink()
+    (corpus / "agents.md").write_text("# Agents\nLangGraph agents call tools in a loop.\n")
+    stats = index.refresh()
+    assert (stats["indexed"], stats["removed"], stats["documents"]) == (1, 1, 3)
+    assert provider.invoke("interview questions") == []
+    assert provider.invoke("langgraph tools")[0]["title"] == "Agents"
+    
+    # The index reopens from disk without re-reading anything, and plugs into the search cache
+    reopened = CorpusIndex(str(corpus), str(tmp_path / "index"))
+    assert reopened.refresh()["indexed"] == 0
+    tool = CachedSearchTool(LocalCorpusProvider(reopened, reindex_interval=0))
+    assert asyncio.run(tool.ainvoke("langgraph tools"))[0]["link"] == "agents.md#agents"
+
+def test_semantic_cache_matches_paraphrases_and_evicts_by_age_and_hits(monkeypatch):
+    """Test per-operation similarity thresholds and that eviction keeps frequently hit, recent entries."""
+    from app.services.semantic_cache import HashingEmbedder, SemanticCache
+    
+    embedder = HashingEmbedder()
+    same = embedder.embed("interview questions for data analyst") @ embedder.embed("What are data analyst interview questions?")
+    assert same == pytest.approx(1.0)
+    assert embedder.embed("teach me langchain") @ embedder.embed("teach me langgraph") < 0.85
+    
+    now = [1000.0]
+    monkeypatch.setattr("app.services.semantic_cache.time.time", lambda: now[0])
+    cache = SemanticCache(thresholds={"interview_questions": 0.85}, ttls={"interview_questions": 3600},
+                          max_entries=2, half_life=100)
+    cache.set("interview_questions", "interview questions for data analyst", "analyst questions")
+    assert cache.get("interview_questions", "Data analyst interview questions?") == "analyst questions"
+    assert cache.get("interview_questions", "interview questions for data engineer") is None
+    assert cache.get("tutorial", "interview questions for data analyst") is None
+    
+    now[0] += 10
+    cache.set("interview_questions", "interview questions for ML engineer", "ml questions")
+    now[0] += 10
+    # The analyst entry is older but was hit; the unhit ML engineer entry goes first
+    cache.set("interview_questions", "system design interview questions", "design questions")
+    assert cache.get("interview_questions", "ML engineer interview questions") is None
+    assert cache.get("interview_questions", "interview questions for data analyst") == "analyst questions"
+    
+    now[0] += 3600
+    assert cache.get("interview_questions", "system design interview questions") is None
+    assert cache.metrics()["evictions"] == 1 and cache.metrics()["expired"] == 1
+
+def test_semantic_cache_rejects_near_duplicates_about_a_different_entity():
+    """Test that long queries differing only in a company, framework or model name never share a response."""
+    from app.config import SEMANTIC_CACHE_THRESHOLDS
+    from app.services.semantic_cache import HashingEmbedder, SemanticCache
+    
+    pairs = [
+        ("interview_questions",
+         "What interview questions should I expect for a senior data analyst role at Infosys in Bangalore?",
+         "What interview questions should I expect for a senior data analyst role at TCS in Bangalore?"),
+        ("tutorial",
+         "Write a step by step tutorial on building a RAG pipeline with LangChain, a vector store, reranking and evaluation",
+         "Write a step by step tutorial on building a RAG pipeline with LlamaIndex, a vector store, reranking and evaluation"),
+        ("tutorial",
+         "Create a detailed tutorial on fine-tuning Llama 2 with LoRA adapters, 4-bit quantization, gradient "
+         "checkpointing and evaluation on a single consumer GPU",
+         "Create a detailed tutorial on fine-tuning Mistral with LoRA adapters, 4-bit quantization, gradient "
+         "checkpointing and evaluation on a single consumer GPU"),
+    ]
+    embedder = HashingEmbedder()
+    cache = SemanticCache(embedder=embedder, ttls={"tutorial": 3600, "interview_questions": 3600}, min_queries=4)
+    for namespace, stored, asked in pairs:
+        # similar enough to pass the cosine threshold on their own
+        assert embedder.embed(stored) @ embedder.embed(asked) >= SEMANTIC_CACHE_THRESHOLDS[namespace]
+        cache.set(namespace, stored, stored)
+        assert cache.get(namespace, asked) is None
+        assert cache.get(namespace, stored.lower()) == stored
+    
+    # storing the swapped query adds an entry rather than overwriting the other entity's
+    cache.set("interview_questions", pairs[0][2], "tcs")
+    assert cache.get("interview_questions", pairs[0][1]) == pairs[0][1]
+    assert cache.metrics()["rejected"] >= 3
+    
+    # once an operation has seen enough queries, its common words may differ but its rare ones still may not
+    for verb, topic in [("write", "LangGraph agents"), ("create", "prompt engineering"), ("write", "diffusion models")]:
+        cache.set("tutorial", f"{verb} a detailed tutorial on {topic}", topic)
+    stored = "write a detailed tutorial on vector databases with indexing, metadata filtering, hybrid search and reranking"
+    cache.set("tutorial", stored, "vector databases")
+    assert cache.get("tutorial", stored.replace("write", "create")) == "vector databases"
+    assert cache.get("tutorial", stored.replace("hybrid", "keyword")) is None
+
+def test_semantic_cache_matches_ordinary_paraphrases_before_it_has_seen_many_queries():
+    """Test that a new operation's paraphrases hit unless a word only one of them has is written like a name."""
+    from app.services.semantic_cache import SemanticCache
+    
+    cache = SemanticCache(ttls={"tutorial": 3600, "interview_questions": 3600})
+    cache.set("interview_questions", "interview questions for data analyst", "analyst questions")
+    assert cache.get("interview_questions", "what questions should I ask for a data analyst interview") == "analyst questions"
+    
+    stored = "write a detailed tutorial on vector databases with indexing, metadata filtering, hybrid search and reranking"
+    cache.set("tutorial", stored, "vector databases")
+    assert cache.get("tutorial", stored.replace("detailed", "thorough")) == "vector databases"
+    # close enough to match, but it asks about a product rather than the technique
+    assert cache.get("tutorial", stored.replace("hybrid", "Elasticsearch")) is None
+    assert cache.metrics()["rejected"] == 1
+
+def test_agent_serves_paraphrased_requests_from_semantic_cache(api_key_env):
+    """Test that a paraphrased tutorial request reuses the stored tutorial and its artifact."""
+    from app.services.semantic_cache import SemanticCache
+    
+    cache = LLMCache(path=None, semantic=SemanticCache())
+    searches = []
+    agent = LearningResourceAgent(
+        model=FakeListChatModel(responses=["LangChain tutorial", "Another tutorial"]),
+        search_tool=RunnableLambda(lambda query: searches.append(query) or "Mocked search results"),
+        cache=cache
+    )
+    
+    first = asyncio.run(agent.create_tutorial_async("Teach me LangChain"))
+    second = asyncio.run(agent.create_tutorial_async("Can you teach me about langchain?"))
+    assert second["content"] == first["content"] == "LangChain tutorial"
+    assert second["file_path"] == first["file_path"]
+    assert len(searches) == 1
+    assert cache.stats["semantic_hits"] == 1
+    
+    # Follow-up questions depend on the conversation, so they never match paraphrases
+    history = [{"role": "user", "content": "Teach me LangChain"}]
+    agent.answer_query("What is LangChain?")
+    assert agent.answer_query("what's langchain", chat_history=history)["content"] == "LangChain tutorial"
+    assert cache.stats["semantic_hits"] == 1
+
+def test_benchmark_reports_latency_percentiles_per_endpoint(tmp_path, api_key_env):
+    """Test that the benchmark drives endpoints against the fake backends and saves a JSON report."""
+    from benchmarks.bench import main, percentile
+    
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+    
+    output = tmp_path / "bench.json"
+    report = main([
+        "--endpoints", "workflow,learning.tutorial.stream,interview.mock",
+        "--requests", "6", "--concurrency", "3",
+        "--model-latency", "fixed:0", "--token-rate", "0", "--output-tokens", "20",
+        "--search-latency", "uniform:0,0.002", "--output", str(output)
+    ])
+    
+    saved = json.loads(output.read_text())
+    assert saved["results"] == report["results"]
+    assert list(saved["results"]) == ["workflow", "learning.tutorial.stream", "interview.mock"]
+    for result in saved["results"].values():
+        assert result["requests"] == 6 and result["errors"] == 0
+        assert result["requests_per_second"] > 0
+        assert result["latency"]["p50_ms"] <= result["latency"]["p95_ms"] <= result["latency"]["p99_ms"]
+        assert "p99_ms" in result["loop_lag"]
+    assert saved["backends"]["model"]["calls"] > 0
+
+def test_metered_model_records_latency_tokens_errors_and_fallbacks(caplog):
+    """Test the Prometheus rendering and that agent models record tokens, errors and fallbacks under the agent."""
+    from langchain_core.messages import AIMessage
+    from app.agents.learning import LearningResourceAgent
+    from app.services.metrics import (
+        AGENT_ERRORS, Counter, Histogram, LLM_ERRORS, LLM_FALLBACKS, LLM_INPUT_TOKENS, LLM_OUTPUT_TOKENS,
+        MetricsRegistry
+    )
+    
+    registry = MetricsRegistry()
+    histogram = Histogram("op_seconds", "Op time.", ("op",), buckets=(0.1, 1.0), registry=registry)
+    counter = Counter("ops_total", "Ops.", ("op",), registry=registry)
+    histogram.observe(0.5, op='say "hi"')
+    counter.inc(op="x")
+    assert registry.render().splitlines() == [
+        "# HELP op_seconds Op time.",
+        "# TYPE op_seconds histogram",
+        'op_seconds_bucket{op="say \\"hi\\"",le="0.1"} 0',
+        'op_seconds_bucket{op="say \\"hi\\"",le="1"} 1',
+        'op_seconds_bucket{op="say \\"hi\\"",le="+Inf"} 1',
+        'op_seconds_sum{op="say \\"hi\\""} 0.5',
+        'op_seconds_count{op="say \\"hi\\""} 1',
+        "# HELP ops_total Ops.",
+        "# TYPE ops_total counter",
+        'ops_total{op="x"} 1',
+    ]
+    with pytest.raises(ValueError):
+        counter.inc(kind="x")
+    
+    reply = AIMessage(content="# Tutorial", usage_metadata={"input_tokens": 120, "output_tokens": 30, "total_tokens": 150})
+    agent = LearningResourceAgent(
+        model=RunnableLambda(lambda prompt: reply),
+        search_tool=RunnableLambda(lambda query: "snippet: s, title: t, link: https://example.com")
+    )
+    agent.create_tutorial("LangChain")
+    assert LLM_INPUT_TOKENS.value(agent="learning", model="RunnableLambda")["sum"] == 120
+    assert LLM_OUTPUT_TOKENS.value(agent="learning", model="RunnableLambda")["sum"] == 30
+    
+    def fail(prompt):
+        raise TimeoutError("deadline exceeded")
+    
+    # Replacing the model keeps the metering
+    agent.model = RunnableLambda(fail)
+    with caplog.at_level("WARNING", logger="app.agents"):
+        agent.create_tutorial("LangGraph")
+    assert LLM_ERRORS.value(agent="learning", model="RunnableLambda", error="TimeoutError") == 1
+    assert LLM_FALLBACKS.value(agent="learning", reason="error") == 1
+    assert AGENT_ERRORS.value(operation="tutorial", error="TimeoutError") == 1
+    assert [record.getMessage() for record in caplog.records] == ["tutorial failed: deadline exceeded"]
+    
+    agent.use_fallback = True
+    agent.create_tutorial("Vector databases")
+    assert LLM_FALLBACKS.value(agent="learning", reason="forced") == 1
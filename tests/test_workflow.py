@@ -1,50 +1,303 @@
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 
-from app.workflows.graph import categorize, handle_learning_resource, handle_interview_preparation
+from app.workflows.graph import categorize, route_intent, route_category
 from app.workflows.graph import handle_resume_making, job_search, tutorial_agent, ask_query_bot
-from app.workflows.graph import interview_topics_questions, mock_interview
-from app.workflows.graph import route_query, route_interview, route_learning, create_workflow
+from app.workflows.graph import interview_topics_questions, mock_interview, create_workflow
+from app.workflows.intent import parse_route
 
-def test_categorize(mock_google_llm, api_key_env):
+def test_categorize(mock_google_llm, api_key_env, monkeypatch, tmp_path):
     """Test the categorize function."""
-    mock_google_llm.return_value.invoke.return_value.content = "1"
-    result = categorize({"query": "What is generative AI?"})
-    assert result == {"category": "1"}
-
-def test_handle_learning_resource(mock_google_llm, api_key_env):
-    """Test the handle_learning_resource function."""
-    mock_google_llm.return_value.invoke.return_value.content = "Tutorial"
-    result = handle_learning_resource({"query": "How to create a tutorial on generative AI?"})
-    assert result == {"category": "Tutorial"}
-
-def test_handle_interview_preparation(mock_google_llm, api_key_env):
-    """Test the handle_interview_preparation function."""
-    mock_google_llm.return_value.invoke.return_value.content = "Mock"
-    result = handle_interview_preparation({"query": "Can you conduct a mock interview?"})
-    assert result == {"category": "Mock"}
-
-def test_route_query():
-    """Test the route_query function."""
-    assert route_query({"category": "1"}) == "handle_learning_resource"
-    assert route_query({"category": "2"}) == "handle_resume_making"
-    assert route_query({"category": "3"}) == "handle_interview_preparation"
-    assert route_query({"category": "4"}) == "job_search"
-    assert route_query({"category": "invalid"}) is None
-
-def test_route_interview():
-    """Test the route_interview function."""
-    assert route_interview({"category": "Question"}) == "interview_topics_questions"
-    assert route_interview({"category": "Mock"}) == "mock_interview"
-    assert route_interview({"category": "invalid"}) == "mock_interview"  # Default case
-
-def test_route_learning():
-    """Test the route_learning function."""
-    assert route_learning({"category": "Question"}) == "ask_query_bot"
-    assert route_learning({"category": "Tutorial"}) == "tutorial_agent"
-    assert route_learning({"category": "invalid"}) is None
+    log_file = tmp_path / "intent_log.jsonl"
+    monkeypatch.setattr("app.config.INTENT_LOG_FILE", str(log_file))
+    mock_google_llm.return_value.invoke.return_value.content = "tutorial_agent"
+    result = asyncio.run(categorize({"query": "How to create a tutorial on generative AI?"}))
+    assert result == {"category": "tutorial_agent", "route": "tutorial_agent"}
+    assert "tutorial_agent" in log_file.read_text(encoding="utf-8")
+
+def test_parse_route():
+    """Test that router output is mapped onto a leaf node deterministically."""
+    assert parse_route("mock_interview") == "mock_interview"
+    assert parse_route(" `job_search`.\n") == "job_search"
+    assert parse_route("Job_Search") == "job_search"
+    assert parse_route("1") == "ask_query_bot"
+    assert parse_route("I think this is a tutorial") == "ask_query_bot"
+
+def test_route_category():
+    """Test the route_category function."""
+    assert route_category({"route": "handle_resume_making"}) == "handle_resume_making"
+    assert route_category({"route": "interview_topics_questions"}) == "interview_topics_questions"
+    assert route_category({"route": "invalid"}) == "ask_query_bot"
+    assert route_category({}) == "ask_query_bot"
 
 def test_create_workflow():
     """Test the create_workflow function."""
     workflow = create_workflow()
-    assert workflow is not None
\ No newline at end of file
+    assert workflow is not None
+def test_intent_classifier_predicts_leaf_routes(sample_queries):
+    """Test that the local classifier routes clear queries straight to their leaf node."""
+    from app.workflows.intent import get_intent_classifier
+    
+    classifier = get_intent_classifier()
+    expected = {
+        "learning": "ask_query_bot",
+        "resume": "handle_resume_making",
+        "interview": "interview_topics_questions",
+        "mock_interview": "mock_interview",
+        "job_search": "job_search",
+    }
+    for key, route in expected.items():
+        predicted, confidence = classifier.predict(sample_queries[key])
+        assert predicted == route
+        assert confidence >= 0.6
+    assert classifier.predict("Write a tutorial on LangGraph agents")[0] == "tutorial_agent"
+
+def test_classify_intent_falls_through_when_unsure(mock_google_llm, mock_duckduckgo, api_key_env):
+    """Test that low-confidence predictions fall through to the LLM categorizer."""
+    from app.workflows.graph import classify_intent, route_intent
+    
+    result = asyncio.run(classify_intent({"query": "hello"}))
+    assert result["route"] == ""
+    assert route_intent(result) == "categorize"
+    
+    result = asyncio.run(classify_intent({"query": "Find remote machine learning jobs"}))
+    assert result["category"] == "job_search"
+    assert route_intent(result) == "job_search"
+
+def test_intent_classifier_learns_from_logged_queries(tmp_path):
+    """Test that routes logged by the LLM router are used as extra training data."""
+    from app.workflows.intent import IntentClassifier, SEED_EXAMPLES, load_logged_queries
+    
+    log_file = tmp_path / "intent_log.jsonl"
+    log_file.write_text(
+        '{"query": "roast my portfolio website", "route": "handle_resume_making"}\n'
+        "not json\n",
+        encoding="utf-8"
+    )
+    logged = load_logged_queries(str(log_file))
+    assert logged == [("roast my portfolio website", "handle_resume_making")]
+    
+    classifier = IntentClassifier().fit(SEED_EXAMPLES + logged)
+    assert classifier.predict("roast my portfolio website")[0] == "handle_resume_making"
+
+def test_logged_queries_are_deduplicated_and_capped(tmp_path):
+    """Test that repeated logged queries train once, with their latest route, and only the newest are loaded."""
+    import json
+    from app.workflows.intent import load_logged_queries
+    
+    log_file = tmp_path / "intent_log.jsonl"
+    rows = [("Roast my CV!", "ask_query_bot")] + [(f"query {i}", "job_search") for i in range(5)]
+    rows += [("roast my cv", "handle_resume_making")] * 3
+    log_file.write_text("".join(json.dumps({"query": q, "route": r}) + "\n" for q, r in rows), encoding="utf-8")
+    
+    logged = load_logged_queries(str(log_file), max_examples=0)
+    assert len(logged) == 6
+    assert logged[-1] == ("roast my cv", "handle_resume_making")
+    assert load_logged_queries(str(log_file), max_examples=2) == [("query 4", "job_search"), ("roast my cv", "handle_resume_making")]
+
+def test_intent_log_rotates_instead_of_growing_without_bound(tmp_path):
+    """Test that the routed-query log rotates at its size limit and keeps only the newest two logs."""
+    from app.workflows.intent import load_logged_queries, log_routed_query
+    
+    log_file = tmp_path / "intent_log.jsonl"
+    for i in range(20):
+        log_routed_query(f"query {i}", "ask_query_bot", path=str(log_file), max_bytes=200)
+    
+    assert log_file.stat().st_size <= 200
+    assert (tmp_path / "intent_log.jsonl.1").stat().st_size <= 200
+    assert sorted(p.name for p in tmp_path.glob("intent_log*")) == ["intent_log.jsonl", "intent_log.jsonl.1"]
+    logged = load_logged_queries(str(log_file))
+    assert 0 < len(logged) < 20
+    assert logged[-1] == ("query 19", "ask_query_bot")
+    assert [query for query, _ in logged] == [f"query {i}" for i in range(20 - len(logged), 20)]
+
+def test_workflow_routes_unsure_queries_through_single_llm_call(mock_google_llm, mock_duckduckgo, mock_file_utils, api_key_env, monkeypatch):
+    """Test that a low-confidence query makes one routing call and lands on the chosen leaf."""
+    monkeypatch.setattr("app.config.INTENT_LOG_FILE", "")
+    mock_google_llm.return_value.invoke.return_value.content = "job_search"
+    
+    result = asyncio.run(create_workflow().ainvoke({"query": "hello"}))
+    assert result["category"] == "job_search"
+    assert result["response"] == "mocked/file/path.md"
+
+def test_categorize_prefetches_search_for_predicted_route(monkeypatch):
+    """Test that a right guess hands its in-flight search to the agent and a wrong one is cancelled upstream."""
+    from types import SimpleNamespace
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from app.services.deadlines import deadline_after, tracked
+    from app.services.search_cache import CachedSearchTool
+    
+    monkeypatch.setattr("app.config.INTENT_LOG_FILE", "")
+    calls, cancelled = [], []
+    
+    class SlowSearch:
+        async def ainvoke(self, query):
+            calls.append(query)
+            try:
+                await asyncio.sleep(0.1)
+            except asyncio.CancelledError:
+                cancelled.append(query)
+                raise
+            return f"results for {query}"
+    
+    async def run(answer, predicted_route):
+        search_tool = CachedSearchTool(SlowSearch())
+        pool = SimpleNamespace(
+            router_model=FakeListChatModel(responses=[answer], sleep=0.02),
+            search_tool=search_tool
+        )
+        state = {"query": "ml roles", "predicted_route": predicted_route}
+        result = await categorize(state, config={"configurable": {"pool": pool}})
+        if result["route"] == "job_search":
+            # what the job agent does next; it should join the prefetch, not search again
+            assert await search_tool.ainvoke("job listings ml roles") == "results for job listings ml roles"
+        await asyncio.sleep(0.15)
+        return result, search_tool.metrics()
+    
+    result, metrics = asyncio.run(run("job_search", "job_search"))
+    assert result["route"] == "job_search"
+    assert calls == ["job listings ml roles"]
+    assert metrics["coalesced"] == 1
+    
+    assert cancelled == []
+    
+    calls.clear()
+    result, metrics = asyncio.run(run("tutorial_agent", "job_search"))
+    assert result["route"] == "tutorial_agent"
+    assert calls == cancelled == ["job listings ml roles"]
+    assert metrics["entries"] == 0
+    
+    # A prefetch outlasting the request's search budget doesn't mark the request degraded
+    async def run_with_deadline():
+        async def routed():
+            return (await run("tutorial_agent", "job_search"))[0]
+        
+        with deadline_after(0.05):
+            return await tracked(routed())
+    
+    cancelled.clear()
+    result = asyncio.run(run_with_deadline())
+    assert result["degraded"] == [] and cancelled == ["job listings ml roles"]
+
+def test_stream_workflow_reports_node_progress(monkeypatch, tmp_path, mock_google_llm, mock_duckduckgo, api_key_env):
+    """Test that a streamed workflow run reports routing, search, generation, tokens and the saved file."""
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from langchain_core.runnables import RunnableLambda
+    from app.services.pool import AgentPool
+    from app.services.search_cache import CachedSearchTool
+    from app.workflows.progress import stream_workflow
+    
+    pool = AgentPool()
+    pool.job.model = FakeListChatModel(responses=["# Openings"])
+    pool.job.search_tool = CachedSearchTool(RunnableLambda(
+        lambda query: "snippet: a, title: Analyst, link: x, snippet: b, title: BI Analyst, link: y"
+    ))
+    pool.job.use_fallback = False
+    
+    async def collect():
+        return [event async for event in stream_workflow(
+            create_workflow(),
+            {"query": "data analyst jobs in delhi"},
+            config={"configurable": {"pool": pool}}
+        )]
+    
+    events = asyncio.run(collect())
+    names = [event["event"] for event in events]
+    assert names[:5] == ["start", "routed", "search_done", "context_packed", "generation_started"]
+    assert names[-2:] == ["saved", "done"]
+    assert all("ts" in event for event in events)
+    
+    by_name = {event["event"]: event for event in events}
+    assert by_name["routed"]["route"] == "job_search"
+    assert by_name["search_done"]["results"] == 2
+    assert "".join(event["text"] for event in events if event["event"] == "token") == "# Openings"
+    assert by_name["saved"]["file_path"].startswith(str(tmp_path))
+    assert by_name["done"]["response"] == by_name["saved"]["file_path"]
+
+def test_run_batch_dedupes_bounds_concurrency_and_isolates_errors(monkeypatch):
+    """Test that a batch runs distinct items once, at most `concurrency` at a time, keeping order and per-item errors."""
+    from types import SimpleNamespace
+    from app.services.coalescer import RequestCoalescer
+    from app.workflows.batch import run_batch, stream_batch
+    
+    running, peak, calls = 0, 0, []
+    
+    class FakeWorkflow:
+        async def ainvoke(self, state, config=None):
+            nonlocal running, peak
+            calls.append(state["query"])
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            if state["query"] == "boom":
+                raise ValueError("model unavailable")
+            return {"query": state["query"], "category": "ask_query_bot", "response": f"answer to {state['query']}"}
+    
+    async def forced(route, query, config=None):
+        return {"query": query, "category": route, "response": f"{route} for {query}"}
+    
+    monkeypatch.setattr("app.workflows.batch.run_route", forced)
+    config = {"configurable": {"pool": SimpleNamespace(coalescer=RequestCoalescer())}}
+    items = [("What is RAG?", None), ("boom", None), ("what is rag", None), ("q3", None),
+             ("q4", None), ("ml jobs", "job_search")]
+    
+    result = asyncio.run(run_batch(FakeWorkflow(), items, config=config, concurrency=2))
+    assert [r["index"] for r in result["results"]] == list(range(6))
+    assert result["results"][0]["response"] == result["results"][2]["response"] == "answer to What is RAG?"
+    assert result["results"][1] == {"index": 1, "query": "boom", "route": None, "status": "error", "error": "model unavailable"}
+    assert result["results"][5]["response"] == "job_search for ml jobs"
+    assert (result["unique"], result["succeeded"], result["failed"]) == (5, 5, 1)
+    assert sorted(calls) == ["What is RAG?", "boom", "q3", "q4"]
+    assert peak <= 2
+    
+    async def collect():
+        return [event async for event in stream_batch(FakeWorkflow(), items, config=config, concurrency=2)]
+    
+    events = asyncio.run(collect())
+    assert events[0]["event"] == "start" and events[-1]["event"] == "done"
+    assert sorted(event["index"] for event in events if event["event"] == "item") == list(range(6))
+    assert events[-1]["failed"] == 1
+
+def test_batch_items_run_under_their_own_deadline_apart_from_interactive_requests(monkeypatch):
+    """Test that batch items get a deadline and degradation markers and don't coalesce with /workflow runs."""
+    from types import SimpleNamespace
+    from app.config import REQUEST_TIMEOUTS
+    from app.services.coalescer import RequestCoalescer
+    from app.services.deadlines import mark_degraded, remaining
+    from app.workflows.batch import run_batch
+    
+    calls = []
+    
+    class FakeWorkflow:
+        async def ainvoke(self, state, config=None):
+            calls.append(state)
+            await asyncio.sleep(0.02)
+            return {"query": state["query"], "category": "ask_query_bot", "response": "answer"}
+    
+    async def forced(route, query, config=None):
+        calls.append({"query": query, "remaining": remaining()})
+        mark_degraded("search_timeout")
+        return {"query": query, "category": route, "response": "jobs"}
+    
+    monkeypatch.setattr("app.workflows.batch.run_route", forced)
+    monkeypatch.setitem(REQUEST_TIMEOUTS, "batch.item", 30)
+    coalescer = RequestCoalescer(enabled=True)
+    config = {"configurable": {"pool": SimpleNamespace(coalescer=coalescer)}}
+    workflow = FakeWorkflow()
+    
+    async def scenario():
+        interactive = coalescer.run("workflow", "What is RAG?", lambda: workflow.ainvoke({"query": "What is RAG?"}))
+        return await asyncio.gather(
+            interactive, run_batch(workflow, [("What is RAG?", None), ("ml jobs", "job_search")], config=config)
+        )
+    
+    _, result = asyncio.run(scenario())
+    forced_call, = [call for call in calls if "remaining" in call]
+    workflow_calls = [call for call in calls if "remaining" not in call]
+    assert 0 < forced_call["remaining"] <= 30
+    assert len(workflow_calls) == 2
+    assert [call.get("deadline") is not None for call in workflow_calls].count(True) == 1
+    assert result["results"][0]["degraded"] == [] and not result["results"][0]["partial"]
+    assert result["results"][1]["degraded"] == ["search_timeout"] and result["results"][1]["partial"]